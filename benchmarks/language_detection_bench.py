@@ -0,0 +1,81 @@
+"""
+Language detection benchmark: local detector vs. Azure OpenAI path
+Reports accuracy, escalation rate and latency on benchmarks/language_corpus.tsv
+
+Usage:
+    python benchmarks/language_detection_bench.py            # local detector only
+    python benchmarks/language_detection_bench.py --llm      # also time the LLM path (needs Azure creds)
+"""
+
+import os
+import sys
+import time
+import argparse
+import statistics
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from language_detector import language_detector, LANGUAGE_CONFIDENCE_THRESHOLD
+
+CORPUS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "language_corpus.tsv")
+
+
+def load_corpus(path: str = CORPUS_FILE):
+    rows = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line or line.startswith("#"):
+                continue
+            text, label = line.split("\t")
+            rows.append((text, label))
+    return rows
+
+
+def run(name, detect, rows):
+    latencies = []
+    correct = 0
+    confusion = Counter()
+    for text, label in rows:
+        start = time.perf_counter()
+        predicted = detect(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+        correct += predicted == label
+        if predicted != label:
+            confusion[(label, predicted)] += 1
+
+    latencies.sort()
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"\n📊 {name}")
+    print(f"   accuracy : {correct}/{len(rows)} ({correct / len(rows):.1%})")
+    print(f"   latency  : p50 {statistics.median(latencies):.3f} ms, p95 {p95:.3f} ms, max {latencies[-1]:.3f} ms")
+    for (label, predicted), count in confusion.most_common():
+        print(f"   ❌ {label} → {predicted}: {count}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm", action="store_true", help="Also benchmark the Azure OpenAI detection path")
+    parser.add_argument("--corpus", default=CORPUS_FILE)
+    args = parser.parse_args()
+
+    rows = load_corpus(args.corpus)
+    print(f"Corpus: {len(rows)} labelled samples, threshold {LANGUAGE_CONFIDENCE_THRESHOLD}")
+
+    escalations = sum(1 for text, _ in rows if language_detector.detect(text)[1] < LANGUAGE_CONFIDENCE_THRESHOLD)
+    print(f"Would escalate to LLM: {escalations}/{len(rows)} ({escalations / len(rows):.1%})")
+
+    run("Local detector", lambda text: language_detector.detect(text)[0], rows)
+
+    if args.llm:
+        from utils_final import _detect_language_llm, detect_language, openai_client
+        if not openai_client:
+            print("\n⚠️ Azure OpenAI not configured, skipping LLM benchmark")
+            return
+        run("LLM only", _detect_language_llm, rows)
+        run("Local + LLM escalation (detect_language)", detect_language, rows)
+
+
+if __name__ == "__main__":
+    main()
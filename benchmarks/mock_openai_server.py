@@ -0,0 +1,364 @@
+"""
+Offline Azure OpenAI stand-in for benchmarks and load tests
+Serves the chat-completions API (plain and streaming) with recorded fixtures or rule-based
+answers per purpose (router JSON, translation, extraction JSON, eligibility turns), with a
+configurable latency distribution and injected 429s. No Azure credentials needed.
+
+The purpose comes from the X-LLM-Purpose header that llm_client.chat_completion sends;
+requests without it are classified from the prompt.
+
+Usage:
+    python benchmarks/mock_openai_server.py --port 8900 --latency-ms 600 --rate-429 0.05
+
+    # point every AzureOpenAI client in the project at it
+    export AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8900
+    export AZURE_OPENAI_API_KEY=mock
+    export AZURE_OPENAI_API_VERSION=2024-12-01-preview
+
+Fixtures (--fixtures, default benchmarks/mock_openai_fixtures.json):
+    {
+      "latency": {"router": {"median_ms": 250, "sigma": 0.3}},
+      "responses": [{"purpose": "router", "match": "payment", "content": "{\\"flag_type\\": \\"post_application\\"}"}]
+    }
+    "match" is a case-insensitive regex on the last user message; the first matching
+    response wins, rule-based answers are used otherwise.
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+FIXTURES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mock_openai_fixtures.json")
+
+PURPOSE_HEADER = "X-LLM-Purpose"
+
+DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+MARATHI_MARKERS = re.compile(r"आहे|नाही|होय|तुम्ही|मला|माझे|आहेत|काय|\b(ho|hoy|hao|hau|aahe|mala|nahi ka)\b", re.I)
+HINDI_MARKERS = re.compile(r"है|हूँ|हाँ|नहीं|आप|मुझे|क्या|\b(haan|hai|mujhe|kya|nhi)\b", re.I)
+POST_APPLICATION_WORDS = re.compile(r"status|payment|paid|transaction|installment|hapta|credited|application id|track", re.I)
+FORM_FILLING_WORDS = re.compile(r"\b(apply|register|registration|form|upload|fill)\b", re.I)
+TRANSACTION_WORDS = re.compile(r"payment|paid|transaction|installment|credited|amount|hapta", re.I)
+YES_WORDS = re.compile(r"\b(yes|yeah|haan|ha|ho|hoy|होय|हो|हाँ|हां)\b", re.I)
+NO_WORDS = re.compile(r"\b(no|nahi|nahin|नाही|नहीं|नको)\b", re.I)
+
+
+# ============================================
+# Mock Configuration
+# ============================================
+class MockConfig:
+    def __init__(self, latency_ms: float = 600, sigma: float = 0.5, tokens_per_second: float = 80,
+                 rate_429: float = 0.0, retry_after: float = 1.0, seed: Optional[int] = None,
+                 fixtures_path: Optional[str] = FIXTURES_FILE):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.tokens_per_second = tokens_per_second
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.latency: Dict[str, Dict[str, float]] = {}
+        self.responses: List[Dict[str, Any]] = []
+        if fixtures_path and os.path.exists(fixtures_path):
+            self.load_fixtures(fixtures_path)
+
+    @classmethod
+    def from_env(cls) -> "MockConfig":
+        seed = os.getenv("MOCK_LLM_SEED")
+        return cls(
+            latency_ms=float(os.getenv("MOCK_LLM_LATENCY_MS", "600")),
+            sigma=float(os.getenv("MOCK_LLM_LATENCY_SIGMA", "0.5")),
+            tokens_per_second=float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "80")),
+            rate_429=float(os.getenv("MOCK_LLM_429_RATE", "0")),
+            retry_after=float(os.getenv("MOCK_LLM_RETRY_AFTER", "1")),
+            seed=int(seed) if seed else None,
+            fixtures_path=os.getenv("MOCK_LLM_FIXTURES", FIXTURES_FILE),
+        )
+
+    def load_fixtures(self, path: str):
+        with open(path, "r", encoding="utf-8") as f:
+            fixtures = json.load(f)
+        self.latency = fixtures.get("latency", {})
+        self.responses = []
+        for entry in fixtures.get("responses", []):
+            entry = dict(entry)
+            entry["pattern"] = re.compile(entry["match"], re.I) if entry.get("match") else None
+            self.responses.append(entry)
+        print(f"📼 Loaded {len(self.responses)} recorded responses from {path}")
+
+    def sample_latency(self, purpose: str) -> float:
+        """Seconds before the first byte: lognormal around the (per-purpose) median"""
+        override = self.latency.get(purpose, {})
+        median_ms = override.get("median_ms", self.latency_ms)
+        sigma = override.get("sigma", self.sigma)
+        if median_ms <= 0:
+            return 0.0
+        return self.random.lognormvariate(0, sigma) * median_ms / 1000
+
+    def should_throttle(self, purpose: str) -> bool:
+        rate = self.latency.get(purpose, {}).get("rate_429", self.rate_429)
+        return rate > 0 and self.random.random() < rate
+
+    def recorded(self, purpose: str, user_text: str) -> Optional[str]:
+        for entry in self.responses:
+            if entry.get("purpose") not in (None, purpose):
+                continue
+            if entry["pattern"] is None or entry["pattern"].search(user_text):
+                return entry["content"]
+        return None
+
+
+# ============================================
+# Purpose Classification
+# ============================================
+def classify_purpose(messages: List[Dict[str, Any]]) -> str:
+    """Fallback for callers that do not send X-LLM-Purpose"""
+    prompt = " ".join(str(m.get("content", "")) for m in messages).lower()
+    if "flag_type" in prompt:
+        return "router"
+    if "language detector" in prompt:
+        return "detect_language"
+    if "json object mapping message keys" in prompt:
+        return "translate_batch"
+    if "professional translator" in prompt:
+        return "translate"
+    if "ocr text" in prompt:
+        return "parse_with_ai"
+    if "transaction_flag" in prompt:
+        return "query_analysis"
+    if "is_valid" in prompt:
+        return "validate_query"
+    if "allowed answers" in prompt:
+        return "eligibility_engine"
+    return "unspecified"
+
+
+# ============================================
+# Rule-based Answers
+# ============================================
+def _route(system: str, user: str) -> str:
+    message = user.split("Current user message:", 1)[-1]
+    if POST_APPLICATION_WORDS.search(message):
+        flag = "post_application"
+    elif "form_filling" in system and FORM_FILLING_WORDS.search(message):
+        flag = "form_filling"
+    else:
+        flag = "eligibility"
+    return json.dumps({"flag_type": flag})
+
+
+def _detect_language(user: str) -> str:
+    if MARATHI_MARKERS.search(user):
+        return "marathi"
+    if HINDI_MARKERS.search(user) or DEVANAGARI.search(user):
+        return "hindi"
+    return "english"
+
+
+def _extract_fields(user: str) -> str:
+    """Fill every '- field' the prompt lists from the OCR text (empty when not found)"""
+    ocr = user.split("OCR Text:", 1)[-1]
+    fields = re.findall(r"^\s*-\s*([a-z_]+)", user, re.M)
+    aadhaar = re.search(r"\b\d{4}\s?\d{4}\s?\d{4}\b", ocr)
+    date = re.search(r"\b\d{2}[/-]\d{2}[/-]\d{4}\b", ocr)
+    pincode = re.search(r"\b\d{6}\b", ocr)
+    ifsc = re.search(r"\b[A-Z]{4}0[A-Z0-9]{6}\b", ocr)
+    result = {}
+    for field in fields:
+        if field == "aadhaar_number" and aadhaar:
+            result[field] = re.sub(r"\s", "", aadhaar.group())
+        elif ("date" in field or field == "date_of_birth") and date:
+            result[field] = date.group()
+        elif field == "pincode" and pincode:
+            result[field] = pincode.group()
+        elif field == "ifsc_code" and ifsc:
+            result[field] = ifsc.group()
+        elif field == "gender":
+            result[field] = "Male" if re.search(r"\bmale\b", ocr, re.I) and not re.search(r"female", ocr, re.I) else "Female"
+        elif field == "state":
+            result[field] = "Maharashtra"
+        else:
+            result[field] = ""
+    return json.dumps(result, ensure_ascii=False)
+
+
+def _interpret(system: str, user: str) -> str:
+    reply = user.split("Reply:", 1)[-1]
+    if "age in years" in system:
+        age = re.search(r"\d{2}", reply)
+        return age.group() if age else "unclear"
+    if YES_WORDS.search(reply):
+        return "yes"
+    if NO_WORDS.search(reply):
+        return "no"
+    return "unclear"
+
+
+def rule_based_answer(purpose: str, messages: List[Dict[str, Any]]) -> str:
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+
+    if purpose == "router":
+        return _route(system, user)
+    if purpose == "detect_language":
+        return _detect_language(user)
+    if purpose in ("translate", "translate_batch"):
+        # Echo keeps placeholders (and batch JSON keys) intact
+        return user
+    if purpose == "parse_with_ai":
+        return _extract_fields(user)
+    if purpose == "validate_query":
+        return json.dumps({"is_valid": True, "reason": "mock validator"})
+    if purpose == "query_analysis":
+        return json.dumps({"is_valid": True, "transaction_flag": int(bool(TRANSACTION_WORDS.search(user))),
+                           "month_list": None, "start_month": None, "end_month": None, "last_n_months": None})
+    if purpose == "eligibility_engine":
+        return _interpret(system, user) if "allowed answers" in system.lower() else user
+    if purpose == "eligibility_agent":
+        return "Thank you. Could you please tell me your age?"
+    return "This is a mock response from the offline Azure OpenAI stand-in."
+
+
+# ============================================
+# Response Bodies
+# ============================================
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def _usage(messages: List[Dict[str, Any]], content: str) -> Dict[str, int]:
+    prompt_tokens = sum(_estimate_tokens(str(m.get("content", ""))) for m in messages)
+    completion_tokens = _estimate_tokens(content)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens}
+
+
+def completion_body(model: str, messages: List[Dict[str, Any]], content: str) -> Dict[str, Any]:
+    return {
+        "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": _usage(messages, content),
+    }
+
+
+def _chunk(completion_id: str, model: str, choices: List[Dict[str, Any]], **extra) -> str:
+    body = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": model, "choices": choices, **extra}
+    return f"data: {json.dumps(body, ensure_ascii=False)}\n\n"
+
+
+def throttled_response(retry_after: float) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(max(1, int(round(retry_after)))),
+                 "retry-after-ms": str(int(retry_after * 1000))},
+        content={"error": {"code": "429", "message": "Requests to the ChatCompletions_Create Operation have "
+                                                      "exceeded call rate limit (mock injection)."}},
+    )
+
+
+# ============================================
+# FastAPI App
+# ============================================
+def create_app(config: Optional[MockConfig] = None) -> FastAPI:
+    config = config or MockConfig.from_env()
+    app = FastAPI(title="Mock Azure OpenAI")
+    stats = Counter()
+    stats_lock = threading.Lock()
+
+    def count(purpose: str, outcome: str):
+        with stats_lock:
+            stats[f"{purpose}:{outcome}"] += 1
+
+    async def stream_body(model: str, messages: List[Dict[str, Any]], content: str, include_usage: bool):
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        # Azure opens with a prompt_filter_results chunk that has no choices
+        yield _chunk(completion_id, model, [], prompt_filter_results=[])
+        yield _chunk(completion_id, model, [{"index": 0, "delta": {"role": "assistant", "content": ""}}])
+        pieces = re.findall(r"\S+\s*|\s+", content) or [content]
+        for piece in pieces:
+            if config.tokens_per_second > 0:
+                await asyncio.sleep(_estimate_tokens(piece) / config.tokens_per_second)
+            yield _chunk(completion_id, model, [{"index": 0, "delta": {"content": piece}}])
+        yield _chunk(completion_id, model, [{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if include_usage:
+            yield _chunk(completion_id, model, [], usage=_usage(messages, content))
+        yield "data: [DONE]\n\n"
+
+    @app.post("/openai/deployments/{deployment}/chat/completions")
+    async def chat_completions(deployment: str, request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        purpose = request.headers.get(PURPOSE_HEADER) or classify_purpose(messages)
+
+        await asyncio.sleep(config.sample_latency(purpose))
+        if config.should_throttle(purpose):
+            count(purpose, "429")
+            return throttled_response(config.retry_after)
+
+        user = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+        content = config.recorded(purpose, user)
+        count(purpose, "recorded" if content is not None else "rule")
+        if content is None:
+            content = rule_based_answer(purpose, messages)
+
+        if body.get("stream"):
+            include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+            return StreamingResponse(stream_body(deployment, messages, content, include_usage),
+                                     media_type="text/event-stream")
+        return completion_body(deployment, messages, content)
+
+    @app.get("/mock/stats")
+    async def mock_stats():
+        """Requests served per purpose and outcome (recorded / rule / 429)"""
+        with stats_lock:
+            return dict(stats)
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=float(os.getenv("MOCK_LLM_LATENCY_MS", "600")),
+                        help="Median time to first byte (lognormal)")
+    parser.add_argument("--sigma", type=float, default=float(os.getenv("MOCK_LLM_LATENCY_SIGMA", "0.5")),
+                        help="Lognormal sigma of the latency distribution (0 = fixed latency)")
+    parser.add_argument("--tokens-per-second", type=float, default=float(os.getenv("MOCK_LLM_TOKENS_PER_SECOND", "80")),
+                        help="Streaming pace (0 = send the whole answer at once)")
+    parser.add_argument("--rate-429", type=float, default=float(os.getenv("MOCK_LLM_429_RATE", "0")),
+                        help="Fraction of requests answered with 429 Too Many Requests")
+    parser.add_argument("--retry-after", type=float, default=float(os.getenv("MOCK_LLM_RETRY_AFTER", "1")))
+    parser.add_argument("--seed", type=int, default=None, help="Seed for reproducible latency / 429 sequences")
+    parser.add_argument("--fixtures", default=os.getenv("MOCK_LLM_FIXTURES", FIXTURES_FILE))
+    args = parser.parse_args()
+
+    import uvicorn
+
+    config = MockConfig(latency_ms=args.latency_ms, sigma=args.sigma, tokens_per_second=args.tokens_per_second,
+                        rate_429=args.rate_429, retry_after=args.retry_after, seed=args.seed,
+                        fixtures_path=args.fixtures)
+    print(f"🧪 Mock Azure OpenAI on http://{args.host}:{args.port} "
+          f"(median {args.latency_ms:.0f} ms, sigma {args.sigma}, 429 rate {args.rate_429:.0%})")
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+OCR preprocessing benchmark: raw uploads vs. image_preprocessing.normalize_for_ocr
+Reports Tesseract latency and accuracy per document type
+
+Samples are not shipped (they are identity documents). Put them under
+benchmarks/ocr_samples/<document_type>/ as images or PDFs, each with a <name>.txt next to
+it listing the values OCR must find, one per line (Aadhaar number, name, PAN, IFSC, ...).
+
+Usage:
+    python benchmarks/ocr_preprocessing_bench.py
+    python benchmarks/ocr_preprocessing_bench.py --samples /path/to/samples --repeat 3
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image
+from pdf2image import convert_from_path
+import pytesseract
+
+from image_preprocessing import normalize_for_ocr
+
+SAMPLES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ocr_samples")
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".pdf")
+
+
+def load_samples(root: str):
+    """(document_type, path, expected values) for every sample with a ground-truth file"""
+    samples = []
+    for document_type in sorted(os.listdir(root)):
+        folder = os.path.join(root, document_type)
+        if not os.path.isdir(folder):
+            continue
+        for name in sorted(os.listdir(folder)):
+            stem, ext = os.path.splitext(name)
+            truth = os.path.join(folder, stem + ".txt")
+            if ext.lower() not in IMAGE_EXTENSIONS or not os.path.exists(truth):
+                continue
+            with open(truth, "r", encoding="utf-8") as f:
+                expected = [line.strip() for line in f if line.strip()]
+            samples.append((document_type, os.path.join(folder, name), expected))
+    return samples
+
+
+def load_images(path: str):
+    if path.lower().endswith(".pdf"):
+        return convert_from_path(path, dpi=300)
+    return [Image.open(path)]
+
+
+def _squash(text: str) -> str:
+    return re.sub(r"\s+", "", text).lower()
+
+
+def field_recall(text: str, expected) -> float:
+    """Share of expected values found in the OCR text (whitespace-insensitive)"""
+    squashed = _squash(text)
+    return sum(_squash(value) in squashed for value in expected) / len(expected)
+
+
+def run(samples, lang: str, config: str, repeat: int):
+    results = defaultdict(lambda: {"raw": [], "normalized": [], "raw_recall": [], "normalized_recall": [],
+                                   "pixels": [], "normalized_pixels": []})
+    for document_type, path, expected in samples:
+        pages = load_images(path)
+        row = results[document_type]
+        for variant in ("raw", "normalized"):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                texts = []
+                for page in pages:
+                    img = normalize_for_ocr(page) if variant == "normalized" else page
+                    if variant == "normalized":
+                        row["normalized_pixels"].append(img.width * img.height)
+                    else:
+                        row["pixels"].append(img.width * img.height)
+                    texts.append(pytesseract.image_to_string(img, lang=lang, config=config))
+                row[variant].append((time.perf_counter() - start) * 1000)
+            row[f"{variant}_recall"].append(field_recall("\n".join(texts), expected))
+    return results
+
+
+def report(results):
+    print(f"\n{'document type':<22}{'n':>4}{'raw p50':>10}{'norm p50':>10}{'speedup':>9}"
+          f"{'raw recall':>12}{'norm recall':>13}{'MP raw→norm':>16}")
+    for document_type, row in sorted(results.items()):
+        raw_p50 = statistics.median(row["raw"])
+        norm_p50 = statistics.median(row["normalized"])
+        megapixels = (statistics.mean(row["pixels"]) / 1e6, statistics.mean(row["normalized_pixels"]) / 1e6)
+        print(f"{document_type:<22}{len(row['raw_recall']):>4}{raw_p50:>8.0f}ms{norm_p50:>8.0f}ms"
+              f"{raw_p50 / norm_p50:>8.2f}x{statistics.mean(row['raw_recall']):>12.1%}"
+              f"{statistics.mean(row['normalized_recall']):>13.1%}"
+              f"{megapixels[0]:>9.1f}→{megapixels[1]:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", default=SAMPLES_DIR)
+    parser.add_argument("--lang", default="eng+hin")
+    parser.add_argument("--config", default="--oem 3 --psm 6")
+    parser.add_argument("--repeat", type=int, default=1, help="Timed runs per sample and variant")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.samples):
+        print(f"❌ No samples directory at {args.samples} (see the module docstring for the layout)")
+        sys.exit(1)
+    samples = load_samples(args.samples)
+    if not samples:
+        print(f"❌ No samples with ground-truth .txt files under {args.samples}")
+        sys.exit(1)
+
+    print(f"🔬 {len(samples)} samples, lang={args.lang}, config='{args.config}', repeat={args.repeat}")
+    report(run(samples, args.lang, args.config, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,397 @@
+"""
+Card Layout OCR Module for Ladki Bahin Yojana
+Region-of-interest OCR for Aadhaar and PAN cards
+Both cards have fixed layouts, so instead of OCR'ing the whole photo with --psm 6 and asking
+the LLM to find the fields, the card is located and only its field regions are read, each with
+a page segmentation mode and character whitelist suited to the field. Results are used only
+when every required field validates (Aadhaar numbers carry a Verhoeff check digit); anything
+less falls back to the full OCR + parse_with_ai path.
+"""
+
+import os
+import re
+import json
+import asyncio
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+try:
+    import numpy as np
+except Exception:  # numpy is optional, the whole image is treated as one card without it
+    np = None
+
+from metrics import registry
+from document_cache import ocr_result_cache, ocr_cache_key, content_digest
+from image_preprocessing import normalize_for_ocr, OCR_NORMALIZE, NORMALIZATION_VERSION, _thumbnail, _ink_mask
+from ocr_service import ocr_service, image_to_string, load_pages
+
+# ============================================
+# Card Layout Configuration
+# ============================================
+CARD_ROI_ENABLED = os.getenv("CARD_ROI_ENABLED", "true").lower() == "true"
+# ROI OCR is a shortcut, so it gets a shorter budget than a full OCR job
+CARD_ROI_TIMEOUT_SECONDS = float(os.getenv("CARD_ROI_TIMEOUT_SECONDS", "15"))
+# Photos and scans of the physical card; e-Aadhaar PDFs are A4 letters with a different layout
+CARD_ROI_EXTENSIONS = (".jpg", ".jpeg", ".png")
+# Bump when regions, configs or parsers change so cached results are not reused
+CARD_LAYOUT_VERSION = "card-v2"
+
+# ID-1 card aspect ratio (85.6 × 54 mm)
+CARD_ASPECT = 85.6 / 54
+# Card stock is lighter than this (grayscale); tables and hands behind it are darker
+CARD_MIN_BRIGHTNESS = 150
+
+_DIGITS = "-c tessedit_char_whitelist=0123456789"
+_PAN_CHARS = "-c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789"
+
+# (field group, (left, top, right, bottom) as fractions of the card, lang, config)
+CARD_REGIONS = {
+    "aadhaar": [
+        # 12-digit number band above the footer (front and back)
+        ("number", (0.10, 0.66, 0.90, 0.92), "eng", f"--oem 3 --psm 6 {_DIGITS}"),
+        # Name / DOB / gender block to the right of the photo (front)
+        ("details", (0.25, 0.18, 1.00, 0.74), "eng", "--oem 3 --psm 6"),
+        # Address block to the left of the QR code (back)
+        ("address", (0.00, 0.12, 0.78, 0.82), "eng+hin", "--oem 3 --psm 6"),
+    ],
+    "pan_card": [
+        # Name / father's name / DOB column left of the photo (old and new layouts)
+        ("details", (0.00, 0.16, 0.78, 0.95), "eng", "--oem 3 --psm 6"),
+        # Sparse pass for the PAN itself, only when the details block did not yield it
+        ("number", (0.00, 0.16, 0.78, 0.80), "eng", f"--oem 3 --psm 11 {_PAN_CHARS}"),
+    ],
+}
+
+CARD_ROI_RESULTS = registry.counter(
+    "card_roi_total", "Region-of-interest card OCR by outcome (complete / partial / miss / error / skipped)")
+
+AADHAAR_NUMBER = re.compile(r"(?<!\d)([2-9]\d{3})\s?(\d{4})\s?(\d{4})(?!\s?\d)")
+PAN_NUMBER = re.compile(r"(?<![A-Z0-9])[A-Z]{5} ?[0-9]{4} ?[A-Z](?![A-Z0-9])")
+DATE = re.compile(r"\b(\d{2})[/-](\d{2})[/-](\d{4})\b")
+GENDER = re.compile(r"\b(female|male|transgender)\b", re.IGNORECASE)
+ADDRESS_LABEL = re.compile(r"address|पत्ता|पता", re.IGNORECASE)
+PINCODE = re.compile(r"(?<!\d)[1-9]\d{5}(?!\d)")
+# Title Case (Aadhaar) and UPPER CASE (PAN) name lines
+NAME_LINE = re.compile(r"^[A-Z][A-Za-z.']*(?: [A-Z][A-Za-z.']*){0,5}$")
+NAME_STOPWORDS = {
+    "government", "india", "govt", "dob", "birth", "male", "female", "aadhaar", "aadhar",
+    "issue", "income", "tax", "department", "permanent", "account", "number", "card",
+    "signature", "name", "father", "date", "address",
+}
+
+
+# ============================================
+# Aadhaar Verhoeff Checksum
+# ============================================
+_VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6], [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8], [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2], [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4], [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2], [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 6, 8, 7, 0], [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5], [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+
+
+def verhoeff_valid(number: str) -> bool:
+    """Verhoeff check digit (UIDAI's last Aadhaar digit); catches every single-digit OCR error"""
+    if not number.isdigit():
+        return False
+    check = 0
+    for i, digit in enumerate(reversed(number)):
+        check = _VERHOEFF_D[check][_VERHOEFF_P[i % 8][int(digit)]]
+    return check == 0
+
+
+# ============================================
+# Field Parsers
+# ============================================
+def _date(text: str) -> Optional[str]:
+    """First valid DD/MM/YYYY date in text"""
+    for day, month, year in DATE.findall(text):
+        value = f"{day}/{month}/{year}"
+        try:
+            datetime.strptime(value, "%d/%m/%Y")
+            return value
+        except ValueError:
+            continue
+    return None
+
+
+def _name(line: str) -> Optional[str]:
+    line = re.sub(r"\s+", " ", line).strip(" :-|")
+    if len(line) < 3 or not NAME_LINE.match(line):
+        return None
+    if any(word.lower().strip(".'") in NAME_STOPWORDS for word in line.split()):
+        return None
+    return line
+
+
+def find_aadhaar_number(text: str) -> Optional[str]:
+    for match in AADHAAR_NUMBER.finditer(text):
+        number = "".join(match.groups())
+        if verhoeff_valid(number):
+            return number
+    return None
+
+
+def find_pan_number(text: str) -> Optional[str]:
+    pan = PAN_NUMBER.search(text.upper())
+    return pan.group(0).replace(" ", "") if pan else None
+
+
+def parse_aadhaar_details(text: str) -> Dict[str, str]:
+    """Name (English line right above the DOB), DOB and gender from the front details block"""
+    fields = {}
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for i, line in enumerate(lines):
+        dob = _date(line)
+        if not dob:
+            continue
+        fields["dob"] = dob
+        for previous in reversed(lines[max(0, i - 2):i]):
+            name = _name(previous)
+            if name:
+                fields["name"] = name
+                break
+        break
+    gender = GENDER.search(text)
+    if gender:
+        fields["gender"] = gender.group(1).capitalize()
+    return fields
+
+
+def parse_aadhaar_address(text: str) -> Dict[str, str]:
+    """Address after the Address / पत्ता label (the English one when both are printed), and its pincode"""
+    labels = list(ADDRESS_LABEL.finditer(text))
+    if not labels:
+        return {}
+    english = [label for label in labels if label.group().lower() == "address"]
+    label = (english or labels)[0]
+    address = text[label.end():]
+    # Stop at the next label (the other-language block), the number band or the UIDAI footer
+    next_label = ADDRESS_LABEL.search(address)
+    if next_label:
+        address = address[:next_label.start()]
+    footer = re.search(r"(?<!\d)\d{4} \d{4} \d{4}(?!\d)|uidai|www\.|help@|1947", address, re.IGNORECASE)
+    if footer:
+        address = address[:footer.start()]
+    address = re.sub(r"\s+", " ", address).strip(" :,")
+    pincodes = PINCODE.findall(address)
+    if len(address) < 15 or not pincodes:
+        return {}
+    return {"address": address, "pincode": pincodes[-1]}
+
+
+def parse_pan_details(text: str) -> Dict[str, str]:
+    """PAN, name, father's name and DOB (labelled new layout, or the unlabelled old one)"""
+    fields = {}
+    pan = find_pan_number(text)
+    if pan:
+        fields["pan_number"] = pan
+    dob = _date(text)
+    if dob:
+        fields["date_of_birth"] = dob
+
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for i, line in enumerate(lines[:-1]):
+        key = "father_name" if re.search(r"father", line, re.IGNORECASE) else (
+            "name" if re.search(r"\bname\b", line, re.IGNORECASE) else None)
+        if key and key not in fields:
+            name = _name(lines[i + 1])
+            if name:
+                fields[key] = name
+    if "name" not in fields:
+        # Old layout: holder's name then father's name, in capitals, above the DOB
+        names = [name for name in map(_name, lines) if name and name.isupper()]
+        if names:
+            fields["name"] = names[0]
+        if len(names) > 1:
+            fields.setdefault("father_name", names[1])
+    return fields
+
+
+# ============================================
+# Card Location (worker side)
+# ============================================
+Box = Tuple[int, int, int, int]
+
+
+def _span(profile: "np.ndarray", threshold: float) -> Optional[Tuple[int, int]]:
+    active = np.flatnonzero(profile > threshold)
+    if len(active) == 0:
+        return None
+    return int(active[0]), int(active[-1]) + 1
+
+
+def _split(box: Box, ink: "np.ndarray", scale: float) -> List[Box]:
+    """Two cards in one photo (front above back, or side by side) → one box per card"""
+    left, top, right, bottom = box
+    aspect = (right - left) / max(bottom - top, 1)
+    if aspect < CARD_ASPECT * 0.8:
+        axis, start, end = 1, top, bottom
+    elif aspect > CARD_ASPECT * 1.6:
+        axis, start, end = 0, left, right
+    else:
+        return [box]
+    t0, t1 = int(start * scale), int(end * scale)
+    region = ink[t0:t1] if axis == 1 else ink[:, t0:t1]
+    profile = region.mean(axis=axis)
+    third = len(profile) // 3
+    if third == 0:
+        return [box]
+    # Cut at the emptiest line in the middle third
+    cut = start + int((third + int(np.argmin(profile[third:2 * third]))) / scale)
+    if axis == 1:
+        return [(left, top, right, cut), (left, cut, right, bottom)]
+    return [(left, top, cut, bottom), (cut, top, right, bottom)]
+
+
+def locate_cards(gray: Image.Image) -> List[Box]:
+    """
+    Card boxes in gray: the bright card area against a darker background, tightened to the
+    inked area when the card fills the frame (cropped photos, scans on white). Falls back to
+    the whole image without numpy.
+    """
+    full = (0, 0, gray.width, gray.height)
+    if np is None:
+        return [full]
+    thumb, scale = _thumbnail(gray)
+    ink = _ink_mask(thumb)
+    bright = np.asarray(thumb, dtype=np.uint8) > CARD_MIN_BRIGHTNESS
+    if bright.mean() > 0.85:
+        # Card (or a scan on white) fills the frame: tighten to the inked area
+        rows, cols = _span(ink.mean(axis=1), 0.002), _span(ink.mean(axis=0), 0.002)
+    else:
+        rows, cols = _span(bright.mean(axis=1), 0.5), _span(bright.mean(axis=0), 0.5)
+    if rows is None or cols is None:
+        return [full]
+
+    pad = int(0.02 * max(thumb.size))
+    box = (
+        int(max(cols[0] - pad, 0) / scale), int(max(rows[0] - pad, 0) / scale),
+        int(min(cols[1] + pad, thumb.width) / scale), int(min(rows[1] + pad, thumb.height) / scale),
+    )
+    return _split(box, ink, scale)
+
+
+def _crop(gray: Image.Image, card: Box, fraction: Tuple[float, float, float, float]) -> Image.Image:
+    left, top, right, bottom = card
+    width, height = right - left, bottom - top
+    return gray.crop((
+        left + int(fraction[0] * width), top + int(fraction[1] * height),
+        left + int(fraction[2] * width), top + int(fraction[3] * height),
+    ))
+
+
+# ============================================
+# Extraction Job (worker side)
+# ============================================
+def card_sides(document_type: str, fields: Dict[str, str]) -> List[str]:
+    """Which sides of the card have every required field"""
+    if document_type == "pan_card":
+        return ["front"] if all(fields.get(key) for key in ("pan_number", "name", "date_of_birth")) else []
+    sides = []
+    if all(fields.get(key) for key in ("aadhaar_number", "name", "dob", "gender")):
+        sides.append("front")
+    if fields.get("address") and fields.get("pincode"):
+        sides.append("back")
+    return sides
+
+
+def _read_region(group: str, text: str, document_type: str, fields: Dict[str, str]):
+    if document_type == "pan_card":
+        parsed = parse_pan_details(text) if group == "details" else {}
+        pan = find_pan_number(text) if group == "number" else None
+        if pan:
+            parsed["pan_number"] = pan
+    elif group == "number":
+        number = find_aadhaar_number(text)
+        parsed = {"aadhaar_number": number} if number else {}
+    elif group == "details":
+        parsed = parse_aadhaar_details(text)
+    else:
+        parsed = parse_aadhaar_address(text)
+    for key, value in parsed.items():
+        fields.setdefault(key, value)
+
+
+def extract_card_fields(file_bytes: bytes, extension: str, document_type: str,
+                        deadline: Optional[float] = None) -> Dict[str, Any]:
+    """
+    OCR the field regions of every card in the upload.
+    Returns the parsed fields, the sides that are complete and the region text (labels
+    included, so the callers' keyword checks still see "DOB", "Address", ...).
+    """
+    gray = normalize_for_ocr(load_pages(file_bytes, extension, deadline)[0]).convert("L")
+    fields: Dict[str, str] = {}
+    texts = []
+    for card in locate_cards(gray):
+        found: Dict[str, str] = {}
+        for group, fraction, lang, config in CARD_REGIONS[document_type]:
+            if group == "number" and document_type == "pan_card" and "pan_number" in found:
+                continue
+            # A card with a DOB or gender is a front: it has no address block to read
+            if group == "address" and ("dob" in found or "gender" in found):
+                continue
+            text = image_to_string(_crop(gray, card, fraction), lang, config, deadline)
+            texts.append(text)
+            _read_region(group, text, document_type, found)
+        for key, value in found.items():
+            fields.setdefault(key, value)
+        if document_type == "pan_card" and card_sides(document_type, fields):
+            break
+    return {"fields": fields, "sides": card_sides(document_type, fields), "text": "\n".join(texts)}
+
+
+# ============================================
+# Card Extraction (parent side)
+# ============================================
+def _cache_key(file_bytes: bytes, document_type: str) -> str:
+    config = {"card": document_type, "layout": CARD_LAYOUT_VERSION,
+              "normalize": OCR_NORMALIZE and NORMALIZATION_VERSION}
+    return ocr_cache_key(content_digest(file_bytes), 1, config)
+
+
+def extract_card(file_bytes: bytes, extension: str, document_type: str,
+                 timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """
+    Layout-aware extraction for Aadhaar / PAN photos, or None when it does not apply
+    (disabled, PDF upload, other document types) or fails. Callers check "sides" and fall
+    back to full OCR when the sides they need are missing.
+    """
+    if not CARD_ROI_ENABLED or document_type not in CARD_REGIONS or extension.lower() not in CARD_ROI_EXTENSIONS:
+        CARD_ROI_RESULTS.inc(outcome="skipped")
+        return None
+
+    key = _cache_key(file_bytes, document_type)
+    cached = ocr_result_cache.get(key)
+    if cached is not None:
+        return json.loads(cached)
+
+    try:
+        result = ocr_service.run(extract_card_fields, file_bytes, extension, document_type,
+                                 timeout=timeout or CARD_ROI_TIMEOUT_SECONDS)
+    except Exception as e:
+        print(f"⚠️ Card ROI OCR failed ({document_type}): {e}")
+        CARD_ROI_RESULTS.inc(outcome="error")
+        return None
+
+    expected = 1 if document_type == "pan_card" else 2
+    sides = len(result["sides"])
+    CARD_ROI_RESULTS.inc(outcome="complete" if sides == expected else "partial" if sides else "miss")
+    ocr_result_cache.set(key, json.dumps(result, ensure_ascii=False))
+    return result
+
+
+async def aextract_card(file_bytes: bytes, extension: str, document_type: str,
+                        timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """extract_card for async handlers (waits on a thread, never on the event loop)"""
+    return await asyncio.to_thread(extract_card, file_bytes, extension, document_type, timeout)
@@ -0,0 +1,302 @@
+"""
+Conversation Memory Module for Ladki Bahin Yojana
+Bounded prompt memory for the eligibility agent
+Answered eligibility criteria are kept as a structured record in session["checked_criteria"];
+only the last few turns are sent verbatim, older turns are compacted into that record,
+and every prompt is held to a per-session token budget
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Any
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("o200k_base")
+except Exception:  # tiktoken is optional, fall back to a character estimate
+    _ENCODING = None
+
+# ============================================
+# Memory Configuration
+# ============================================
+# Messages (user + assistant) sent verbatim after the system prompt
+MEMORY_RECENT_MESSAGES = int(os.getenv("MEMORY_RECENT_MESSAGES", "6"))
+
+# Prompt token budget per turn (system prompt + memory + recent turns)
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "3500"))
+
+# Free-text remarks kept from compacted turns that did not answer a known criterion
+MEMORY_MAX_NOTES = 5
+MEMORY_NOTE_CHARS = 160
+
+
+# ============================================
+# Eligibility Criteria
+# ============================================
+# criterion → keywords that identify the agent's question (English / Marathi / Hindi)
+CRITERIA_QUESTIONS = {
+    "age": ["your age", "how old", "वय किती", "उम्र"],
+    "gender": ["are you a woman", "are you female", "महिला आहात", "महिला हैं"],
+    "residency": ["resident of maharashtra", "महाराष्ट्राच्या कायमस्वरूपी", "महाराष्ट्र के स्थायी"],
+    "income_below_limit": ["annual income", "family income", "2.5 lakh", "2.50 lakh", "वार्षिक", "उत्पन्न", "कमाई", "आय "],
+    "own_bank_account": ["bank account", "बँक खात", "बँक खाते", "बैंक खाता", "खातं"],
+    "income_tax_payer": ["income tax", "इन्कम टॅक्स", "आयकर", "इनकम टैक्स"],
+    "govt_employee": ["government employee", "government job", "सरकारी नोकरी", "सरकारी कर्मचारी", "सरकारी नौकरी"],
+    "govt_pension": ["pension", "पेन्शन", "पेंशन"],
+    "political_position": ["mp/mla", "mla", "political", "आमदार", "खासदार", "विधायक", "सांसद"],
+    "four_wheeler": ["four-wheeler", "four wheeler", "चारचाकी", "चार पहिया", "चारपहिया"],
+    "existing_benefit": ["other government scheme", "₹1500", "1500", "दुसऱ्या कोणत्या योजने", "अन्य योजना", "दूसरी योजना"],
+    "marital_status": ["marital status", "वैवाहिक", "married"],
+}
+
+CRITERIA_LABELS = {
+    "age": "Age (years)",
+    "gender": "Gender",
+    "residency": "Maharashtra permanent resident",
+    "income_below_limit": "Family annual income below ₹2.5 lakh",
+    "own_bank_account": "Has own bank account",
+    "income_tax_payer": "Family member pays income tax",
+    "govt_employee": "Family member is permanent government employee",
+    "govt_pension": "Family member receives government pension",
+    "political_position": "Family member is MP/MLA/Board Chairman/Director",
+    "four_wheeler": "Family owns four-wheeler (tractor exempt)",
+    "existing_benefit": "Receives ₹1500+ from another government scheme",
+    "marital_status": "Marital status",
+}
+
+# No copulas ("आहे", "है"): they end statements like "माझं उत्पन्न 3 लाख आहे" and are not a yes
+YES_WORDS = {"yes", "y", "ho", "hoy", "haan", "han", "ha", "होय", "हो", "हां", "हाँ"}
+NO_WORDS = {"no", "n", "nahi", "nahin", "nhi", "नाही", "नहीं", "नको", "नाहीये", "नही"}
+
+MARITAL_STATUS = {
+    "unmarried": ["unmarried", "single", "अविवाहित"],
+    "married": ["married", "विवाहित"],
+    "widow": ["widow", "विधवा"],
+    "divorced": ["divorced", "घटस्फोटित", "तलाकशुदा"],
+    "abandoned": ["abandoned", "परित्यक्ता"],
+}
+
+_WORD = re.compile(r"[a-z]+|[ऀ-ॿ]+")
+
+
+# ============================================
+# Token Estimation
+# ============================================
+def estimate_tokens(text: str) -> int:
+    """Prompt tokens for text (tiktoken when installed, else a script-aware estimate)"""
+    if not text:
+        return 0
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    # ~4 Latin chars per token; Devanagari tokenizes much denser
+    ascii_chars = sum(1 for c in text if ord(c) < 128)
+    return ascii_chars // 4 + int((len(text) - ascii_chars) / 1.5) + 1
+
+
+def estimate_message_tokens(messages: List[Dict[str, str]]) -> int:
+    """Chat-format overhead is ~4 tokens per message"""
+    return sum(estimate_tokens(m.get("content") or "") + 4 for m in messages) + 2
+
+
+# ============================================
+# Answer Extraction
+# ============================================
+def identify_criterion(question: str) -> Optional[str]:
+    """Which eligibility criterion an agent message asks about (the last one mentioned wins)"""
+    if not question or "?" not in question:
+        return None
+    # Only the asked sentence matters, not the acknowledgement before it
+    asked = question.strip().rsplit("\n", 1)[-1].lower()
+    best, best_pos = None, -1
+    for criterion, keywords in CRITERIA_QUESTIONS.items():
+        for keyword in keywords:
+            pos = asked.rfind(keyword)
+            if pos > best_pos:
+                best, best_pos = criterion, pos
+    return best
+
+
+QUESTION_WORDS = {"what", "how", "why", "when", "where", "which", "who", "can", "should", "documents",
+                  "काय", "कसे", "कशी", "का", "कोणती", "कोणते", "कधी", "कुठे", "कागदपत्रे",
+                  "क्या", "कैसे", "क्यों", "कब", "कहाँ", "कौन", "दस्तावेज"}
+
+
+def looks_like_question(text: str) -> bool:
+    """A side question from the user rather than an answer to the agent's question"""
+    text = text.strip().lower()
+    if text.endswith("?"):
+        return True
+    words = _WORD.findall(text)
+    return len(words) > 3 and bool(set(words) & QUESTION_WORDS)
+
+
+def normalize_answer(criterion: str, answer: str) -> Optional[str]:
+    """yes / no / marital status from a user reply, or None if the reply is not a clear answer"""
+    text = answer.strip().lower()
+    if not text:
+        return None
+    if criterion == "marital_status":
+        # "unmarried" contains "married" → check the longer terms first
+        for status, words in MARITAL_STATUS.items():
+            if any(w in text for w in words):
+                return status
+        return None
+    words = set(_WORD.findall(text))
+    if words & NO_WORDS:
+        return "no"
+    if words & YES_WORDS:
+        return "yes"
+    return None
+
+
+# ============================================
+# Conversation Memory
+# ============================================
+class ConversationMemory:
+    """Builds the bounded message list for one eligibility turn and keeps per-session usage"""
+
+    def __init__(self, recent_messages: int = MEMORY_RECENT_MESSAGES, token_budget: int = MEMORY_TOKEN_BUDGET):
+        self.recent_messages = recent_messages
+        self.token_budget = token_budget
+        self._lock = threading.Lock()
+        self._totals = {"turns": 0, "compacted_messages": 0, "trimmed_messages": 0,
+                        "over_budget_turns": 0, "prompt_tokens_sent": 0, "prompt_tokens_saved": 0}
+
+    def record_answer(self, session: Dict[str, Any], user_message: str):
+        """Store the user's reply against the criterion the last agent message asked about"""
+        messages = session.get("messages") or []
+        if not messages or messages[-1].get("role") != "assistant":
+            return
+        criterion = identify_criterion(messages[-1].get("content", ""))
+        if not criterion or looks_like_question(user_message):
+            return
+        answer = normalize_answer(criterion, user_message)
+        checked = session.setdefault("checked_criteria", {})
+        if answer:
+            checked[criterion] = answer
+        else:
+            # Free-form reply: keep it short so the agent can still use it
+            checked[criterion] = user_message.strip()[:MEMORY_NOTE_CHARS]
+
+    def _compact(self, session: Dict[str, Any]) -> int:
+        """Move messages older than the recent window out of the stored history"""
+        messages = session.get("messages") or []
+        overflow = len(messages) - self.recent_messages
+        if overflow <= 0:
+            return 0
+        # Keep the window starting on a user message so roles still alternate
+        if messages[overflow].get("role") == "assistant":
+            overflow += 1
+        old, session["messages"] = messages[:overflow], messages[overflow:]
+        session["compacted_tokens"] = session.get("compacted_tokens", 0) + estimate_message_tokens(old)
+
+        notes = session.setdefault("memory_notes", [])
+        prev = session.get("last_compacted_question", "")
+        for msg in old:
+            content = msg.get("content") or ""
+            if msg.get("role") == "assistant":
+                prev = content
+                continue
+            # Answers to known questions already live in checked_criteria
+            if content and not identify_criterion(prev):
+                notes.append(content.strip()[:MEMORY_NOTE_CHARS])
+            prev = ""
+        session["last_compacted_question"] = prev
+        del notes[:-MEMORY_MAX_NOTES]
+
+        session["compacted_messages"] = session.get("compacted_messages", 0) + len(old)
+        return len(old)
+
+    def memory_block(self, session: Dict[str, Any]) -> Optional[str]:
+        """Structured summary of what the user already told the agent"""
+        checked = session.get("checked_criteria") or {}
+        notes = session.get("memory_notes") or []
+        if not checked and not notes:
+            return None
+        lines = ["CONVERSATION MEMORY (earlier turns, already answered - do NOT ask these again):"]
+        for criterion, answer in checked.items():
+            lines.append(f"- {CRITERIA_LABELS.get(criterion, criterion)}: {answer}")
+        if notes:
+            lines.append("Other things the user said earlier:")
+            lines.extend(f"- {note}" for note in notes)
+        return "\n".join(lines)
+
+    def build_messages(self, session: Dict[str, Any], system_prompt: str) -> List[Dict[str, str]]:
+        """
+        System prompt, memory block and the recent turns, trimmed to the token budget.
+        The static system prompt stays the first message so its prefix is cacheable.
+        """
+        # What the unbounded prompt (system prompt + every turn so far) would cost
+        unbounded = (estimate_tokens(system_prompt) + session.get("compacted_tokens", 0)
+                     + estimate_message_tokens(session.get("messages") or []))
+        compacted = self._compact(session)
+
+        head = [{"role": "system", "content": system_prompt}]
+        block = self.memory_block(session)
+        if block:
+            head.append({"role": "system", "content": block})
+
+        recent = list(session.get("messages") or [])
+        head_tokens = estimate_message_tokens(head)
+        trimmed = 0
+        # Drop the oldest recent messages while over budget, never the current user message
+        while len(recent) > 1 and head_tokens + estimate_message_tokens(recent) > self.token_budget:
+            recent.pop(0)
+            trimmed += 1
+        if recent and recent[0].get("role") == "assistant" and len(recent) > 1:
+            recent.pop(0)
+            trimmed += 1
+
+        messages = head + recent
+        prompt_tokens = estimate_message_tokens(messages)
+        over_budget = prompt_tokens > self.token_budget
+
+        usage = session.setdefault("memory_usage", {"turns": 0, "prompt_tokens_total": 0})
+        usage["turns"] += 1
+        usage["prompt_tokens_last"] = prompt_tokens
+        usage["prompt_tokens_total"] += prompt_tokens
+        usage["token_budget"] = self.token_budget
+        usage["over_budget"] = over_budget
+        usage["messages_sent"] = len(messages)
+        usage["compacted_messages"] = session.get("compacted_messages", 0)
+
+        with self._lock:
+            self._totals["turns"] += 1
+            self._totals["compacted_messages"] += compacted
+            self._totals["trimmed_messages"] += trimmed
+            self._totals["over_budget_turns"] += over_budget
+            self._totals["prompt_tokens_sent"] += prompt_tokens
+            self._totals["prompt_tokens_saved"] += max(unbounded - prompt_tokens, 0)
+
+        if over_budget:
+            print(f"⚠️ Eligibility prompt over budget: {prompt_tokens} > {self.token_budget} tokens")
+        return messages
+
+    def record_usage(self, session: Dict[str, Any], usage: Any):
+        """Store the provider-reported token usage of the last completion"""
+        if usage is None:
+            return
+        report = session.setdefault("memory_usage", {"turns": 0, "prompt_tokens_total": 0})
+        report["actual_prompt_tokens_last"] = getattr(usage, "prompt_tokens", None)
+        report["actual_completion_tokens_last"] = getattr(usage, "completion_tokens", None)
+
+    def session_report(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "checked_criteria": dict(session.get("checked_criteria") or {}),
+            "memory_notes": list(session.get("memory_notes") or []),
+            "recent_messages": len(session.get("messages") or []),
+            **(session.get("memory_usage") or {}),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self._totals)
+        totals["avg_prompt_tokens"] = round(totals["prompt_tokens_sent"] / totals["turns"], 1) if totals["turns"] else 0.0
+        totals["token_budget"] = self.token_budget
+        totals["recent_messages"] = self.recent_messages
+        return totals
+
+
+# Global memory manager instance
+conversation_memory = ConversationMemory()
@@ -0,0 +1,88 @@
+"""
+Deadline Module for Ladki Bahin Yojana
+Per-request latency budget carried in a context variable
+The budget flows into worker threads (asyncio.to_thread copies the context), so every
+LLM-dependent step can check what is left and fall back to its local alternative
+(English templates, basic_extract, local language detection) instead of stacking slow calls
+"""
+
+import os
+import time
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Optional
+
+from metrics import registry
+
+# ============================================
+# Deadline Configuration
+# ============================================
+# Whole-turn budget for one chat request
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "12"))
+
+# An LLM step is only started with at least this much budget left
+LLM_MIN_BUDGET_SECONDS = float(os.getenv("LLM_MIN_BUDGET_SECONDS", "1.5"))
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+DEADLINE_FALLBACKS = registry.counter(
+    "deadline_fallbacks_total", "LLM steps skipped for their local fallback because the request budget ran low")
+DEADLINE_EXCEEDED = registry.counter(
+    "deadline_exceeded_total", "Requests that finished after their latency budget")
+
+
+# ============================================
+# Deadline Helpers
+# ============================================
+@contextmanager
+def deadline_scope(seconds: float = REQUEST_DEADLINE_SECONDS, name: str = "request"):
+    """Set a deadline for the enclosed work; a nested scope can only shorten an outer one"""
+    now = time.monotonic()
+    outer = _deadline.get()
+    deadline = now + seconds if outer is None else min(outer, now + seconds)
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        if outer is None and time.monotonic() > deadline:
+            DEADLINE_EXCEEDED.inc(scope=name)
+        _deadline.reset(token)
+
+
+def with_deadline(seconds: float = REQUEST_DEADLINE_SECONDS, name: Optional[str] = None):
+    """Decorator form of deadline_scope for synchronous agent entry points"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with deadline_scope(seconds, name or func.__name__):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request budget (None when no deadline is set)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def has_budget(min_seconds: float = LLM_MIN_BUDGET_SECONDS) -> bool:
+    left = remaining()
+    return left is None or left >= min_seconds
+
+
+def call_timeout(default: Optional[float] = None) -> Optional[float]:
+    """Timeout for one outbound call: the smaller of default and the remaining budget"""
+    left = remaining()
+    if left is None:
+        return default
+    left = max(left, 0.1)
+    return left if default is None else min(default, left)
+
+
+def record_fallback(step: str):
+    DEADLINE_FALLBACKS.inc(step=step)
+    print(f"⏱️ Deadline: skipping LLM for '{step}', using local fallback ({remaining() or 0.0:.1f}s left)")
@@ -0,0 +1,211 @@
+"""
+Document Cache Module for Ladki Bahin Yojana
+In-memory TTL + LRU caches for document processing results
+Re-uploads of the same Aadhaar / PAN / passbook after a validation failure or mode switch
+reuse the structured parse instead of paying for another LLM completion.
+Keys are SHA-256 digests, so no Aadhaar numbers, names or OCR text appear in them; values
+stay in process memory unless the OCR disk tier is explicitly enabled (OCR_CACHE_DIR)
+"""
+
+import os
+import re
+import copy
+import time
+import hashlib
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# ============================================
+# Cache Configuration
+# ============================================
+DOCUMENT_PARSE_CACHE_SIZE = int(os.getenv("DOCUMENT_PARSE_CACHE_SIZE", "1000"))
+DOCUMENT_PARSE_CACHE_TTL = int(os.getenv("DOCUMENT_PARSE_CACHE_TTL", "3600"))
+
+# OCR text per page; the byte cap bounds memory regardless of page count
+OCR_CACHE_SIZE = int(os.getenv("OCR_CACHE_SIZE", "5000"))
+OCR_CACHE_MAX_BYTES = int(os.getenv("OCR_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", "3600"))
+# Optional local disk tier (holds OCR text of identity documents: keep it on an encrypted,
+# instance-local volume); empty disables it
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", "")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+# ============================================
+# TTL Cache
+# ============================================
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire ttl_seconds after they were stored"""
+
+    def __init__(self, max_size: int, ttl_seconds: float, max_weight: Optional[int] = None,
+                 weigh: Optional[Callable[[Any], int]] = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        # Optional second cap on the summed weight (e.g. bytes) of the values
+        self.max_weight = max_weight
+        self.weigh = weigh or (lambda value: 0)
+        self.weight = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.weight -= self.weigh(value)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Callers normalize/mutate parsed dicts, never hand out the cached object
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.weight -= self.weigh(previous[1])
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, copy.deepcopy(value))
+            self.weight += self.weigh(value)
+            while len(self._entries) > self.max_size or (
+                    self.max_weight is not None and self.weight > self.max_weight and len(self._entries) > 1):
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.weight -= self.weigh(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.weight = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                **({"weight": self.weight, "max_weight": self.max_weight} if self.max_weight is not None else {}),
+            }
+
+
+# ============================================
+# Document Parse Cache
+# ============================================
+def normalize_ocr_text(text: str) -> str:
+    """OCR output of the same image differs only in whitespace between runs"""
+    return _WHITESPACE.sub(" ", text or "").strip()
+
+
+def parse_cache_key(document_type: str, text: str, prompt_version: str) -> str:
+    """SHA-256 over (document type, prompt version, normalized OCR text)"""
+    digest = hashlib.sha256()
+    for part in (document_type, prompt_version, normalize_ocr_text(text)):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+# Shared by registration (DocumentIntelligence), pre-registration and the Aadhaar utils
+document_parse_cache = TTLCache(DOCUMENT_PARSE_CACHE_SIZE, DOCUMENT_PARSE_CACHE_TTL)
+
+
+# ============================================
+# OCR Result Cache
+# ============================================
+def content_digest(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def ocr_cache_key(digest: str, page: int, ocr_config: Dict[str, Any]) -> str:
+    """SHA-256 over (content digest, page, OCR settings); page 0 holds the PDF page count"""
+    config = json.dumps(ocr_config, sort_keys=True, default=str)
+    return hashlib.sha256(f"{digest}\x00{page}\x00{config}".encode("utf-8")).hexdigest()
+
+
+class OCRResultCache:
+    """
+    OCR text per (document bytes, page, OCR settings).
+    Memory tier: TTL + LRU with entry and byte caps. Disk tier (optional): one file per key
+    under OCR_CACHE_DIR, expired by modification time, promoted to memory on a hit.
+    """
+
+    def __init__(self, max_size: int = OCR_CACHE_SIZE, max_bytes: int = OCR_CACHE_MAX_BYTES,
+                 ttl_seconds: float = OCR_CACHE_TTL, disk_dir: str = OCR_CACHE_DIR):
+        self.memory = TTLCache(max_size, ttl_seconds, max_weight=max_bytes,
+                               weigh=lambda text: len(text.encode("utf-8")))
+        self.ttl_seconds = ttl_seconds
+        self.disk_dir = disk_dir or None
+        self.disk_hits = 0
+        self.disk_errors = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, mode=0o700, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.txt")
+
+    def get(self, key: str) -> Optional[str]:
+        text = self.memory.get(key)
+        if text is not None or not self.disk_dir:
+            return text
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl_seconds:
+                os.unlink(path)
+                return None
+            with open(path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            self.disk_errors += 1
+            print(f"⚠️ OCR disk cache read failed: {e}")
+            return None
+        self.disk_hits += 1
+        self.memory.set(key, text)
+        return text
+
+    def set(self, key: str, text: str):
+        self.memory.set(key, text)
+        if not self.disk_dir:
+            return
+        try:
+            # Write-then-rename so concurrent readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            self.disk_errors += 1
+            print(f"⚠️ OCR disk cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.memory.stats(), "disk_enabled": bool(self.disk_dir),
+                "disk_hits": self.disk_hits, "disk_errors": self.disk_errors}
+
+
+# Shared by every OCR path (registration, pre-/post-registration and the Aadhaar utils)
+ocr_result_cache = OCRResultCache()
@@ -0,0 +1,478 @@
+"""
+Eligibility Engine Module for Ladki Bahin Yojana
+Deterministic eligibility interview driven by ELIGIBILITY_RULES
+Walks the question sequence locally, evaluates each answer against the scheme rules and
+stops at the first disqualifying answer. The LLM is only used to interpret replies the
+local parser cannot read and to phrase questions in languages missing from the bank
+(those phrasings are cached), so the verdict is reproducible
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Any, Callable
+
+from eligibility_rules import ELIGIBILITY_RULES
+from conversation_memory import normalize_answer, looks_like_question, MARITAL_STATUS
+from translation_cache import translation_cache, placeholders_preserved
+from translation_catalog import get_translation_catalog, ELIGIBILITY_NAMESPACE
+
+# ============================================
+# Engine Configuration
+# ============================================
+ELIGIBILITY_ENGINE_ENABLED = os.getenv("ELIGIBILITY_ENGINE_ENABLED", "true").lower() == "true"
+
+# Asked only when the Aadhaar card did not already answer them
+IDENTITY_CRITERIA = ["age", "gender", "residency"]
+
+# Same order as the QUESTION SEQUENCE in the agent's system prompt
+QUESTION_SEQUENCE = [
+    "income_below_limit",
+    "own_bank_account",
+    "income_tax_payer",
+    "govt_employee",
+    "govt_pension",
+    "political_position",
+    "four_wheeler",
+    "existing_benefit",
+    "marital_status",
+]
+
+FULL_SEQUENCE = IDENTITY_CRITERIA + QUESTION_SEQUENCE
+
+# criterion → answer that makes the applicant NOT ELIGIBLE
+DISQUALIFYING_ANSWERS = {
+    "residency": "no",
+    "income_below_limit": "no",
+    "income_tax_payer": "yes",
+    "govt_employee": "yes",
+    "govt_pension": "yes",
+    "political_position": "yes",
+    "four_wheeler": "yes",
+    "existing_benefit": "yes",
+}
+
+ELIGIBILITY_WORDS = ["eligib", "qualify", "पात्र", "योग्य", "पात्रता"]
+
+
+# ============================================
+# Message Bank (per-language, English is the source)
+# ============================================
+ENGINE_MESSAGES = {
+    "q_age": {
+        "english": "What is your age?",
+        "marathi": "तुमचं वय किती आहे?",
+    },
+    "q_gender": {
+        "english": "Are you a woman?",
+        "marathi": "तुम्ही महिला आहात का?",
+    },
+    "q_residency": {
+        "english": "Are you a permanent resident of Maharashtra?",
+        "marathi": "तुम्ही महाराष्ट्राच्या कायमस्वरूपी रहिवासी आहात का?",
+    },
+    "q_income_below_limit": {
+        "english": "Is your family's annual income less than ₹2.5 lakh?",
+        "marathi": "तुमच्या घरची वार्षिक कमाई 2.5 लाखांपेक्षा कमी आहे का?",
+    },
+    "q_own_bank_account": {
+        "english": "Do you have your own bank account?",
+        "marathi": "तुमचं स्वतःचं बँक खातं आहे का?",
+    },
+    "q_income_tax_payer": {
+        "english": "Does anyone in your family pay income tax?",
+        "marathi": "तुमच्या घरातलं कोणी इन्कम टॅक्स भरतो का?",
+    },
+    "q_govt_employee": {
+        "english": "Is anyone in your family a permanent government employee?",
+        "marathi": "तुमच्या घरातलं कोणी सरकारी नोकरीत आहे का?",
+    },
+    "q_govt_pension": {
+        "english": "Does anyone in your family receive a government pension?",
+        "marathi": "तुमच्या घरातल्या कोणाला पेन्शन मिळतं का?",
+    },
+    "q_political_position": {
+        "english": "Is anyone in your family an MP, MLA, or Board Chairman/Director?",
+        "marathi": "तुमच्या घरातलं कोणी आमदार, खासदार अशा पदावर आहे का?",
+    },
+    "q_four_wheeler": {
+        "english": "Does your family own a four-wheeler? (tractor excluded)",
+        "marathi": "तुमच्या घरी चारचाकी गाडी आहे का? (ट्रॅक्टर नाही)",
+    },
+    "q_existing_benefit": {
+        "english": "Are you already receiving ₹1500 or more per month from any other government scheme?",
+        "marathi": "तुम्हाला आधीच दुसऱ्या कोणत्या योजनेतून महिन्याला 1500 रुपये किंवा त्यापेक्षा जास्त मिळतंय का?",
+    },
+    "q_marital_status": {
+        "english": "What is your marital status? (Unmarried/Married/Widow/Divorced)",
+        "marathi": "तुमची वैवाहिक स्थिती काय आहे? (अविवाहित/विवाहित/विधवा/घटस्फोटित)",
+    },
+    "clarify_yes_no": {
+        "english": "Please answer yes or no.",
+        "marathi": "कृपया होय किंवा नाही असे उत्तर द्या.",
+    },
+    "clarify_age": {
+        "english": "Please tell me your age in years.",
+        "marathi": "कृपया तुमचं वय वर्षांमध्ये सांगा.",
+    },
+    "clarify_marital_status": {
+        "english": "Please choose one of the options.",
+        "marathi": "कृपया दिलेल्या पर्यायांपैकी एक निवडा.",
+    },
+    "verdict_eligible": {
+        "english": "Based on the information provided, you are ELIGIBLE for Ladki Bahin Yojana.",
+        "marathi": "दिलेल्या माहितीनुसार, तुम्ही लाडकी बहीण योजनेसाठी पात्र आहात.",
+    },
+    "verdict_not_eligible": {
+        "english": "You are NOT ELIGIBLE for Ladki Bahin Yojana. Reason: {reason}",
+        "marathi": "तुम्ही लाडकी बहीण योजनेसाठी अपात्र आहात. कारण: {reason}",
+    },
+    "reason_age": {
+        "english": "Age must be between {min_age} and {max_age} years",
+        "marathi": "वय {min_age} ते {max_age} वर्षांच्या दरम्यान असणे आवश्यक आहे",
+    },
+    "reason_gender": {
+        "english": "Only women are eligible",
+        "marathi": "फक्त महिला पात्र आहेत",
+    },
+    "reason_residency": {
+        "english": "Must be a permanent resident of Maharashtra",
+        "marathi": "महाराष्ट्राचे कायमस्वरूपी रहिवासी असणे आवश्यक आहे",
+    },
+    "reason_income_below_limit": {
+        "english": "Annual family income exceeds ₹{max_income}",
+        "marathi": "वार्षिक कौटुंबिक उत्पन्न मर्यादा ओलांडली (₹{max_income})",
+    },
+    "reason_income_tax_payer": {
+        "english": "A family member pays income tax",
+        "marathi": "कुटुंबातील सदस्य इन्कम टॅक्स भरतो",
+    },
+    "reason_govt_employee": {
+        "english": "A family member is a permanent government employee",
+        "marathi": "कुटुंबातील सदस्य सरकारी नोकरीत आहे",
+    },
+    "reason_govt_pension": {
+        "english": "A family member receives a government pension",
+        "marathi": "कुटुंबातील सदस्याला सरकारी पेन्शन मिळते",
+    },
+    "reason_political_position": {
+        "english": "A family member is an MP/MLA/Board Chairman/Director",
+        "marathi": "कुटुंबातील सदस्य आमदार/खासदार/मंडळ अध्यक्ष/संचालक आहे",
+    },
+    "reason_four_wheeler": {
+        "english": "The family owns a four-wheeler",
+        "marathi": "कुटुंबाकडे चारचाकी वाहन आहे",
+    },
+    "reason_existing_benefit": {
+        "english": "Already receiving ₹1500 or more from another government scheme",
+        "marathi": "दुसऱ्या सरकारी योजनेतून आधीच ₹1500 किंवा जास्त मिळतात",
+    },
+}
+
+
+def english_templates() -> Dict[str, str]:
+    """English source strings (input for the translation catalog build)"""
+    return {key: texts["english"] for key, texts in ENGINE_MESSAGES.items()}
+
+
+# ============================================
+# Local Answer Parsing
+# ============================================
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+_AMOUNT = re.compile(r"(\d+(?:[.,]\d+)*)\s*(lakh|lac|lakhs|लाख|k|thousand|हजार|हज़ार)?")
+_TOKEN = re.compile(r"[a-z]+|[ऀ-ॿ]+")
+# "I'm", "she's", "don't": the clitic would otherwise tokenize as a word ("m" → male)
+_CONTRACTION = re.compile(r"(?<=[a-z])['’](?:m|s|re|ve|ll|d|t)\b")
+_FEMALE = {"female", "woman", "महिला", "स्त्री", "औरत"}
+_MALE = {"male", "man", "पुरुष", "मर्द"}
+# Single-letter answers count only when they are the whole reply
+_GENDER_LETTERS = {"f": "female", "m": "male"}
+# Comparatives around an income figure ("more than 2.5 lakh", "2.5 लाखांपेक्षा जास्त")
+_ABOVE_WORDS = {"above", "over", "exceed", "exceeds", "exceeding", "more", "greater", "higher",
+                "जास्त", "ज़्यादा", "ज्यादा", "अधिक"}
+_BELOW_WORDS = {"below", "under", "less", "lower", "within", "कमी", "कम", "आत"}
+# A bare number under this ("my income is 3") is not read as rupees
+MIN_BARE_INCOME = 1000
+# Ages outside this range (or a 4-digit year) need the LLM or the question again
+AGE_RANGE = (1, 120)
+
+
+def parse_amount(text: str) -> Optional[float]:
+    """
+    Rupee amount from "1.5 lakh", "1,50,000", "२ लाख", "90k"; None if there is no number,
+    or only a bare number too small to be an annual income
+    """
+    match = _AMOUNT.search(text.translate(_DEVANAGARI_DIGITS).lower())
+    if not match:
+        return None
+    number, unit = match.groups()
+    # "1,50,000" uses Indian digit grouping
+    value = float(number.replace(",", ""))
+    if unit is None and value < MIN_BARE_INCOME:
+        return None
+    if unit in ("lakh", "lac", "lakhs", "लाख"):
+        value *= 100000
+    elif unit in ("k", "thousand", "हजार", "हज़ार"):
+        value *= 1000
+    return value
+
+
+def parse_answer(criterion: str, reply: str,
+                 check_rule: Optional[Callable[[str, Any], tuple]] = None) -> Optional[Any]:
+    """
+    Local interpretation of a reply, or None if it needs the LLM.
+    Income amounts are judged by check_rule (check_eligibility_rule); without it they go to the LLM.
+    """
+    text = reply.strip().lower()
+    if not text:
+        return None
+    if criterion == "age":
+        digits = text.translate(_DEVANAGARI_DIGITS)
+        if re.search(r"\d{4}", digits):
+            # A birth year: the LLM works out the age
+            return None
+        match = re.search(r"(?<!\d)\d{1,3}(?!\d)", digits)
+        if not match or not AGE_RANGE[0] <= int(match.group()) <= AGE_RANGE[1]:
+            return None
+        return int(match.group())
+    if criterion == "gender":
+        letter = text.strip(" .!")
+        if letter in _GENDER_LETTERS:
+            return _GENDER_LETTERS[letter]
+        words = set(_TOKEN.findall(_CONTRACTION.sub("", text)))
+        if words & _FEMALE:
+            return "female"
+        if words & _MALE:
+            return "male"
+        answer = normalize_answer(criterion, reply)
+        return {"yes": "female", "no": "male"}.get(answer)
+    if criterion == "income_below_limit":
+        return _parse_income(text, check_rule)
+    return normalize_answer(criterion, reply)
+
+
+def _parse_income(text: str, check_rule: Optional[Callable[[str, Any], tuple]]) -> Optional[str]:
+    """
+    Answer to "is the family income below the limit?".
+    An explicit yes/no wins ("no, more than 2.5 lakh"); then a comparative around a figure
+    ("above 2.5 lakh"); then a plain amount judged by check_rule. Anything else → LLM.
+    """
+    answer = normalize_answer("income_below_limit", text)
+    if answer:
+        return answer
+    amount = parse_amount(text)
+    if amount is None or check_rule is None:
+        return None
+    words = set(_TOKEN.findall(text))
+    if words & _ABOVE_WORDS:
+        # "more than X" is over the limit only when X itself reaches it
+        still_within, _ = check_rule("income", amount + 1)
+        return None if still_within else "no"
+    passed, _ = check_rule("income", amount)
+    if words & _BELOW_WORDS:
+        # "less than X" is within the limit only when X itself is
+        return "yes" if passed else None
+    return "yes" if passed else "no"
+
+
+def is_answered(criterion: str, value: Any) -> bool:
+    if value is None or value == "":
+        return False
+    if criterion == "age":
+        return isinstance(value, int)
+    if criterion == "gender":
+        return value in ("female", "male")
+    if criterion == "marital_status":
+        return value in MARITAL_STATUS
+    return value in ("yes", "no")
+
+
+# ============================================
+# Eligibility Engine
+# ============================================
+class EligibilityEngine:
+    """
+    Local state machine over session["checked_criteria"].
+    check_rule is pre_registration's check_eligibility_rule (age/gender/income/residency rules);
+    complete(messages, max_tokens) -> Optional[str] is the LLM hook for interpretation/phrasing.
+    """
+
+    def __init__(self, check_rule: Callable[[str, Any], tuple],
+                 complete: Optional[Callable[[List[Dict[str, str]], int], Optional[str]]] = None):
+        self.check_rule = check_rule
+        self.complete = complete
+        self.catalog = get_translation_catalog()
+        self._lock = threading.Lock()
+        self._stats = {"local_turns": 0, "llm_interpretations": 0, "llm_phrasings": 0,
+                       "clarifications": 0, "deferred_to_agent": 0,
+                       "verdict_eligible": 0, "verdict_not_eligible": 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    # ---------- phrasing ----------
+    def message(self, key: str, language: str, **kwargs) -> str:
+        """Bank → compiled catalog → translation cache → LLM (cached) → English"""
+        texts = ENGINE_MESSAGES[key]
+        template = texts.get(language)
+        if template is None:
+            english = texts["english"]
+            template = self.catalog.lookup(ELIGIBILITY_NAMESPACE, key, language, english)
+            if template is None:
+                template = translation_cache.get(f"eligibility.{key}", language, english)
+            if template is None:
+                template = self._translate(english, language)
+                if template and placeholders_preserved(english, template):
+                    translation_cache.set(f"eligibility.{key}", language, english, template)
+                else:
+                    template = english
+        return template.format(**kwargs) if kwargs else template
+
+    def _translate(self, text: str, language: str) -> Optional[str]:
+        if not self.complete:
+            return None
+        self._count("llm_phrasings")
+        return self.complete([
+            {"role": "system", "content": (
+                f"Translate this question from a government scheme eligibility interview into simple, "
+                f"conversational {language}. Keep any {{placeholders}} and numbers unchanged. "
+                f"Return ONLY the translation.")},
+            {"role": "user", "content": text},
+        ], 200)
+
+    def _interpret(self, criterion: str, question: str, reply: str) -> Optional[Any]:
+        """Ask the LLM to map a free-form reply onto the allowed answers"""
+        if not self.complete:
+            return None
+        if criterion == "age":
+            allowed = "the age in years as a number, or unclear"
+        elif criterion == "marital_status":
+            allowed = ", ".join(MARITAL_STATUS) + ", or unclear"
+        elif criterion == "gender":
+            allowed = "female, male, or unclear"
+        else:
+            allowed = "yes, no, or unclear"
+        self._count("llm_interpretations")
+        raw = self.complete([
+            {"role": "system", "content": (
+                "You map a user's reply in a Ladki Bahin Yojana eligibility interview (English, Hindi or "
+                f"Marathi) to a fixed answer. Allowed answers: {allowed}. Reply with the answer only.")},
+            {"role": "user", "content": f"Question: {question}\nReply: {reply}"},
+        ], 5)
+        if not raw:
+            return None
+        value = raw.strip().lower().strip(".\"' ")
+        if criterion == "age":
+            return int(value) if value.isdigit() else None
+        return value if is_answered(criterion, value) else None
+
+    # ---------- rules ----------
+    def _prefill(self, checked: Dict[str, Any], aadhaar_data: Optional[Dict[str, Any]]):
+        """Age, gender and residency are already verified when Aadhaar was provided"""
+        if not aadhaar_data:
+            return
+        age = str(aadhaar_data.get("age", "")).strip()
+        if age.isdigit():
+            checked.setdefault("age", int(age))
+        gender = parse_answer("gender", str(aadhaar_data.get("gender") or ""))
+        if gender:
+            checked.setdefault("gender", gender)
+        checked.setdefault("residency", "yes")
+
+    def _failure_reason(self, criterion: str, value: Any, language: str) -> Optional[str]:
+        rules = ELIGIBILITY_RULES
+        if criterion == "age":
+            passed, _ = self.check_rule("age", value)
+            return None if passed else self.message(
+                "reason_age", language, min_age=rules["age"]["min"], max_age=rules["age"]["max"])
+        if criterion == "gender":
+            passed, _ = self.check_rule("gender", value)
+            return None if passed else self.message("reason_gender", language)
+        if criterion == "income_below_limit" and value == "no":
+            return self.message("reason_income_below_limit", language,
+                                max_income=f"{rules['income']['max_annual']:,}")
+        if DISQUALIFYING_ANSWERS.get(criterion) == value:
+            return self.message(f"reason_{criterion}", language)
+        return None
+
+    # ---------- turn ----------
+    def handle_turn(self, session: Dict[str, Any], user_message: str,
+                    aadhaar_data: Optional[Dict[str, Any]], language: str) -> Optional[Dict[str, Any]]:
+        """
+        One interview turn. Returns {"response", "is_complete"}, or None when the turn
+        should go to the LLM agent (side questions, or follow-ups after the verdict).
+        """
+        if session.get("eligibility_status"):
+            return None
+
+        checked = session.setdefault("checked_criteria", {})
+        self._prefill(checked, aadhaar_data)
+        pending = session.get("engine_pending")
+        message = (user_message or "").strip()
+        prefix = ""
+
+        if pending and message:
+            value = parse_answer(pending, message, self.check_rule)
+            if value is None:
+                if looks_like_question(message):
+                    self._count("deferred_to_agent")
+                    return None
+                value = self._interpret(pending, self.message(f"q_{pending}", "english"), message)
+            if value is None:
+                self._count("clarifications")
+                clarify = "clarify_age" if pending == "age" else (
+                    "clarify_marital_status" if pending == "marital_status" else "clarify_yes_no")
+                prefix = self.message(clarify, language) + "\n"
+            else:
+                checked[pending] = value
+        elif not pending and message and looks_like_question(message) \
+                and not any(w in message.lower() for w in ELIGIBILITY_WORDS):
+            # A general scheme question before the interview started
+            self._count("deferred_to_agent")
+            return None
+
+        # Re-read answers the agent collected itself (stored raw by conversation memory)
+        for criterion in FULL_SEQUENCE:
+            if criterion in checked and not is_answered(criterion, checked[criterion]):
+                parsed = parse_answer(criterion, str(checked[criterion]), self.check_rule)
+                if parsed is None:
+                    del checked[criterion]
+                else:
+                    checked[criterion] = parsed
+
+        # First disqualifying answer ends the interview
+        for criterion in FULL_SEQUENCE:
+            if criterion not in checked:
+                continue
+            reason = self._failure_reason(criterion, checked[criterion], language)
+            if reason:
+                session["eligibility_status"] = "not_eligible"
+                session["failed_criterion"] = criterion
+                session.pop("engine_pending", None)
+                self._count("verdict_not_eligible")
+                return self._reply(session, message, self.message("verdict_not_eligible", language, reason=reason), True)
+
+        next_criterion = next((c for c in FULL_SEQUENCE if c not in checked), None)
+        if next_criterion is None:
+            session["eligibility_status"] = "eligible"
+            session.pop("engine_pending", None)
+            self._count("verdict_eligible")
+            return self._reply(session, message, self.message("verdict_eligible", language), True)
+
+        session["engine_pending"] = next_criterion
+        return self._reply(session, message, prefix + self.message(f"q_{next_criterion}", language), False)
+
+    def _reply(self, session: Dict[str, Any], user_message: str, response: str, is_complete: bool) -> Dict[str, Any]:
+        """Keep the agent history in sync so LLM fallback turns see the whole conversation"""
+        if user_message:
+            session.setdefault("messages", []).append({"role": "user", "content": user_message})
+        session.setdefault("messages", []).append({"role": "assistant", "content": response})
+        self._count("local_turns")
+        return {"response": response, "is_complete": is_complete}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats["enabled"] = ELIGIBILITY_ENGINE_ENABLED
+        return stats
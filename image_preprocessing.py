@@ -0,0 +1,131 @@
+"""
+Image Preprocessing Module for Ladki Bahin Yojana
+Normalizes uploads before Tesseract: EXIF rotation, downscaling, grayscale and deskew
+Phone photos arrive as 12+ megapixel JPEGs; Tesseract time grows with pixel count and its
+accuracy drops when capital letters are far taller than the ~30 px it is tuned for.
+Runs in the OCR worker processes (ocr_service) for every OCR entry point.
+"""
+
+import os
+from typing import Dict, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+try:
+    import numpy as np
+except Exception:  # numpy is optional, deskew and line-height estimation are skipped without it
+    np = None
+
+# ============================================
+# Preprocessing Configuration
+# ============================================
+OCR_NORMALIZE = os.getenv("OCR_NORMALIZE", "true").lower() == "true"
+# Bump when the pipeline changes so cached OCR text from the old pipeline is not reused
+NORMALIZATION_VERSION = "norm-v2"
+
+# Upper bound on the long side (A4 at 300 dpi is 3508 px, so the cap alone never shrinks PDF pages)
+OCR_MAX_LONG_SIDE = int(os.getenv("OCR_MAX_LONG_SIDE", "3508"))
+# Images are scaled so the estimated text line height lands here (≈30 px capital letters,
+# the size Tesseract is most accurate at)
+OCR_TARGET_LINE_HEIGHT = int(os.getenv("OCR_TARGET_LINE_HEIGHT", "44"))
+# Never shrink below this long side, whatever the text estimate says (A4 at 200 dpi, so
+# certificates keep enough resolution for small print and Devanagari matras)
+OCR_MIN_LONG_SIDE = int(os.getenv("OCR_MIN_LONG_SIDE", "2339"))
+
+# Deskew search on a thumbnail: ±DESKEW_MAX_ANGLE degrees in DESKEW_STEP steps
+DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", "5"))
+DESKEW_STEP = 0.5
+DESKEW_MIN_ANGLE = 0.3
+_ANALYSIS_SIZE = 1000
+
+
+# ============================================
+# Analysis Helpers
+# ============================================
+def _ink_mask(gray: Image.Image) -> "np.ndarray":
+    """Dark pixels of a grayscale image (global mean threshold, good enough for layout analysis)"""
+    pixels = np.asarray(gray, dtype=np.uint8)
+    return pixels < min(int(pixels.mean()) - 10, 160)
+
+
+def _thumbnail(gray: Image.Image) -> Tuple[Image.Image, float]:
+    """Analysis copy with long side _ANALYSIS_SIZE, and its scale relative to gray"""
+    scale = min(1.0, _ANALYSIS_SIZE / max(gray.size))
+    if scale >= 1.0:
+        return gray, 1.0
+    size = (max(1, int(gray.width * scale)), max(1, int(gray.height * scale)))
+    return gray.resize(size, Image.BILINEAR), scale
+
+
+def estimate_line_height(gray: Image.Image, angle: float = 0.0) -> Optional[float]:
+    """
+    Median height (px, in gray's coordinates) of text lines from the horizontal ink profile,
+    measured after rotating by angle (on a skewed page neighbouring lines merge in the profile).
+    None when numpy is missing or no line structure is found (photos, blank pages).
+    """
+    if np is None:
+        return None
+    thumb, scale = _thumbnail(gray)
+    if abs(angle) >= DESKEW_MIN_ANGLE:
+        thumb = thumb.rotate(angle, resample=Image.BILINEAR, expand=True, fillcolor=255)
+    rows = _ink_mask(thumb).mean(axis=1)
+    text_rows = rows > max(rows.mean() * 0.5, 0.01)
+    # Run lengths of consecutive text rows
+    edges = np.diff(np.concatenate(([0], text_rows.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    heights = ends - starts
+    heights = heights[heights >= 2]
+    if len(heights) < 3:
+        return None
+    return float(np.median(heights)) / scale
+
+
+def estimate_skew(gray: Image.Image) -> float:
+    """Rotation (degrees) that makes text lines horizontal: maximum row-profile variance"""
+    if np is None:
+        return 0.0
+    thumb, _ = _thumbnail(gray)
+    # Ink as white on black so rotation padding adds no ink
+    ink = Image.fromarray((_ink_mask(thumb) * 255).astype(np.uint8))
+    best_angle, best_score = 0.0, -1.0
+    steps = int(DESKEW_MAX_ANGLE / DESKEW_STEP)
+    for i in range(-steps, steps + 1):
+        angle = i * DESKEW_STEP
+        profile = np.asarray(ink.rotate(angle, resample=Image.NEAREST), dtype=np.float32).sum(axis=1)
+        score = float(profile.var())
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+# ============================================
+# Normalization Pipeline
+# ============================================
+def normalize_for_ocr(img: Image.Image, stats: Optional[Dict[str, float]] = None) -> Image.Image:
+    """
+    EXIF-aware rotation → grayscale → skew estimate → downscale → deskew.
+    The scale comes from the line height of the deskewed page.
+    Only ever shrinks; pages already at OCR resolution pass through unscaled.
+    """
+    if not OCR_NORMALIZE:
+        return img
+    stats = stats if stats is not None else {}
+
+    img = ImageOps.exif_transpose(img)
+    gray = img.convert("L")
+
+    angle = estimate_skew(gray)
+    scale = min(1.0, OCR_MAX_LONG_SIDE / max(gray.size))
+    line_height = estimate_line_height(gray, angle)
+    if line_height:
+        scale = min(scale, OCR_TARGET_LINE_HEIGHT / line_height)
+    scale = max(scale, min(1.0, OCR_MIN_LONG_SIDE / max(gray.size)))
+    if scale < 0.95:
+        size = (max(1, round(gray.width * scale)), max(1, round(gray.height * scale)))
+        gray = gray.resize(size, Image.LANCZOS)
+    stats["scale"] = round(scale, 3)
+
+    if abs(angle) >= DESKEW_MIN_ANGLE:
+        gray = gray.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    stats["skew"] = angle
+    return gray
@@ -0,0 +1,390 @@
+"""
+Intent Router Module for Ladki Bahin Yojana
+Local first stage in front of the LLM router (route_message / route_message_call_center)
+
+Stage 1: keyword automaton over the user message and the previous assistant response
+Stage 2: TF-IDF nearest-centroid model trained on logged (message, prev_res, flag_type) triples
+The LLM router is called only when the combined local confidence is below ROUTER_LOCAL_THRESHOLD.
+With ROUTER_SHADOW_MODE=1 the LLM decides every turn and local/LLM agreement is recorded
+per confidence bucket, so the threshold can be tuned before trusting the local stage.
+"""
+
+import os
+import re
+import json
+import math
+import logging
+import threading
+from collections import Counter, defaultdict, deque
+from typing import Optional, Dict, Any, List, Tuple, Callable, Sequence, Awaitable
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# Router Configuration
+# ============================================
+ROUTER_LOCAL_THRESHOLD = float(os.getenv("ROUTER_LOCAL_THRESHOLD", "0.85"))
+ROUTER_SHADOW_MODE = os.getenv("ROUTER_SHADOW_MODE", "0").lower() in ("1", "true", "yes")
+# Every LLM routing decision is appended here; the same file trains the local model on startup
+ROUTER_LOG_FILE = os.getenv("ROUTER_LOG_FILE", "")
+# Aadhaar, phone and account numbers (6+ digits, spaces/dashes allowed) never reach the log
+_LONG_NUMBER = re.compile(r"\d(?:[\s-]?\d){5,}")
+ROUTER_MIN_TRAINING_EXAMPLES = int(os.getenv("ROUTER_MIN_TRAINING_EXAMPLES", "50"))
+
+ALL_FLAGS = ("eligibility", "form_filling", "post_application")
+CONFIDENCE_BUCKETS = (0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 0.95)
+
+
+def _mask_numbers(text: str) -> str:
+    return _LONG_NUMBER.sub("<num>", text)
+
+
+# ============================================
+# Keyword Rules
+# ============================================
+# (keyword, weight) per flag, matched against the current user message
+MESSAGE_KEYWORDS = {
+    "post_application": [
+        ("status", 3), ("payment", 3), ("installment", 3), ("instalment", 3), ("transaction", 3),
+        ("not received", 3), ("credited", 2), ("pending", 2), ("approved", 2), ("rejected", 2),
+        ("complaint", 3), ("issue", 1), ("problem", 1), ("last month", 2), ("months", 1),
+        ("स्थिती", 3), ("स्टेटस", 3), ("स्थिति", 3), ("पेमेंट", 3), ("हप्ता", 3), ("हप्ते", 3),
+        ("किस्त", 3), ("पैसे मिळाले", 3), ("पैसे आले", 3), ("पैसे मिले", 3), ("पैसे नहीं", 3),
+        ("तक्रार", 3), ("शिकायत", 3), ("पाहायची", 2), ("देखना", 2), ("जमा", 1),
+    ],
+    "eligibility": [
+        ("eligible", 3), ("eligibility", 3), ("qualify", 3), ("am i eligible", 3), ("can i get", 2),
+        ("criteria", 2), ("who can apply", 2),
+        ("पात्रता", 3), ("पात्र", 3), ("योग्यता", 3), ("तपासायची", 2), ("लाभ मिळेल", 2), ("लाभ मिलेगा", 2),
+    ],
+    "form_filling": [
+        ("i want to apply", 4), ("apply", 3), ("new application", 4), ("start application", 4),
+        ("fill the form", 4), ("fill form", 4), ("submit application", 4), ("register", 2),
+        ("नवीन अर्ज", 4), ("अर्ज करायचा", 4), ("अर्ज भरायचा", 4), ("फॉर्म भरायचा", 4),
+        ("आवेदन करना", 4), ("नया आवेदन", 4), ("फॉर्म भरना", 4),
+    ],
+}
+
+# Cues in the previous assistant response; only used when the user is answering
+# (digits, yes/no) so that data entry is routed to the flow that asked for it
+PREV_RES_CUES = {
+    "post_application": [
+        "status", "payment", "installment", "transaction", "linked", "verify", "ifsc", "account number",
+        "स्थिती", "पेमेंट", "हप्ता", "व्यवहार", "लिंक", "किस्त", "लेनदेन",
+    ],
+    "eligibility": [
+        "age", "income", "marital", "married", "four-wheeler", "four wheeler", "income tax", "pension",
+        "वय", "उत्पन्न", "विवाहित", "चारचाकी", "आयकर", "निवृत्तीवेतन", "आय", "उम्र", "पेंशन",
+    ],
+}
+
+ANSWER_WORDS = {
+    "yes", "no", "ok", "okay", "ho", "hoy", "nahi", "haan", "ha", "nhi",
+    "होय", "हो", "नाही", "हाँ", "हां", "नहीं", "बरोबर", "सही",
+}
+
+_LATIN_WORD = re.compile(r"^[a-z0-9 .\-]+$")
+
+
+# ============================================
+# Keyword Automaton (Aho-Corasick)
+# ============================================
+class KeywordAutomaton:
+    """Single-pass multi-keyword matcher; Latin keywords match on word boundaries"""
+
+    def __init__(self, keywords: Dict[str, List[Tuple[str, float]]]):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[Tuple[str, float, int]]] = [[]]
+        for label, entries in keywords.items():
+            for keyword, weight in entries:
+                self._add(keyword.lower(), label, weight)
+        self._build()
+
+    def _add(self, keyword: str, label: str, weight: float):
+        # Pad Latin keywords with spaces so "form" does not match "information"
+        pattern = f" {keyword} " if _LATIN_WORD.match(keyword) else keyword
+        node = 0
+        for ch in pattern:
+            if ch not in self.goto[node]:
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+                self.goto[node][ch] = len(self.goto) - 1
+            node = self.goto[node][ch]
+        self.output[node].append((label, weight, len(pattern)))
+
+    def _build(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self.goto[node].items():
+                queue.append(child)
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(ch, 0) if self.goto[state].get(ch, 0) != child else 0
+                self.output[child] = self.output[child] + self.output[self.fail[child]]
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Sum of keyword weights per label found in text"""
+        text = " " + re.sub(r"[^\w\sऀ-ॿ]", " ", text.lower()) + " "
+        text = re.sub(r"\s+", " ", text)
+        totals: Dict[str, float] = defaultdict(float)
+        node = 0
+        for ch in text:
+            while node and ch not in self.goto[node]:
+                node = self.fail[node]
+            node = self.goto[node].get(ch, 0)
+            for label, weight, _ in self.output[node]:
+                totals[label] += weight
+        return dict(totals)
+
+
+# ============================================
+# TF-IDF Nearest-Centroid Model
+# ============================================
+_TOKEN = re.compile(r"[ऀ-ॿ]+|[a-z]+|\d+")
+
+
+def _features(message: str, prev_res: Optional[str]) -> List[str]:
+    tokens = [t if not t.isdigit() else f"<num{min(len(t), 12)}>" for t in _TOKEN.findall(message.lower())]
+    prev_tokens = [f"prev:{t}" for t in _TOKEN.findall((prev_res or "").lower()) if not t.isdigit()]
+    return tokens + prev_tokens
+
+
+class TfidfRouterModel:
+    """Cosine similarity to per-flag TF-IDF centroids"""
+
+    def __init__(self):
+        self.idf: Dict[str, float] = {}
+        self.centroids: Dict[str, Dict[str, float]] = {}
+        self.trained_on = 0
+
+    def _vector(self, features: List[str]) -> Dict[str, float]:
+        counts = Counter(f for f in features if f in self.idf)
+        vector = {f: (1 + math.log(c)) * self.idf[f] for f, c in counts.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {f: v / norm for f, v in vector.items()}
+
+    def fit(self, examples: Sequence[Tuple[str, Optional[str], str]]):
+        documents = [(_features(m, p), label) for m, p, label in examples if label in ALL_FLAGS]
+        if not documents:
+            return
+        df = Counter()
+        for features, _ in documents:
+            df.update(set(features))
+        n = len(documents)
+        self.idf = {f: math.log((1 + n) / (1 + c)) + 1 for f, c in df.items()}
+
+        sums: Dict[str, Counter] = defaultdict(Counter)
+        for features, label in documents:
+            for f, v in self._vector(features).items():
+                sums[label][f] += v
+        self.centroids = {}
+        for label, total in sums.items():
+            norm = math.sqrt(sum(v * v for v in total.values())) or 1.0
+            self.centroids[label] = {f: v / norm for f, v in total.items()}
+        self.trained_on = n
+
+    def predict(self, message: str, prev_res: Optional[str], labels: Sequence[str]) -> Dict[str, float]:
+        """Probability-like scores per label (softmax over cosine similarities)"""
+        if not self.centroids:
+            return {}
+        vector = self._vector(_features(message, prev_res))
+        if not vector:
+            return {}
+        sims = {
+            label: sum(v * self.centroids[label].get(f, 0.0) for f, v in vector.items())
+            for label in labels if label in self.centroids
+        }
+        if not sims:
+            return {}
+        exps = {label: math.exp(8 * s) for label, s in sims.items()}
+        total = sum(exps.values())
+        return {label: e / total for label, e in exps.items()}
+
+
+def _bucket_name(lower: float) -> str:
+    index = CONFIDENCE_BUCKETS.index(lower)
+    upper = CONFIDENCE_BUCKETS[index + 1] if index + 1 < len(CONFIDENCE_BUCKETS) else 1.0
+    return f"{lower:.2f}-{upper:.2f}"
+
+
+# ============================================
+# Two-stage Router
+# ============================================
+class IntentRouter:
+    """Local keyword + TF-IDF classifier with LLM escalation and shadow-mode metrics"""
+
+    def __init__(self, threshold: float = ROUTER_LOCAL_THRESHOLD, shadow_mode: bool = ROUTER_SHADOW_MODE,
+                 log_file: str = ROUTER_LOG_FILE):
+        self.threshold = threshold
+        self.shadow_mode = shadow_mode
+        self.log_file = log_file or None
+        self.message_automaton = KeywordAutomaton(MESSAGE_KEYWORDS)
+        self.prev_res_automaton = KeywordAutomaton({
+            label: [(cue, 1) for cue in cues] for label, cues in PREV_RES_CUES.items()
+        })
+        self.model = TfidfRouterModel()
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+        self.counters = Counter()
+        # bucket lower bound → [agree, total]
+        self.agreement: Dict[float, List[int]] = {b: [0, 0] for b in CONFIDENCE_BUCKETS}
+        if self.log_file:
+            self.train_from_log(self.log_file)
+
+    # ----------------------------------------
+    # Training
+    # ----------------------------------------
+    def train_from_log(self, path: str) -> int:
+        """Fit the TF-IDF stage from a JSONL file of {"message", "prev_res", "flag_type"} records"""
+        if not os.path.exists(path):
+            return 0
+        examples = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        examples.append((record["message"], record.get("prev_res"), record["flag_type"]))
+                    except (ValueError, KeyError):
+                        continue
+        except Exception as e:
+            logger.error(f"❌ Failed to read router training log {path}: {e}")
+            return 0
+        if len(examples) < ROUTER_MIN_TRAINING_EXAMPLES:
+            logger.info(f"ℹ️ Router model not trained: {len(examples)} examples (< {ROUTER_MIN_TRAINING_EXAMPLES})")
+            return 0
+        self.model.fit(examples)
+        logger.info(f"✅ Router model trained on {self.model.trained_on} logged examples")
+        return self.model.trained_on
+
+    def _log_example(self, message: str, prev_res: Optional[str], flag_type: str):
+        if not self.log_file:
+            return
+        record = json.dumps({"message": _mask_numbers(message),
+                             "prev_res": _mask_numbers(prev_res) if prev_res else prev_res,
+                             "flag_type": flag_type}, ensure_ascii=False)
+        with self._log_lock:
+            try:
+                with open(self.log_file, "a", encoding="utf-8") as f:
+                    f.write(record + "\n")
+            except Exception as e:
+                logger.error(f"❌ Failed to append router log: {e}")
+
+    # ----------------------------------------
+    # Classification
+    # ----------------------------------------
+    def classify(self, message: str, prev_res: Optional[str], labels: Sequence[str] = ALL_FLAGS) -> Tuple[Optional[str], float]:
+        """Return (flag_type, confidence) from the local stages only"""
+        scores = {label: 0.0 for label in labels}
+        for label, weight in self.message_automaton.scores(message).items():
+            if label in scores:
+                scores[label] += weight
+
+        # User is answering a question: route to the flow whose question it is
+        stripped = message.strip().lower()
+        is_answer = stripped.replace(" ", "").isdigit() or stripped in ANSWER_WORDS
+        if is_answer and prev_res:
+            for label, weight in self.prev_res_automaton.scores(prev_res).items():
+                if label in scores:
+                    scores[label] += 2 * weight
+
+        total = sum(scores.values())
+        keyword_probs = {label: s / total for label, s in scores.items()} if total else {}
+        # Saturates as evidence accumulates: one weak keyword is not enough on its own
+        keyword_strength = 1 - math.exp(-total / 3) if total else 0.0
+
+        model_probs = self.model.predict(message, prev_res, labels)
+
+        if keyword_probs and model_probs:
+            combined = {l: 0.5 * keyword_probs.get(l, 0) + 0.5 * model_probs.get(l, 0) for l in labels}
+            label = max(combined, key=combined.get)
+            confidence = combined[label] * (0.5 + 0.5 * keyword_strength)
+        elif keyword_probs:
+            label = max(keyword_probs, key=keyword_probs.get)
+            confidence = keyword_probs[label] * keyword_strength
+        elif model_probs:
+            label = max(model_probs, key=model_probs.get)
+            confidence = model_probs[label] * 0.9
+        else:
+            return None, 0.0
+        return label, round(confidence, 4)
+
+    def route(self, message: str, prev_res: Optional[str], llm_route: Callable[[], Dict[str, Any]],
+              labels: Sequence[str] = ALL_FLAGS) -> Dict[str, Any]:
+        """
+        Route a turn. llm_route is the existing LLM router call, used on low confidence
+        (or always in shadow mode). Returns the same {"flag_type": ...} shape as the LLM router.
+        """
+        label, confidence = self.classify(message, prev_res, labels)
+        if self._accept_local(label, confidence):
+            return {"flag_type": label}
+
+        result = llm_route()
+        self._record_llm_decision(message, prev_res, labels, label, confidence, result)
+        return result
+
+    async def aroute(self, message: str, prev_res: Optional[str], llm_route: Callable[[], Awaitable[Dict[str, Any]]],
+                     labels: Sequence[str] = ALL_FLAGS) -> Dict[str, Any]:
+        """Same as route() for an awaitable LLM router call"""
+        label, confidence = self.classify(message, prev_res, labels)
+        if self._accept_local(label, confidence):
+            return {"flag_type": label}
+
+        result = await llm_route()
+        self._record_llm_decision(message, prev_res, labels, label, confidence, result)
+        return result
+
+    def _accept_local(self, label: Optional[str], confidence: float) -> bool:
+        if label and confidence >= self.threshold and not self.shadow_mode:
+            with self._lock:
+                self.counters["local"] += 1
+            logger.info(f"🧭 Local router: {label} ({confidence:.2f})")
+            return True
+        return False
+
+    def _record_llm_decision(self, message: str, prev_res: Optional[str], labels: Sequence[str],
+                             label: Optional[str], confidence: float, result: Dict[str, Any]):
+        llm_label = result.get("flag_type")
+        with self._lock:
+            self.counters["llm"] += 1
+            if label:
+                self._record_agreement(confidence, label == llm_label)
+        if llm_label in labels:
+            self._log_example(message, prev_res, llm_label)
+
+    def _record_agreement(self, confidence: float, agreed: bool):
+        bucket = None
+        for lower in CONFIDENCE_BUCKETS:
+            if confidence >= lower:
+                bucket = lower
+        if bucket is None:
+            return
+        self.agreement[bucket][1] += 1
+        if agreed:
+            self.agreement[bucket][0] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Routing counters plus local/LLM agreement per confidence bucket (shadow-mode tuning)"""
+        with self._lock:
+            return {
+                "threshold": self.threshold,
+                "shadow_mode": self.shadow_mode,
+                "model_trained_on": self.model.trained_on,
+                "local_decisions": self.counters["local"],
+                "llm_decisions": self.counters["llm"],
+                "agreement_by_confidence": {
+                    _bucket_name(lower): {
+                        "agree": agree,
+                        "total": total,
+                        "rate": round(agree / total, 4) if total else None,
+                    }
+                    for lower, (agree, total) in self.agreement.items()
+                },
+            }
+
+
+intent_router = IntentRouter()
@@ -0,0 +1,244 @@
+"""
+Language Detection Module for Ladki Bahin Yojana
+Local Marathi / Hindi / English detector (no LLM call for the common case)
+Combines Devanagari-vs-Latin script ratio, character trigram scoring and marker words,
+and returns a confidence so callers can escalate only ambiguous text to the LLM
+"""
+
+import os
+import re
+import math
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, Optional, Tuple
+
+# ============================================
+# Detector Configuration
+# ============================================
+SUPPORTED_LANGUAGES = ("marathi", "hindi", "english")
+
+# Below this confidence detect_language() asks the LLM instead
+LANGUAGE_CONFIDENCE_THRESHOLD = float(os.getenv("LANGUAGE_CONFIDENCE_THRESHOLD", "0.75"))
+
+LANGUAGE_MEMO_SESSIONS = int(os.getenv("LANGUAGE_MEMO_SESSIONS", "5000"))
+LANGUAGE_MEMO_PER_SESSION = 32
+
+
+# ============================================
+# Marker Words
+# ============================================
+# Marathi/Hindi transliteration (common short inputs)
+MARATHI_LATIN = [
+    'ho', 'hoy', 'hoya', 'hao', 'hoay', 'hau', 'nahi', 'nahay', 'aahe', 'ahe', 'mala', 'majha', 'maza',
+    'majhe', 'mazi', 'tumhi', 'tumcha', 'tumchi', 'kay', 'kasa', 'kashi', 'kiti', 'pahije', 'zala', 'jhala',
+    'zali', 'nako', 'barobar', 'aamhi', 'amhi', 'navra', 'aai', 'baba', 'karaycha', 'kuthe', 'sangaa', 'sanga',
+]
+HINDI_LATIN = [
+    'ha', 'haan', 'han', 'nhi', 'nahin', 'hai', 'hain', 'mujhe', 'mera', 'meri', 'mere', 'aap', 'aapka',
+    'kya', 'kaise', 'kitna', 'kitne', 'chahiye', 'hua', 'hogaya', 'gaya', 'theek', 'thik', 'sahi',
+    'batao', 'bataiye', 'karna', 'hamara', 'hum', 'kab', 'kahan', 'pati',
+]
+
+# Marathi-specific words (unique to Marathi, NOT in Hindi)
+MARATHI_UNIQUE = [
+    'आहे', 'आहेत', 'तुम्ही', 'आपण', 'होय', 'तपासायची', 'करायचा', 'पाहिजे', 'झाले', 'झाला', 'काय', 'कसे',
+    'नाही', 'माझे', 'माझा', 'माझी', 'मला', 'तुमचे', 'तुमचा', 'किती', 'कुठे', 'नको', 'बरोबर', 'आम्ही',
+    'सांगा', 'मिळाले', 'केव्हा', 'योजनेचा', 'अर्जाची', 'पैसे', 'आले',
+]
+
+# Hindi-specific words (unique to Hindi, NOT in Marathi)
+HINDI_UNIQUE = [
+    'है', 'हैं', 'आप', 'मैं', 'हाँ', 'हां', 'चाहिए', 'करना', 'क्या', 'कैसे', 'था', 'थी', 'नहीं', 'मुझे',
+    'मेरा', 'मेरी', 'मेरे', 'कितना', 'कितने', 'कहाँ', 'कब', 'हुआ', 'गया', 'सही', 'बताइए', 'बताओ',
+    'हमारा', 'में', 'पैसा', 'आया',
+]
+
+# English words
+ENGLISH_WORDS = [
+    'yes', 'no', 'is', 'are', 'the', 'i', 'you', 'what', 'how', 'ok', 'okay', 'correct', 'my', 'me',
+    'when', 'where', 'which', 'status', 'application', 'payment', 'please', 'want', 'check', 'not',
+    'received', 'money', 'eligible', 'eligibility', 'register', 'form', 'of', 'to', 'for', 'and', 'have',
+    'has', 'did', 'do', 'does', 'am', 'wrong', 'right', 'thanks', 'thank', 'hello', 'hi',
+]
+
+# Words that exist in both romanized Marathi and Hindi carry no signal on their own
+_AMBIGUOUS_LATIN = set(MARATHI_LATIN) & set(HINDI_LATIN)
+
+
+# ============================================
+# N-gram Seed Text
+# ============================================
+# Small built-in samples used to build character trigram profiles at import time.
+# Keep them short and representative of chatbot traffic.
+_SEED_TEXT = {
+    "marathi": [
+        "होय माझे नाव बरोबर आहे", "नाही माझ्याकडे चारचाकी वाहन नाही", "माझे उत्पन्न अडीच लाखांपेक्षा कमी आहे",
+        "मला योजनेची पात्रता तपासायची आहे", "माझ्या अर्जाची स्थिती काय आहे", "मला पैसे कधी मिळतील",
+        "तुम्ही मला मदत करा", "माझे बँक खाते आधारशी जोडलेले आहे", "मी विवाहित आहे आणि माझे वय तीस वर्षे आहे",
+        "माझ्या घरात कोणीही आयकर भरत नाही", "मागील तीन महिन्यांचे हप्ते मिळाले नाहीत", "अर्ज कसा भरायचा",
+        "कागदपत्रे कोणती लागतील", "माझा पत्ता बदलायचा आहे", "आम्ही शेतकरी कुटुंब आहोत", "मला फॉर्म भरायचा आहे",
+        "ho maza naav barobar aahe", "nahi majhyakade gadi nahi", "mala yojana tapasaychi aahe",
+        "majha arj kuthe aahe", "paise kadhi miltil", "ho mi vivahit aahe", "tumhi mala madat kara",
+        "mala form bharaycha aahe", "majhe utpanna kami aahe", "kay zala majhya arjacha",
+    ],
+    "hindi": [
+        "हाँ मेरा नाम सही है", "नहीं मेरे पास चार पहिया वाहन नहीं है", "मेरी आय ढाई लाख से कम है",
+        "मुझे योजना की पात्रता जांचनी है", "मेरे आवेदन की स्थिति क्या है", "मुझे पैसे कब मिलेंगे",
+        "आप मेरी मदद कीजिए", "मेरा बैंक खाता आधार से जुड़ा हुआ है", "मैं शादीशुदा हूँ और मेरी उम्र तीस साल है",
+        "मेरे घर में कोई आयकर नहीं भरता", "पिछले तीन महीनों की किस्त नहीं मिली", "फॉर्म कैसे भरना है",
+        "कौन से दस्तावेज़ चाहिए", "मुझे अपना पता बदलना है", "हम किसान परिवार हैं", "मुझे फॉर्म भरना है",
+        "haan mera naam sahi hai", "nahi mere paas gaadi nahi hai", "mujhe yojana check karni hai",
+        "mera aavedan kahan hai", "paise kab milenge", "haan main shaadishuda hoon", "aap meri madad kijiye",
+        "mujhe form bharna hai", "meri aay kam hai", "kya hua mere aavedan ka",
+    ],
+    "english": [
+        "yes my name is correct", "no i do not have a four wheeler", "my income is less than two and half lakh",
+        "i want to check my eligibility", "what is the status of my application", "when will i get the money",
+        "please help me", "my bank account is linked with aadhaar", "i am married and my age is thirty years",
+        "nobody in my family pays income tax", "i did not receive the last three installments",
+        "how to fill the form", "which documents are required", "i want to change my address",
+        "we are a farmer family", "i want to register for the scheme", "okay thank you", "that is wrong",
+    ],
+}
+
+_DEVANAGARI = re.compile(r"[ऀ-ॿ]")
+_LATIN = re.compile(r"[A-Za-z]")
+_TOKEN = re.compile(r"[ऀ-ॿ]+|[A-Za-z]+")
+
+
+# ============================================
+# Detector
+# ============================================
+def _trigrams(text: str):
+    padded = f"  {text.lower()}  "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class LanguageDetector:
+    """Script ratio + character trigram + marker word language detector"""
+
+    def __init__(self, seed_text: Dict[str, list] = None):
+        self.profiles: Dict[str, Counter] = {}
+        self.totals: Dict[str, int] = {}
+        for language, samples in (seed_text or _SEED_TEXT).items():
+            counts = Counter()
+            for sample in samples:
+                counts.update(_trigrams(sample))
+            self.profiles[language] = counts
+            self.totals[language] = sum(counts.values())
+        self.vocab_size = len(set().union(*self.profiles.values())) or 1
+        self.marathi_unique = set(MARATHI_UNIQUE)
+        self.hindi_unique = set(HINDI_UNIQUE)
+        self.marathi_latin = set(MARATHI_LATIN) - _AMBIGUOUS_LATIN
+        self.hindi_latin = set(HINDI_LATIN) - _AMBIGUOUS_LATIN
+        self.english_words = set(ENGLISH_WORDS)
+
+    def _ngram_log_probs(self, text: str, candidates) -> Dict[str, float]:
+        grams = _trigrams(text)
+        scores = {}
+        for language in candidates:
+            profile = self.profiles[language]
+            denominator = self.totals[language] + self.vocab_size
+            scores[language] = sum(math.log((profile.get(g, 0) + 1) / denominator) for g in grams) / max(len(grams), 1)
+        return scores
+
+    def _marker_counts(self, tokens) -> Dict[str, int]:
+        return {
+            "marathi": sum(1 for t in tokens if t in self.marathi_unique or t in self.marathi_latin),
+            "hindi": sum(1 for t in tokens if t in self.hindi_unique or t in self.hindi_latin),
+            "english": sum(1 for t in tokens if t in self.english_words),
+        }
+
+    def detect(self, text: str) -> Tuple[Optional[str], float]:
+        """
+        Returns (language, confidence). language is None when the text has no letters.
+        Confidence is a probability-like score in [0, 1].
+        """
+        devanagari = len(_DEVANAGARI.findall(text))
+        latin = len(_LATIN.findall(text))
+        if devanagari + latin == 0:
+            return None, 0.0
+
+        tokens = [t.lower() for t in _TOKEN.findall(text)]
+        markers = self._marker_counts(tokens)
+
+        # One-word replies ("ho", "haan", "yes") are decided by the marker lists alone
+        if len(tokens) == 1 and sum(markers.values()) == 1:
+            return max(markers, key=markers.get), 0.95
+        devanagari_ratio = devanagari / (devanagari + latin)
+
+        # Devanagari text can only be Marathi or Hindi; Latin text may be any of the three
+        if devanagari_ratio >= 0.5:
+            candidates = ("marathi", "hindi")
+        else:
+            candidates = SUPPORTED_LANGUAGES
+
+        # Average per-trigram log probability, scaled so longer text gives sharper decisions
+        ngram = self._ngram_log_probs(text, candidates)
+        length_weight = min(len(text), 40) / 8.0
+        scores = {lang: ngram[lang] * length_weight + 2.5 * markers[lang] for lang in candidates}
+
+        # Softmax → confidence
+        top = max(scores.values())
+        exps = {lang: math.exp(score - top) for lang, score in scores.items()}
+        total = sum(exps.values())
+        language = max(exps, key=exps.get)
+        confidence = exps[language] / total
+
+        # Mixed script lowers confidence (e.g. "ho मला form")
+        script_purity = max(devanagari_ratio, 1 - devanagari_ratio)
+        confidence *= 0.5 + 0.5 * script_purity
+        return language, round(confidence, 4)
+
+
+# ============================================
+# Per-session Memo
+# ============================================
+class SessionLanguageMemo:
+    """Bounded memo of detections per session, so repeated inputs are never re-detected"""
+
+    def __init__(self, max_sessions: int = LANGUAGE_MEMO_SESSIONS, per_session: int = LANGUAGE_MEMO_PER_SESSION):
+        self.max_sessions = max_sessions
+        self.per_session = per_session
+        self._sessions: "OrderedDict[str, OrderedDict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def get(self, session_id: str, text: str) -> Optional[str]:
+        with self._lock:
+            memo = self._sessions.get(session_id)
+            if memo is None:
+                return None
+            self._sessions.move_to_end(session_id)
+            return memo.get(self._normalize(text))
+
+    def set(self, session_id: str, text: str, language: str):
+        with self._lock:
+            memo = self._sessions.setdefault(session_id, OrderedDict())
+            self._sessions.move_to_end(session_id)
+            memo[self._normalize(text)] = language
+            while len(memo) > self.per_session:
+                memo.popitem(last=False)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+
+language_detector = LanguageDetector()
+language_memo = SessionLanguageMemo()
+
+# Counters reported by detection_stats()
+_stats = {"local": 0, "escalated": 0, "memo_hits": 0}
+_stats_lock = threading.Lock()
+
+
+def record_detection(outcome: str):
+    with _stats_lock:
+        _stats[outcome] = _stats.get(outcome, 0) + 1
+
+
+def detection_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,322 @@
+"""
+LLM Client Module for Ladki Bahin Yojana
+Shared async Azure OpenAI access for the async FastAPI handlers
+One AsyncAzureOpenAI client per process with a pooled HTTP connection, so concurrent
+conversations on a uvicorn worker no longer wait on each other's completions
+"""
+
+import os
+import json
+import asyncio
+import hashlib
+import logging
+import time
+import threading
+from typing import Optional, Any, AsyncIterator, Dict
+
+import httpx
+from openai import AsyncAzureOpenAI
+from dotenv import load_dotenv
+
+from metrics import registry
+from deadline import call_timeout, LLM_MIN_BUDGET_SECONDS
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# Client Configuration
+# ============================================
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT", "")
+AZURE_OPENAI_KEY = os.getenv("AZURE_OPENAI_API_KEY", "")
+AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-12-01-preview")
+AZURE_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o-mini")
+
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+
+# Concurrent identical temperature-0 requests share one in-flight call
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "true").lower() == "true"
+
+# Sent with every call so offline stand-ins (benchmarks/mock_openai_server.py) can answer per purpose
+PURPOSE_HEADER = "X-LLM-Purpose"
+
+_async_client: Optional[AsyncAzureOpenAI] = None
+_async_client_lock = threading.Lock()
+
+
+# ============================================
+# Call Instrumentation
+# ============================================
+LLM_REQUESTS = registry.counter("llm_requests_total", "Azure OpenAI chat completions by purpose and outcome")
+LLM_ERRORS = registry.counter("llm_errors_total", "Failed Azure OpenAI chat completions by purpose and error type")
+LLM_RETRIES = registry.counter("llm_retries_total", "SDK retries taken before a chat completion succeeded")
+LLM_PROMPT_TOKENS = registry.counter("llm_prompt_tokens_total", "Prompt tokens reported by Azure OpenAI")
+LLM_COMPLETION_TOKENS = registry.counter("llm_completion_tokens_total", "Completion tokens reported by Azure OpenAI")
+LLM_LATENCY = registry.histogram("llm_request_duration_seconds", "Chat completion latency (streams: until the last chunk)")
+LLM_TTFT = registry.histogram("llm_time_to_first_token_seconds", "Streaming chat completions: time to the first content token")
+
+
+def _record_usage(purpose: str, usage: Any):
+    if usage is None:
+        return
+    LLM_PROMPT_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0, purpose=purpose)
+    LLM_COMPLETION_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0, purpose=purpose)
+
+
+def _record_success(purpose: str, started: float, response: Any, retries: int = 0):
+    LLM_LATENCY.observe(time.perf_counter() - started, purpose=purpose)
+    LLM_REQUESTS.inc(purpose=purpose, status="ok")
+    if retries:
+        LLM_RETRIES.inc(retries, purpose=purpose)
+    _record_usage(purpose, getattr(response, "usage", None))
+
+
+def _tag_purpose(purpose: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    return {**kwargs, "extra_headers": {**(kwargs.get("extra_headers") or {}), PURPOSE_HEADER: purpose}}
+
+
+def _record_error(purpose: str, started: float, error: Exception):
+    LLM_LATENCY.observe(time.perf_counter() - started, purpose=purpose)
+    LLM_REQUESTS.inc(purpose=purpose, status="error")
+    LLM_ERRORS.inc(purpose=purpose, error=type(error).__name__)
+
+
+# ============================================
+# Single-flight Coalescing
+# ============================================
+LLM_COALESCED = registry.counter("llm_coalesced_total", "Chat completions served by another identical in-flight call")
+LLM_SINGLE_FLIGHT_LEADERS = registry.counter("llm_single_flight_leaders_total", "Coalescable chat completions that went to Azure OpenAI")
+
+
+class _Flight:
+    """One in-flight synchronous call that followers wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response: Any = None
+        self.error: Optional[BaseException] = None
+
+
+_sync_flights: Dict[str, _Flight] = {}
+_sync_flights_lock = threading.Lock()
+_async_flights: Dict[str, "asyncio.Future"] = {}
+
+
+def _single_flight_key(client: Any, kwargs: Dict[str, Any]) -> Optional[str]:
+    """
+    Key for deterministic requests only: temperature 0, one choice, no streaming.
+    The request body is hashed so prompts (and any PII in them) are not kept as keys.
+    """
+    if not LLM_SINGLE_FLIGHT or kwargs.get("stream") or kwargs.get("n", 1) != 1:
+        return None
+    if kwargs.get("temperature") != 0:
+        return None
+    body = json.dumps(kwargs, sort_keys=True, ensure_ascii=False, default=str)
+    endpoint = str(getattr(client, "base_url", ""))
+    return hashlib.sha256(f"{endpoint}\x00{body}".encode("utf-8")).hexdigest()
+
+
+def single_flight_stats() -> Dict[str, Any]:
+    with _sync_flights_lock:
+        in_flight = len(_sync_flights) + len(_async_flights)
+    return {"enabled": LLM_SINGLE_FLIGHT, "in_flight": in_flight}
+
+
+def chat_completion(client: Any, purpose: str, **kwargs) -> Any:
+    """
+    Instrumented client.chat.completions.create for the synchronous AzureOpenAI clients.
+    purpose tags the call site (router, translate, detect_language, parse_with_ai, ...) in /metrics.
+    Identical concurrent temperature-0 requests are coalesced into one call.
+    """
+    key = _single_flight_key(client, kwargs)
+    if key is None:
+        return _chat_completion(client, purpose, **kwargs)
+
+    with _sync_flights_lock:
+        flight = _sync_flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _sync_flights[key] = _Flight()
+
+    if not leader:
+        flight.done.wait()
+        LLM_COALESCED.inc(purpose=purpose)
+        if flight.error is not None:
+            raise flight.error
+        return flight.response
+
+    LLM_SINGLE_FLIGHT_LEADERS.inc(purpose=purpose)
+    try:
+        flight.response = _chat_completion(client, purpose, **kwargs)
+        return flight.response
+    except BaseException as e:
+        flight.error = e
+        raise
+    finally:
+        with _sync_flights_lock:
+            _sync_flights.pop(key, None)
+        flight.done.set()
+
+
+def _bounded(client: Any) -> Any:
+    """Client limited to the remaining request budget (no SDK retries when little is left)"""
+    timeout = call_timeout(LLM_TIMEOUT_SECONDS)
+    if timeout is None or timeout >= LLM_TIMEOUT_SECONDS:
+        return client
+    if timeout < 2 * LLM_MIN_BUDGET_SECONDS:
+        return client.with_options(timeout=timeout, max_retries=0)
+    return client.with_options(timeout=timeout)
+
+
+def _chat_completion(client: Any, purpose: str, **kwargs) -> Any:
+    client = _bounded(client)
+    started = time.perf_counter()
+    try:
+        raw = client.chat.completions.with_raw_response.create(**_tag_purpose(purpose, kwargs))
+        response = raw.parse()
+    except Exception as e:
+        _record_error(purpose, started, e)
+        raise
+    _record_success(purpose, started, response, getattr(raw, "retries_taken", 0))
+    return response
+
+
+# ============================================
+# Shared Async Client
+# ============================================
+def get_async_client() -> Optional[AsyncAzureOpenAI]:
+    """Process-wide AsyncAzureOpenAI client (None if Azure OpenAI is not configured)"""
+    global _async_client
+    if _async_client is not None:
+        return _async_client
+    if not AZURE_OPENAI_ENDPOINT or not AZURE_OPENAI_KEY:
+        return None
+    with _async_client_lock:
+        if _async_client is None:
+            http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=LLM_MAX_KEEPALIVE,
+                ),
+                timeout=LLM_TIMEOUT_SECONDS,
+            )
+            _async_client = AsyncAzureOpenAI(
+                azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                api_key=AZURE_OPENAI_KEY,
+                api_version=AZURE_OPENAI_API_VERSION,
+                http_client=http_client,
+            )
+            logger.info(f"✅ Async Azure OpenAI client initialized (pool: {LLM_MAX_CONNECTIONS} connections)")
+    return _async_client
+
+
+async def achat_completion(purpose: str = "unspecified", **kwargs) -> Any:
+    """
+    Awaitable chat completion on the shared client.
+    Accepts the same keyword arguments as client.chat.completions.create;
+    model defaults to AZURE_OPENAI_DEPLOYMENT.
+    """
+    client = get_async_client()
+    if client is None:
+        raise RuntimeError("Azure OpenAI is not configured")
+    kwargs.setdefault("model", AZURE_DEPLOYMENT)
+
+    key = _single_flight_key(client, kwargs)
+    if key is None:
+        return await _achat_completion(client, purpose, **kwargs)
+
+    flight = _async_flights.get(key)
+    if flight is not None:
+        LLM_COALESCED.inc(purpose=purpose)
+        try:
+            # shield: a cancelled follower must not cancel the leader's call
+            return await asyncio.shield(flight)
+        except asyncio.CancelledError:
+            if not flight.cancelled():
+                raise
+            # The leader's request was cancelled (client went away) → make our own call
+            return await _achat_completion(client, purpose, **kwargs)
+
+    flight = _async_flights[key] = asyncio.get_running_loop().create_future()
+    LLM_SINGLE_FLIGHT_LEADERS.inc(purpose=purpose)
+    try:
+        response = await _achat_completion(client, purpose, **kwargs)
+        flight.set_result(response)
+        return response
+    except asyncio.CancelledError:
+        flight.cancel()
+        raise
+    except Exception as e:
+        flight.set_exception(e)
+        # Followers re-raise it; mark retrieved so an unawaited future does not log a warning
+        flight.exception()
+        raise
+    finally:
+        _async_flights.pop(key, None)
+
+
+async def _achat_completion(client: AsyncAzureOpenAI, purpose: str, **kwargs) -> Any:
+    client = _bounded(client)
+    started = time.perf_counter()
+    try:
+        raw = await client.chat.completions.with_raw_response.create(**_tag_purpose(purpose, kwargs))
+        response = raw.parse()
+    except Exception as e:
+        _record_error(purpose, started, e)
+        raise
+    _record_success(purpose, started, response, getattr(raw, "retries_taken", 0))
+    return response
+
+
+async def astream_chat_completion(purpose: str = "unspecified", **kwargs) -> AsyncIterator[str]:
+    """
+    Streaming chat completion on the shared client.
+    Yields content deltas as they arrive (empty keep-alive / role-only chunks are skipped).
+    """
+    client = get_async_client()
+    if client is None:
+        raise RuntimeError("Azure OpenAI is not configured")
+    client = _bounded(client)
+    kwargs.setdefault("model", AZURE_DEPLOYMENT)
+    # Final chunk carries token usage
+    kwargs.setdefault("stream_options", {"include_usage": True})
+    started = time.perf_counter()
+    first_token = True
+    try:
+        stream = await client.chat.completions.create(stream=True, **_tag_purpose(purpose, kwargs))
+        async for chunk in stream:
+            if getattr(chunk, "usage", None):
+                _record_usage(purpose, chunk.usage)
+            # Azure sends a first chunk with prompt_filter_results and no choices
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token:
+                    LLM_TTFT.observe(time.perf_counter() - started, purpose=purpose)
+                    first_token = False
+                yield delta
+    except Exception as e:
+        _record_error(purpose, started, e)
+        raise
+    LLM_LATENCY.observe(time.perf_counter() - started, purpose=purpose)
+    LLM_REQUESTS.inc(purpose=purpose, status="ok")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a synchronous agent function in a worker thread so it does not block the event loop.
+    Used for the flows that still mix DB, OCR and blob I/O with their LLM calls.
+    """
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+async def close_async_client():
+    """Close the pooled HTTP connections (call on app shutdown)"""
+    global _async_client
+    if _async_client is not None:
+        await _async_client.close()
+        _async_client = None
@@ -1,8 +1,9 @@
-from fastapi import FastAPI, Form, File, UploadFile, HTTPException
+from fastapi import FastAPI, Form, File, UploadFile, HTTPException, Request
 import requests
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response
+from fastapi.encoders import jsonable_encoder
 from dotenv import load_dotenv
 import os
 from typing import Optional
@@ -10,12 +11,12 @@ import json
 import re
 from openai import AzureOpenAI
 from pathlib import Path
-from api.pre_registration import get_ai_response
-from api.post_registration import post_chat
+from api.pre_registration import get_ai_response_async, get_ai_response_stream, format_sse, SSE_HEADERS
+from api.post_registration import post_chat_async
 from api.post_registration import ChatRequest
-from api.registration import get_bot_response
+from api.registration import get_bot_response_async
 from api.registration import initialize_blob_storage
-from utils import detect_language, process_aadhaar_details, get_multilingual_message, format_aadhaar_confirmation
+from utils import adetect_language, process_aadhaar_details, aget_multilingual_message, format_aadhaar_confirmation
 import logging
 from datetime import datetime
 from typing import List
@@ -25,6 +26,17 @@ import traceback
 from pydantic import BaseModel
 from werkzeug.utils import secure_filename
 import pandas as pd
+from intent_router import intent_router
+from llm_client import chat_completion, achat_completion, close_async_client, single_flight_stats
+from metrics import registry as metrics_registry, stats_collector, PROMETHEUS_CONTENT_TYPE
+from language_detector import detection_stats
+from translation_cache import translation_cache
+from conversation_memory import conversation_memory
+from document_cache import document_parse_cache, ocr_result_cache
+from deadline import deadline_scope, REQUEST_DEADLINE_SECONDS
+from api.pre_registration import eligibility_engine
+from api.post_registration import stage_timing_stats
+from ocr_service import ocr_service
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -61,6 +73,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.middleware("http")
+async def request_deadline(request: Request, call_next):
+    """Latency budget for the whole request; LLM steps fall back to local alternatives when it runs low"""
+    with deadline_scope(REQUEST_DEADLINE_SECONDS, "http"):
+        return await call_next(request)
+
 # Mount static files
 # app.mount("/static", StaticFiles(directory="frontend/static"), name="static")
 
@@ -188,7 +207,7 @@ async def handle_aadhaar_flow(
     """
     # Detect language
     if not session.get("language"):
-        session["language"] = detect_language(message)
+        session["language"] = await adetect_language(message, session_id=session_id)
     
     # ===== VERIFICATION MODE =====
     if prev_res_mode == f"{target_mode}_aadhaar_verify":
@@ -238,7 +257,7 @@ async def handle_aadhaar_flow(
                     session["menu_selected"] = "eligibility"
                     session["current_mode"] = "eligibility"
                     
-                    ai_result = get_ai_response(
+                    ai_result = await get_ai_response_async(
                         session_id=session_id,
                         user_message=message,
                         aadhaar_data=session.get("aadhaar_data")
@@ -259,7 +278,7 @@ async def handle_aadhaar_flow(
                     session["menu_selected"] = "form_filling"
                     SESSION_MODE[session_id] = "form_filling"
                     
-                    bot_response = get_bot_response(
+                    bot_response = await get_bot_response_async(
                         session_id=session_id,
                         user_message="",
                         file_uploaded=None
@@ -276,7 +295,7 @@ async def handle_aadhaar_flow(
                     # ✅ Get full Aadhaar number
                     aadhaar_number = session.get("aadhaar_data", {}).get("aadhaar_number", "")
                     
-                    res = post_chat(ChatRequest(
+                    res = await post_chat_async(ChatRequest(
                         session_id=session_id,
                         message=original_msg,
                         aadhaar_number=aadhaar_number ,
@@ -311,7 +330,7 @@ async def handle_aadhaar_flow(
                 # Get full Aadhaar number
                 aadhaar_number = session.get("aadhaar_data", {}).get("aadhaar_number", "")
                 
-                res = post_chat(ChatRequest(
+                res = await post_chat_async(ChatRequest(
                     session_id=session_id,
                     message=original_msg,
                     aadhaar_number=aadhaar_number,
@@ -324,13 +343,13 @@ async def handle_aadhaar_flow(
             session["aadhaar_verified"] = False
             session["aadhaar_data"] = None
             return {
-                "response": {"response": get_multilingual_message("aadhaar_request", session["language"])},
+                "response": {"response": await aget_multilingual_message("aadhaar_request", session["language"])},
                 "mode": f"{target_mode}_aadhaar_verify"
             }
         else:
             # Ask again
             return {
-                "response": {"response": get_multilingual_message("clarify_yes_no", session["language"])},
+                "response": {"response": await aget_multilingual_message("clarify_yes_no", session["language"])},
                 "mode": f"{target_mode}_aadhaar_confirm"
             }
 
@@ -553,7 +572,44 @@ Output format:
 # --------------------------------------------------
 # ROUTER FUNCTION (UPDATED)
 # --------------------------------------------------
+CALL_CENTER_FLAGS = ("eligibility", "post_application")
+
+
 def route_message(message: str, prev_res: Optional[str]):
+    """Local intent classifier first; the LLM router only on low confidence"""
+    return intent_router.route(
+        message, prev_res,
+        lambda: _route_message_llm(ROUTER_SYSTEM_PROMPT, message, prev_res)
+    )
+
+
+def route_message_call_center(message: str, prev_res: Optional[str]):
+    """Local intent classifier first; the LLM router only on low confidence"""
+    return intent_router.route(
+        message, prev_res,
+        lambda: _route_message_llm(CALL_CENTER__CHATBOT_ROUTER_SYSTEM_PROMPT, message, prev_res),
+        labels=CALL_CENTER_FLAGS
+    )
+
+
+async def route_message_async(message: str, prev_res: Optional[str]):
+    """Non-blocking route_message for the async handlers"""
+    return await intent_router.aroute(
+        message, prev_res,
+        lambda: _route_message_llm_async(ROUTER_SYSTEM_PROMPT, message, prev_res)
+    )
+
+
+async def route_message_call_center_async(message: str, prev_res: Optional[str]):
+    """Non-blocking route_message_call_center for the async handlers"""
+    return await intent_router.aroute(
+        message, prev_res,
+        lambda: _route_message_llm_async(CALL_CENTER__CHATBOT_ROUTER_SYSTEM_PROMPT, message, prev_res),
+        labels=CALL_CENTER_FLAGS
+    )
+
+
+def _router_messages(system_prompt: str, message: str, prev_res: Optional[str]):
     user_payload = f"""
 Previous assistant response:
 {prev_res or "None"}
@@ -561,13 +617,16 @@ Previous assistant response:
 Current user message:
 {message}
 """
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_payload}
+    ]
 
-    response = AZURE_CLIENT.chat.completions.create(
+
+def _route_message_llm(system_prompt: str, message: str, prev_res: Optional[str]):
+    response = chat_completion(AZURE_CLIENT, purpose="router",
         model=AZURE_DEPLOYMENT,
-        messages=[
-            {"role": "system", "content": ROUTER_SYSTEM_PROMPT},
-            {"role": "user", "content": user_payload}
-        ],
+        messages=_router_messages(system_prompt, message, prev_res),
         temperature=0,
         max_tokens=50
     )
@@ -575,21 +634,11 @@ Current user message:
     return json.loads(response.choices[0].message.content)
 
 
-def route_message_call_center(message: str, prev_res: Optional[str]):
-    user_payload = f"""
-Previous assistant response:
-{prev_res or "None"}
-
-Current user message:
-{message}
-"""
-
-    response = AZURE_CLIENT.chat.completions.create(
+async def _route_message_llm_async(system_prompt: str, message: str, prev_res: Optional[str]):
+    response = await achat_completion(
+        purpose="router",
         model=AZURE_DEPLOYMENT,
-        messages=[
-            {"role": "system", "content": CALL_CENTER__CHATBOT_ROUTER_SYSTEM_PROMPT},
-            {"role": "user", "content": user_payload}
-        ],
+        messages=_router_messages(system_prompt, message, prev_res),
         temperature=0,
         max_tokens=50
     )
@@ -597,6 +646,57 @@ Current user message:
     return json.loads(response.choices[0].message.content)
 
 
+@app.get("/router/stats")
+async def router_stats():
+    """Local vs LLM routing counters and shadow-mode agreement per confidence bucket"""
+    return intent_router.stats()
+
+
+def _post_chat_stage_metrics():
+    for stage, st in stage_timing_stats().items():
+        yield "post_chat_stage_calls_total", "Post-application answer stages run", "counter", {"stage": stage}, st["count"]
+        yield "post_chat_stage_avg_ms", "Average post-application stage latency (ms)", "gauge", {"stage": stage}, st["avg_ms"]
+        yield "post_chat_stage_max_ms", "Max post-application stage latency (ms)", "gauge", {"stage": stage}, st["max_ms"]
+
+
+# Component stats that are kept in-process, published at scrape time.
+# Monotonic keys are exported as counters (<prefix>_<key>_total); the rest are gauges.
+_CACHE_COUNTERS = ("hits", "misses", "expired", "evictions", "disk_hits", "disk_errors", "llm_calls_saved")
+metrics_registry.register_collector("intent_router", stats_collector(
+    "intent_router", intent_router.stats, "Intent router counters (local vs LLM decisions)",
+    counters=("local_decisions", "llm_decisions")))
+metrics_registry.register_collector("language_detection", stats_collector(
+    "language_detection", detection_stats, "Language detection outcomes (local / escalated / memo hits)",
+    counters=("local", "escalated", "memo_hits")))
+metrics_registry.register_collector("translation_cache", stats_collector(
+    "translation_cache", translation_cache.stats, "Translation cache counters", counters=_CACHE_COUNTERS))
+metrics_registry.register_collector("eligibility_engine", stats_collector(
+    "eligibility_engine", eligibility_engine.stats, "Eligibility engine turns (local vs LLM-assisted)",
+    counters=("local_turns", "llm_interpretations", "llm_phrasings", "clarifications", "deferred_to_agent",
+              "verdict_eligible", "verdict_not_eligible")))
+metrics_registry.register_collector("conversation_memory", stats_collector(
+    "conversation_memory", conversation_memory.stats, "Eligibility prompt memory and token budget",
+    counters=("turns", "compacted_messages", "trimmed_messages", "over_budget_turns",
+              "prompt_tokens_sent", "prompt_tokens_saved")))
+metrics_registry.register_collector("document_parse_cache", stats_collector(
+    "document_parse_cache", document_parse_cache.stats, "Structured document parse cache counters",
+    counters=_CACHE_COUNTERS))
+metrics_registry.register_collector("llm_single_flight", stats_collector(
+    "llm_single_flight", single_flight_stats, "Identical temperature-0 LLM requests currently in flight"))
+metrics_registry.register_collector("post_chat_stages", _post_chat_stage_metrics)
+metrics_registry.register_collector("ocr_result_cache", stats_collector(
+    "ocr_result_cache", ocr_result_cache.stats, "OCR page text cache counters (memory + optional disk tier)",
+    counters=_CACHE_COUNTERS))
+metrics_registry.register_collector("ocr_executor", stats_collector(
+    "ocr_executor", ocr_service.stats, "OCR process pool occupancy (in flight / queued / running)"))
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint: LLM calls per purpose (count, tokens, latency, errors, retries) and component stats"""
+    return Response(content=metrics_registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @app.on_event("startup")
 async def startup_event():
     try:
@@ -612,6 +712,13 @@ async def startup_event():
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await close_async_client()
+    ocr_service.shutdown()
+    translation_cache.flush()
+
+
 # --------------------------------------------------
 # ROUTER API (UPDATED INPUT)
 # --------------------------------------------------
@@ -672,7 +779,7 @@ async def smart_chat_router(
                 #     "aadhaar_prefilled": False
                 # }
             
-            bot_response = get_bot_response(
+            bot_response = await get_bot_response_async(
                 session_id=session_id,
                 user_message="",
                 file_uploaded=None
@@ -690,7 +797,7 @@ async def smart_chat_router(
             print("User wants to check eligibility after exit")
             session["menu_selected"] = "eligibility"
             
-            ai_result = get_ai_response(
+            ai_result = await get_ai_response_async(
                 session_id=session_id,
                 user_message=message,
                 aadhaar_data=session.get("aadhaar_data")
@@ -712,7 +819,7 @@ async def smart_chat_router(
             
             aadhaar_number = session.get("aadhaar_data", {}).get("aadhaar_number", "")
             
-            res = post_chat(ChatRequest(
+            res = await post_chat_async(ChatRequest(
                 session_id=session_id,
                 message=message,
                 aadhaar_number=aadhaar_number,
@@ -807,7 +914,7 @@ async def smart_chat_router(
         # -----------------------------
         if user_msg == "submit":
             print("User chose to submit form")
-            bot_response = get_bot_response(
+            bot_response = await get_bot_response_async(
                 session_id,
                 message,
                 file_uploaded
@@ -822,7 +929,7 @@ async def smart_chat_router(
         else:
             print("Continue form filling or call get_bot_response")
             try:
-                bot_response = get_bot_response(
+                bot_response = await get_bot_response_async(
                     session_id,
                     message,
                     file_uploaded
@@ -835,7 +942,7 @@ async def smart_chat_router(
                     if target == "eligibility":
                         session["menu_selected"] = "eligibility"
                         session["current_mode"] = "eligibility"
-                        ai_result = get_ai_response(
+                        ai_result = await get_ai_response_async(
                             session_id=session_id,
                             user_message="",
                             aadhaar_data=session.get("aadhaar_data")
@@ -848,7 +955,7 @@ async def smart_chat_router(
                     elif target == "post_application":
                         session["menu_selected"] = "post_application"
                         aadhaar_number = session.get("aadhaar_data", {}).get("aadhaar_number", "")
-                        res = post_chat(ChatRequest(
+                        res = await post_chat_async(ChatRequest(
                             session_id=session_id,
                             message="check application status",
                             aadhaar_number=aadhaar_number,
@@ -906,7 +1013,7 @@ async def smart_chat_router(
 
         # Pass everything to get_ai_response — it handles DPIP, Aadhaar number,
         # image upload with front+back validation, confirmation, and correction
-        ai_result = get_ai_response(
+        ai_result = await get_ai_response_async(
             session_id=session_id,
             user_message=message,
             aadhaar_data=None,
@@ -947,7 +1054,7 @@ async def smart_chat_router(
     
     # STEP 2.5: HANDLE DPIP CONSENT MODE
     if prev_res_mode == "dpip_consent":
-        bot_response = get_bot_response(
+        bot_response = await get_bot_response_async(
             session_id=session_id,
             user_message=message,
             file_uploaded=None
@@ -972,7 +1079,7 @@ async def smart_chat_router(
                 "extension": file_extension,
                 "doc_type": "aadhaar"
             }
-        bot_response = get_bot_response(
+        bot_response = await get_bot_response_async(
             session_id=session_id,
             user_message=message,
             file_uploaded=file_uploaded
@@ -996,7 +1103,7 @@ async def smart_chat_router(
                 "extension": file_extension,
                 "doc_type": "pan_card"
             }
-        bot_response = get_bot_response(
+        bot_response = await get_bot_response_async(
             session_id=session_id,
             user_message=message,
             file_uploaded=file_uploaded
@@ -1025,7 +1132,7 @@ async def smart_chat_router(
             session["original_message"] = message
             SESSION_MODE[session_id] = "form_filling"
             
-            bot_response = get_bot_response(
+            bot_response = await get_bot_response_async(
                 session_id=session_id,
                 user_message="",
                 file_uploaded=None
@@ -1047,7 +1154,7 @@ async def smart_chat_router(
             
             # ALWAYS ASK FOR NEW AADHAAR - Don't reuse from other modes
             return {
-                "response": {"response": get_multilingual_message("aadhaar_request", session["language"])},
+                "response": {"response": await aget_multilingual_message("aadhaar_request", session["language"])},
                 "mode": "post_application_aadhaar_verify"
             }
         
@@ -1055,7 +1162,7 @@ async def smart_chat_router(
         else:
             print("Continuing eligibility conversation")
             
-            ai_result = get_ai_response(
+            ai_result = await get_ai_response_async(
                 session_id=session_id,
                 user_message=message,
                 aadhaar_data=session.get("aadhaar_data")
@@ -1112,7 +1219,7 @@ async def smart_chat_router(
             print("Intent: Eligibility")
             session["menu_selected"] = "eligibility"
             
-            ai_result = get_ai_response(
+            ai_result = await get_ai_response_async(
                 session_id=session_id,
                 user_message=message,
                 aadhaar_data=session.get("aadhaar_data")
@@ -1134,7 +1241,7 @@ async def smart_chat_router(
             session["menu_selected"] = "form_filling"
             SESSION_MODE[session_id] = "form_filling"
             
-            bot_response = get_bot_response(
+            bot_response = await get_bot_response_async(
                 session_id=session_id,
                 user_message="",
                 file_uploaded=None
@@ -1156,7 +1263,7 @@ async def smart_chat_router(
             # Get full Aadhaar number
             aadhaar_number = session.get("aadhaar_data", {}).get("aadhaar_number", "")
             
-            res = post_chat(ChatRequest(
+            res = await post_chat_async(ChatRequest(
                 session_id=session_id,
                 message=message,
                 aadhaar_number=aadhaar_number  ,
@@ -1200,10 +1307,10 @@ async def smart_chat_router(
                 }
 
             # Run OCR using utils.py functions (same as pre_registration.py)
-            from utils import extract_text_from_bytes
+            from utils import aextract_text_from_bytes
             import re as _re
 
-            raw_text = extract_text_from_bytes(file_content, file_extension)
+            raw_text = await aextract_text_from_bytes(file_content, file_extension)
 
             if not raw_text.strip():
                 return {
@@ -1235,7 +1342,7 @@ async def smart_chat_router(
             print(f"✅ OCR extracted Aadhaar: {aadhaar_number[-4:]} (last 4 digits)")
 
             original_msg = session.get("original_message", "check application status")
-            res = post_chat(ChatRequest(
+            res = await post_chat_async(ChatRequest(
                 session_id=session_id,
                 message=original_msg,
                 aadhaar_number=aadhaar_number,
@@ -1266,7 +1373,7 @@ async def smart_chat_router(
         session["post_app_aadhaar_number"] = aadhaar_number
 
         original_msg = session.get("original_message", "check application status")
-        res = post_chat(ChatRequest(
+        res = await post_chat_async(ChatRequest(
             session_id=session_id,
             message=original_msg,
             aadhaar_number=aadhaar_number,
@@ -1287,10 +1394,10 @@ async def smart_chat_router(
             print("Menu: Eligibility selected - starting with DPIP consent")
             session["menu_selected"] = "eligibility"
             session["current_mode"] = "eligibility_aadhaar"
-            session["language"] = detect_language(message)
+            session["language"] = await adetect_language(message, session_id=session_id)
             
             # Trigger DPIP consent first (pass empty string)
-            ai_result = get_ai_response(
+            ai_result = await get_ai_response_async(
                 session_id=session_id,
                 user_message="",
                 aadhaar_data=None,
@@ -1305,11 +1412,11 @@ async def smart_chat_router(
         elif menu_choice == "form_filling":
             print("Menu: Form filling selected - starting with DPIP consent")
             session["menu_selected"] = "form_filling"
-            session["language"] = detect_language(message)
+            session["language"] = await adetect_language(message, session_id=session_id)
             SESSION_MODE[session_id] = "form_filling"
             
             try:
-                bot_response = get_bot_response(
+                bot_response = await get_bot_response_async(
                     session_id=session_id,
                     user_message="",
                     file_uploaded=None
@@ -1346,7 +1453,7 @@ async def smart_chat_router(
         elif menu_choice == "post_application":
             print("Menu: Post application selected")
             session["menu_selected"] = "post_application"
-            session["language"] = detect_language(message)   
+            session["language"] = await adetect_language(message, session_id=session_id)   
                 
             # Directly ask for Aadhaar number
             aadhaar_request_messages = {
@@ -1371,10 +1478,10 @@ async def smart_chat_router(
             print("Menu: No clear intent - requesting Aadhaar first")
             session["menu_selected"] = None  # Don't set yet, will decide after Aadhaar
             session["current_mode"] = "intent_detection_aadhaar"
-            session["language"] = detect_language(message)
+            session["language"] = await adetect_language(message, session_id=session_id)
             
             # Request Aadhaar to start
-            aadhaar_request = get_multilingual_message("aadhaar_request", session["language"])
+            aadhaar_request = await aget_multilingual_message("aadhaar_request", session["language"])
             
             return {
                 "response": {
@@ -1387,7 +1494,7 @@ async def smart_chat_router(
     # STEP 6: FALLBACK - USE ROUTER
     # ==========================================
     print("Fallback: Using router")
-    routing_result = route_message(message, prev_res)
+    routing_result = await route_message_async(message, prev_res)
     print(f"Routing result: {routing_result}")
 
     route = routing_result["flag_type"]
@@ -1395,7 +1502,7 @@ async def smart_chat_router(
     if route == 'eligibility':
         print("Routed to Eligibility Agent")
 
-        ai_result = get_ai_response(
+        ai_result = await get_ai_response_async(
             session_id=session_id,
             user_message=message,
             aadhaar_data=session.get("aadhaar_data"),
@@ -1418,7 +1525,7 @@ async def smart_chat_router(
         SESSION_MODE[session_id] = "form_filling"
 
         # ✅ DIRECTLY CALL registration.py
-        bot_response = get_bot_response(
+        bot_response = await get_bot_response_async(
             session_id=session_id,
             user_message="",  # Empty message to trigger initial greeting
             file_uploaded=None
@@ -1439,7 +1546,7 @@ async def smart_chat_router(
         # ✅ Get full Aadhaar from session if available
         aadhaar_number = session.get("post_app_aadhaar_number")
         
-        res_post_application = post_chat(ChatRequest(
+        res_post_application = await post_chat_async(ChatRequest(
             session_id=session_id,
             message=message,
             aadhaar_number=aadhaar_number,  
@@ -1455,6 +1562,64 @@ async def smart_chat_router(
         "flag_type": routing_result["flag_type"]
     }
 
+
+@app.post("/smart-chat-router-ladki-bahin/stream")
+async def smart_chat_router_stream(
+        message: str = Form(...),
+        session_id: str = Form(...),
+        prev_res: Optional[str] = Form(None),
+        doc_type: Optional[str] = Form(None),
+        file: Optional[UploadFile] = File(None),
+        prev_res_mode: Optional[str] = Form(None)
+):
+    """
+    SSE variant of /smart-chat-router-ladki-bahin.
+    Eligibility conversation turns stream the agent reply token by token; every other
+    turn is answered by the regular router and sent as a single "done" event carrying
+    the usual response payload.
+    """
+    session = initialize_session(session_id)
+
+    # Same branch as STEP 4 "continue eligibility conversation" in smart_chat_router
+    if (prev_res_mode == "eligibility" and not (file and file.filename)
+            and classify_menu_selection(message) not in ("form_filling", "post_application")):
+
+        async def eligibility_events():
+            async for event in get_ai_response_stream(
+                session_id=session_id,
+                user_message=message,
+                aadhaar_data=session.get("aadhaar_data")
+            ):
+                if event["event"] == "done":
+                    is_flow_complete = event.get("is_complete", False)
+                    event = {
+                        "event": "done",
+                        "response": {"response": event["response"]},
+                        "mode": "eligibility_flow_complete" if is_flow_complete else "eligibility",
+                        "lang": session.get("language", "marathi")
+                    }
+                yield format_sse(event)
+
+        return StreamingResponse(eligibility_events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+    result = await smart_chat_router(
+        message=message,
+        session_id=session_id,
+        prev_res=prev_res,
+        doc_type=doc_type,
+        file=file,
+        prev_res_mode=prev_res_mode
+    )
+
+    payload = jsonable_encoder(result)
+    if not isinstance(payload, dict):
+        payload = {"response": payload}
+
+    async def single_event():
+        yield format_sse({"event": "done", **payload})
+
+    return StreamingResponse(single_event(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 def split_excel_by_rows(file_path, output_dir, base_filename, chunk_size=20):
     """
     Split Excel into multiple Excel files with fixed row count.
@@ -1754,7 +1919,7 @@ async def call_center_smart_chat_router(
         
         # Detect language if not set
         if not session.get("language"):
-            session["language"] = detect_language(message)
+            session["language"] = await adetect_language(message, session_id=session_id)
         
         # Validate Aadhaar number format
         aadhaar_match = re.fullmatch(r"\d{12}", message.strip())
@@ -1790,7 +1955,7 @@ async def call_center_smart_chat_router(
         session["current_mode"] = "eligibility"
         
         # Generate confirmation message (same as chatbot)
-        confirmation_msg = get_multilingual_message(
+        confirmation_msg = await aget_multilingual_message(
             "aadhaar_confirmation_number",  # Different key for number-based confirmation
             session["language"],
             aadhaar_number=f"XXXX-XXXX-{aadhaar_number[-4:]}"  # Mask for privacy
@@ -1824,7 +1989,7 @@ async def call_center_smart_chat_router(
             
             # ✅ ALWAYS ASK FOR AADHAAR - Don't reuse from eligibility
             if not session.get("language"):
-                session["language"] = detect_language(message)
+                session["language"] = await adetect_language(message, session_id=session_id)
             
             aadhaar_request_messages = {
                 "marathi": "कृपया तुमचा १२ अंकी आधार क्रमांक प्रविष्ट करा.",
@@ -1844,7 +2009,7 @@ async def call_center_smart_chat_router(
             
         # Continue eligibility conversation (IDENTICAL to chatbot)
         else:
-            ai_result = get_ai_response(
+            ai_result = await get_ai_response_async(
                 session_id=session_id,
                 user_message=message,
                 aadhaar_data=session.get("aadhaar_data"),
@@ -1874,7 +2039,7 @@ async def call_center_smart_chat_router(
             
             # ✅ ALWAYS ASK FOR AADHAAR
             if not session.get("language"):
-                session["language"] = detect_language(message)
+                session["language"] = await adetect_language(message, session_id=session_id)
             
             aadhaar_request_messages = {
                 "marathi": "कृपया तुमचा १२ अंकी आधार क्रमांक प्रविष्ट करा.",
@@ -1893,7 +2058,7 @@ async def call_center_smart_chat_router(
             }
         
         # Continue conversation
-        ai_result = get_ai_response(
+        ai_result = await get_ai_response_async(
             session_id=session_id,
             user_message=message,
             aadhaar_data=session.get("aadhaar_data"),
@@ -1920,7 +2085,7 @@ async def call_center_smart_chat_router(
         
         if not aadhaar_match:
             if not session.get("language"):
-                session["language"] = detect_language(message)
+                session["language"] = await adetect_language(message, session_id=session_id)
             
             error_messages = {
                 "marathi": "अवैध आधार क्रमांक. कृपया १२ अंकी आधार क्रमांक प्रविष्ट करा.",
@@ -1943,7 +2108,7 @@ async def call_center_smart_chat_router(
         
         original_msg = session.get("original_message", "check application status")
         
-        res = post_chat(ChatRequest(
+        res = await post_chat_async(ChatRequest(
             session_id=session_id,
             message=original_msg,
             aadhaar_number=aadhaar_number,
@@ -1966,7 +2131,7 @@ async def call_center_smart_chat_router(
             print("[CALL CENTER] Eligibility selected - requesting Aadhaar")
             session["menu_selected"] = "eligibility"
             session["current_mode"] = "eligibility_aadhaar"
-            session["language"] = detect_language(message)
+            session["language"] = await adetect_language(message, session_id=session_id)
             
             # Ask for Aadhaar number (SAME FLOW as chatbot, different input method)
             aadhaar_request_messages = {
@@ -1989,7 +2154,7 @@ async def call_center_smart_chat_router(
         elif menu_choice == "post_application":
             print("[CALL CENTER] Post-application selected")
             session["menu_selected"] = "post_application"
-            session["language"] = detect_language(message)
+            session["language"] = await adetect_language(message, session_id=session_id)
             
             aadhaar_request_messages = {
                 "marathi": "कृपया तुमचा १२ अंकी आधार क्रमांक प्रविष्ट करा.",
@@ -2010,7 +2175,7 @@ async def call_center_smart_chat_router(
         # -------- UNKNOWN INTENT --------
         else:
             print("[CALL CENTER] No clear intent - asking for clarification")
-            session["language"] = detect_language(message)
+            session["language"] = await adetect_language(message, session_id=session_id)
             
             clarification_messages = {
                 "marathi": "कृपया मला सांगा - तुम्हाला पात्रता तपासायची आहे की अर्जाची स्थिती पाहायची आहे?",
@@ -2098,7 +2263,7 @@ async def call_center_smart_chat_router(
     # ==========================================
     print("[CALL CENTER] Fallback - using router")
     
-    routing_result = route_message_call_center(message, prev_res)
+    routing_result = await route_message_call_center_async(message, prev_res)
     route = routing_result["flag_type"]
 
     if route == 'eligibility':
@@ -2109,7 +2274,7 @@ async def call_center_smart_chat_router(
             session["current_mode"] = "eligibility_aadhaar"
             
             if not session.get("language"):
-                session["language"] = detect_language(message)
+                session["language"] = await adetect_language(message, session_id=session_id)
             
             aadhaar_request_messages = {
                 "marathi": "पात्रता तपासण्यासाठी, कृपया तुमचा १२ अंकी आधार क्रमांक प्रविष्ट करा.",
@@ -2128,7 +2293,7 @@ async def call_center_smart_chat_router(
             }
         
         # Already have Aadhaar, continue
-        ai_result = get_ai_response(
+        ai_result = await get_ai_response_async(
             session_id=session_id,
             user_message=message,
             aadhaar_data=session.get("aadhaar_data"),
@@ -2154,7 +2319,7 @@ async def call_center_smart_chat_router(
             session["post_app_aadhaar_number"] = aadhaar_match.group()
             original_msg = session.get("original_message") or "check application status"
 
-            res_post_application = post_chat(ChatRequest(
+            res_post_application = await post_chat_async(ChatRequest(
                 session_id=session_id,
                 message=original_msg,
                 aadhaar_number=session["post_app_aadhaar_number"],
@@ -2166,7 +2331,7 @@ async def call_center_smart_chat_router(
             session["original_message"] = message
             
             if not session.get("language"):
-                session["language"] = detect_language(message)
+                session["language"] = await adetect_language(message, session_id=session_id)
             
             aadhaar_request_messages = {
                 "marathi": "कृपया तुमचा १२ अंकी आधार क्रमांक प्रविष्ट करा.",
@@ -2184,7 +2349,7 @@ async def call_center_smart_chat_router(
                 "mode": "post_application_awaiting_aadhaar"
             }
         
-        res_post_application = post_chat(ChatRequest(
+        res_post_application = await post_chat_async(ChatRequest(
             session_id=session_id,
             message=message,
             aadhaar_number=session["post_app_aadhaar_number"],
@@ -2245,7 +2410,6 @@ async def get_speech_token():
 
 
 
-from fastapi.responses import Response
 from api.text_to_speech import text_to_speech_gemini
 # ... existing code ...
 
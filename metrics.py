@@ -0,0 +1,195 @@
+"""
+Metrics Module for Ladki Bahin Yojana
+In-process counters, gauges and histograms rendered in the Prometheus text exposition format
+Collectors let modules that already keep their own stats (caches, router, OCR) publish them
+without double bookkeeping
+"""
+
+import math
+import threading
+from typing import Dict, List, Optional, Tuple, Callable, Iterable
+
+# ============================================
+# Metrics Configuration
+# ============================================
+# Seconds; LLM calls range from ~0.2 s (router) to tens of seconds (long generations)
+DEFAULT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 21.0, 34.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Optional[Dict[str, str]]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+# ============================================
+# Metric Types
+# ============================================
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name, self.help, self.type = name, help_text, "counter"
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            return [f"{self.name}{_format_labels(k)} {_format_value(v)}" for k, v in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self.type = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = float(value)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name, self.help, self.type = name, help_text, "histogram"
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[LabelKey, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', _format_value(bound)))} {count}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+# ============================================
+# Registry
+# ============================================
+class MetricsRegistry:
+    """Process-wide metric registry; get-or-create by name so modules can share metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._collectors: Dict[str, Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, help_text: str, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str) -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str, buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, buckets=buckets)
+
+    def register_collector(self, name: str, collect: Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]):
+        """
+        collect() yields (metric_name, help, type, labels, value) tuples at scrape time.
+        Re-registering a name replaces the previous collector.
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines: List[str] = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+
+        for metric in sorted(metrics, key=lambda m: m.name):
+            samples = metric.samples()
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(samples)
+
+        grouped: Dict[str, Dict[str, object]] = {}
+        for collector_name, collect in collectors:
+            try:
+                for name, help_text, metric_type, labels, value in collect():
+                    if value is None:
+                        continue
+                    entry = grouped.setdefault(name, {"help": help_text, "type": metric_type, "samples": []})
+                    entry["samples"].append(f"{name}{_format_labels(_label_key(labels))} {_format_value(float(value))}")
+            except Exception as e:
+                print(f"⚠️ Metrics collector '{collector_name}' failed: {e}")
+        for name, entry in sorted(grouped.items()):
+            lines.append(f"# HELP {name} {entry['help']}")
+            lines.append(f"# TYPE {name} {entry['type']}")
+            lines.extend(entry["samples"])
+
+        return "\n".join(lines) + "\n"
+
+
+def stats_collector(prefix: str, stats: Callable[[], Dict[str, object]], help_text: str,
+                    metric_type: str = "gauge", counters: Iterable[str] = ()):
+    """
+    Collector that publishes every numeric value of a stats() dict as <prefix>_<key>.
+    Keys listed in counters are monotonic totals, published as counter <prefix>_<key>_total.
+    """
+    counters = frozenset(counters)
+
+    def collect():
+        for key, value in (stats() or {}).items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            if key in counters:
+                yield f"{prefix}_{key}_total", help_text, "counter", {}, value
+            else:
+                yield f"{prefix}_{key}", help_text, metric_type, {}, value
+    return collect
+
+
+# Global registry instance
+registry = MetricsRegistry()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
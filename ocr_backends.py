@@ -0,0 +1,251 @@
+"""
+OCR Backends Module for Ladki Bahin Yojana
+Tesseract behind one interface: in-process libtesseract (tesserocr) or the pytesseract CLI
+pytesseract starts a tesseract process and writes temp files for every call, and each start
+reloads the eng+hin traineddata. The tesserocr backend keeps one initialized engine per
+(language, OEM) per worker thread and reuses it for every page and cascade pass.
+"""
+
+import os
+import shlex
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytesseract
+from PIL import Image
+
+try:
+    import tesserocr
+except Exception:  # tesserocr is optional, pytesseract is always available
+    tesserocr = None
+
+# ============================================
+# Backend Configuration
+# ============================================
+# auto: tesserocr when installed, else pytesseract
+OCR_BACKEND = os.getenv("OCR_BACKEND", "auto").lower()
+# Engines created when a worker process starts, so the first job does not pay for loading
+OCR_WARM_LANGS = [lang for lang in os.getenv("OCR_WARM_LANGS", "eng+hin").split(",") if lang]
+TESSDATA_PREFIX = os.getenv("TESSDATA_PREFIX")
+
+DEFAULT_OEM = 3
+DEFAULT_PSM = 3
+
+
+class OCRTimeout(TimeoutError):
+    """Tesseract did not finish within the time it was given"""
+
+
+def parse_config(config: str) -> Tuple[int, int, Dict[str, str]]:
+    """(oem, psm, -c variables) from a Tesseract command-line config string"""
+    oem, psm, variables = DEFAULT_OEM, DEFAULT_PSM, {}
+    tokens = shlex.split(config or "")
+    for i, token in enumerate(tokens[:-1]):
+        value = tokens[i + 1]
+        if token == "--oem":
+            oem = int(value)
+        elif token == "--psm":
+            psm = int(value)
+        elif token == "-c" and "=" in value:
+            key, _, val = value.partition("=")
+            variables[key] = val
+    return oem, psm, variables
+
+
+# ============================================
+# pytesseract (CLI) Backend
+# ============================================
+class PytesseractBackend:
+    name = "pytesseract"
+
+    def warm(self, lang: str):
+        pass
+
+    def image_to_string(self, img: Image.Image, lang: str, config: str = "", timeout: Optional[float] = None) -> str:
+        try:
+            return pytesseract.image_to_string(img, lang=lang, config=config, timeout=timeout or 0)
+        except RuntimeError as e:
+            if "timeout" in str(e).lower():
+                raise OCRTimeout("Tesseract process timeout") from e
+            raise
+
+    def image_to_data(self, img: Image.Image, lang: str, config: str = "",
+                      timeout: Optional[float] = None) -> Dict[str, List[Any]]:
+        try:
+            return pytesseract.image_to_data(img, lang=lang, config=config, timeout=timeout or 0,
+                                             output_type=pytesseract.Output.DICT)
+        except RuntimeError as e:
+            if "timeout" in str(e).lower():
+                raise OCRTimeout("Tesseract process timeout") from e
+            raise
+
+
+# ============================================
+# tesserocr (libtesseract) Backend
+# ============================================
+class TesserocrBackend:
+    """
+    One PyTessBaseAPI per (lang, oem, -c variables) per thread: engines are not thread-safe,
+    and each pool worker runs jobs on a single thread, so traineddata loads once per worker.
+    """
+    name = "tesserocr"
+
+    def __init__(self):
+        self._local = threading.local()
+        self._fallback = PytesseractBackend()
+        self._failed_langs = set()
+
+    def _engine(self, lang: str, oem: int, variables: Dict[str, str]):
+        engines = getattr(self._local, "engines", None)
+        if engines is None:
+            engines = self._local.engines = {}
+        # -c variables stick to an engine once set, so each variable set gets its own engine
+        key = (lang, oem, tuple(sorted(variables.items())))
+        if key not in engines:
+            kwargs = {"lang": lang, "oem": oem}
+            if TESSDATA_PREFIX:
+                kwargs["path"] = TESSDATA_PREFIX
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            for name, value in variables.items():
+                api.SetVariable(name, value)
+            engines[key] = api
+            print(f"✅ tesserocr engine loaded ({lang}, oem {oem}) in pid {os.getpid()}")
+        return engines[key]
+
+    def warm(self, lang: str):
+        try:
+            self._engine(lang, DEFAULT_OEM, {})
+        except Exception as e:
+            print(f"⚠️ tesserocr could not load '{lang}': {e}")
+
+    def _recognize(self, img: Image.Image, lang: str, config: str, timeout: Optional[float]):
+        """Engine with img recognized under config, or None when this language must use the CLI"""
+        if lang in self._failed_langs:
+            return None
+        oem, psm, variables = parse_config(config)
+        try:
+            api = self._engine(lang, oem, variables)
+        except Exception as e:
+            self._failed_langs.add(lang)
+            print(f"⚠️ tesserocr unavailable for '{lang}' ({e}), using pytesseract")
+            return None
+        api.Clear()
+        api.SetPageSegMode(psm)
+        api.SetImage(img)
+        if not api.Recognize(timeout=int(timeout * 1000) if timeout else 0):
+            raise OCRTimeout("Tesseract recognition timeout")
+        return api
+
+    def image_to_string(self, img: Image.Image, lang: str, config: str = "", timeout: Optional[float] = None) -> str:
+        api = self._recognize(img, lang, config, timeout)
+        if api is None:
+            return self._fallback.image_to_string(img, lang, config, timeout)
+        return api.GetUTF8Text()
+
+    def image_to_data(self, img: Image.Image, lang: str, config: str = "",
+                      timeout: Optional[float] = None) -> Dict[str, List[Any]]:
+        """Word boxes in pytesseract's Output.DICT layout (text, conf, block/par/line numbers)"""
+        api = self._recognize(img, lang, config, timeout)
+        if api is None:
+            return self._fallback.image_to_data(img, lang, config, timeout)
+
+        data: Dict[str, List[Any]] = {key: [] for key in (
+            "level", "block_num", "par_num", "line_num", "word_num",
+            "left", "top", "width", "height", "conf", "text")}
+        iterator = api.GetIterator()
+        if iterator is None:
+            return data
+        word_level = tesserocr.RIL.WORD
+        block = par = line = word = 0
+        while True:
+            if iterator.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+                block, par, line = block + 1, 0, 0
+            if iterator.IsAtBeginningOf(tesserocr.RIL.PARA):
+                par, line = par + 1, 0
+            if iterator.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+                line, word = line + 1, 0
+            word += 1
+            box = iterator.BoundingBox(word_level) or (0, 0, 0, 0)
+            data["level"].append(5)
+            data["block_num"].append(block)
+            data["par_num"].append(par)
+            data["line_num"].append(line)
+            data["word_num"].append(word)
+            data["left"].append(box[0])
+            data["top"].append(box[1])
+            data["width"].append(box[2] - box[0])
+            data["height"].append(box[3] - box[1])
+            data["conf"].append(iterator.Confidence(word_level))
+            data["text"].append(iterator.GetUTF8Text(word_level) or "")
+            if not iterator.Next(word_level):
+                break
+        return data
+
+
+# ============================================
+# Installed Languages
+# ============================================
+_installed_langs = None
+_warned_langs = set()
+# Same-script stand-in when a language's traineddata is missing: Marathi is Devanagari
+_SCRIPT_FALLBACK = {"mar": "hin"}
+
+
+def supported_lang(lang: str) -> str:
+    """
+    lang without the traineddata that is not installed (e.g. 'mar' on a host with only
+    eng+hin), so a profile naming an extra language degrades instead of failing every page.
+    A dropped language is replaced by its same-script stand-in ('mar' → 'hin') when installed.
+    """
+    global _installed_langs
+    if _installed_langs is None:
+        try:
+            _installed_langs = set(pytesseract.get_languages(config=""))
+        except Exception as e:
+            print(f"⚠️ Could not list Tesseract languages ({e})")
+            _installed_langs = set()
+    if not _installed_langs:
+        return lang
+    parts = lang.split("+")
+    usable = []
+    for part in parts:
+        if part not in _installed_langs:
+            part = _SCRIPT_FALLBACK.get(part)
+        if part in _installed_langs and part not in usable:
+            usable.append(part)
+    if any(part not in _installed_langs for part in parts) and lang not in _warned_langs:
+        _warned_langs.add(lang)
+        missing = [part for part in parts if part not in _installed_langs]
+        print(f"⚠️ Tesseract traineddata missing for {'+'.join(missing)}, using {'+'.join(usable) or lang}")
+    return "+".join(usable) or lang
+
+
+# ============================================
+# Backend Selection
+# ============================================
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """Process-wide OCR backend chosen by OCR_BACKEND"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if OCR_BACKEND == "pytesseract" or (OCR_BACKEND == "auto" and tesserocr is None):
+                    _backend = PytesseractBackend()
+                elif tesserocr is None:
+                    print("⚠️ OCR_BACKEND=tesserocr but tesserocr is not installed, using pytesseract")
+                    _backend = PytesseractBackend()
+                else:
+                    _backend = TesserocrBackend()
+    return _backend
+
+
+def warm_backend():
+    """Load the traineddata for OCR_WARM_LANGS (called when an OCR worker process starts)"""
+    backend = get_backend()
+    for lang in OCR_WARM_LANGS:
+        backend.warm(lang)
+    return backend.name
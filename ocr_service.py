@@ -0,0 +1,670 @@
+"""
+OCR Service Module for Ladki Bahin Yojana
+Dedicated process pool for Tesseract OCR
+A 300-dpi multi-page PDF keeps Tesseract busy for seconds; running it in worker processes
+keeps the API workers (and their event loops) responsive while OCR saturates the CPU.
+Admission is bounded (callers are rejected when the queue is full) and every job carries a
+time budget that the worker enforces on each Tesseract / Poppler subprocess.
+"""
+
+import io
+import os
+import re
+import time
+import shutil
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import pytesseract
+from PIL import Image
+from pdf2image import convert_from_bytes, pdfinfo_from_bytes
+
+from metrics import registry
+from document_cache import ocr_result_cache, ocr_cache_key, content_digest
+from image_preprocessing import normalize_for_ocr, OCR_NORMALIZE, NORMALIZATION_VERSION
+from ocr_backends import get_backend, warm_backend, supported_lang, OCRTimeout
+
+# ============================================
+# OCR Executor Configuration
+# ============================================
+# 0 runs OCR inline in the calling thread (development / single-core hosts)
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
+# Jobs admitted (queued + running) before new submissions wait, then get rejected
+OCR_MAX_PENDING = int(os.getenv("OCR_MAX_PENDING", str(max(OCR_WORKERS, 1) * 4)))
+OCR_QUEUE_TIMEOUT_SECONDS = float(os.getenv("OCR_QUEUE_TIMEOUT_SECONDS", "5"))
+# Whole-job budget including queue wait
+OCR_JOB_TIMEOUT_SECONDS = float(os.getenv("OCR_JOB_TIMEOUT_SECONDS", "60"))
+# fork is unsafe once the API process runs threads (httpx pools, thread executors)
+OCR_START_METHOD = os.getenv("OCR_START_METHOD", "spawn")
+
+OCR_PDF_DPI = 300
+
+# Extra time the caller waits past the job budget for the worker to report its own timeout
+_RESULT_GRACE_SECONDS = 2.0
+
+# Income-certificate cascade: extra passes only when the base pass has no confident income value
+OCR_CASCADE_MIN_CONFIDENCE = float(os.getenv("OCR_CASCADE_MIN_CONFIDENCE", "70"))
+# (threshold, psm) variants, in the order used until there is history
+PREPROCESS_VARIANTS = [(thresh, psm) for thresh in (140, 160, 180, 200) for psm in (6, 7, 11, 13)]
+
+INCOME_LABEL_WORDS = ("income", "उत्पन्न", "आय", "उत्पन्नाचे")
+# Words after an income label that may hold the amount
+INCOME_LABEL_WINDOW = 15
+# Pages whose mean word confidence is below this are re-read with the profile's fallback
+OCR_PROFILE_MIN_CONFIDENCE = float(os.getenv("OCR_PROFILE_MIN_CONFIDENCE", "60"))
+
+OCR_PAGES = registry.counter("ocr_pdf_pages_total", "PDF pages OCR'd, served from the OCR cache or skipped by an early exit")
+OCR_CASCADE_PAGES = registry.counter(
+    "ocr_cascade_pages_total", "Income-certificate pages by cascade outcome (base_confident / variant_hit / exhausted)")
+OCR_CASCADE_PASSES = registry.counter("ocr_cascade_passes_total", "Extra preprocessed Tesseract passes run by the cascade")
+OCR_PROFILE_SECONDS = registry.histogram(
+    "ocr_profile_pass_seconds", "Tesseract time per page by OCR profile and pass (primary / fallback)")
+OCR_PROFILE_CONFIDENCE = registry.histogram(
+    "ocr_profile_confidence", "Mean word confidence per page by OCR profile and pass",
+    buckets=(20, 40, 50, 60, 70, 80, 90, 100))
+OCR_JOBS = registry.counter("ocr_jobs_total", "OCR jobs by outcome (ok / error / timeout / rejected / cancelled)")
+OCR_QUEUE_WAIT = registry.histogram(
+    "ocr_queue_wait_seconds", "Time OCR jobs waited for a worker process",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0))
+OCR_JOB_DURATION = registry.histogram(
+    "ocr_job_duration_seconds", "OCR time inside the worker process",
+    buckets=(0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 21.0, 34.0, 60.0))
+
+
+class OCRQueueFull(RuntimeError):
+    """Raised when the OCR queue stays full for OCR_QUEUE_TIMEOUT_SECONDS"""
+
+
+# ============================================
+# Worker-side OCR (runs in the pool processes)
+# ============================================
+def _init_worker(tesseract_cmd: Optional[str]):
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    backend = warm_backend()
+    print(f"✅ OCR worker {os.getpid()} ready ({backend})")
+
+
+def _time_left(deadline: Optional[float]) -> Optional[float]:
+    if deadline is None:
+        return None
+    left = deadline - time.time()
+    if left <= 0:
+        raise TimeoutError("OCR job exceeded its time budget")
+    return left
+
+
+def image_to_string(img: Image.Image, lang: str, config: str = "", deadline: Optional[float] = None) -> str:
+    """Backend image_to_string that stops Tesseract when the job budget runs out"""
+    try:
+        return get_backend().image_to_string(img, lang, config, _time_left(deadline))
+    except OCRTimeout as e:
+        raise TimeoutError("OCR job exceeded its time budget") from e
+
+
+def load_pages(file_bytes: bytes, extension: str, deadline: Optional[float] = None, dpi: int = OCR_PDF_DPI):
+    """PIL images for an upload: every page of a PDF, or the single image"""
+    if extension.lower() == ".pdf":
+        left = _time_left(deadline)
+        return convert_from_bytes(file_bytes, dpi=dpi, timeout=left)
+    return [Image.open(io.BytesIO(file_bytes))]
+
+
+def image_to_data(img: Image.Image, lang: str, config: str = "", deadline: Optional[float] = None) -> Dict[str, list]:
+    """Backend image_to_data (word boxes with confidences) under the job budget"""
+    try:
+        return get_backend().image_to_data(img, lang, config, _time_left(deadline))
+    except OCRTimeout as e:
+        raise TimeoutError("OCR job exceeded its time budget") from e
+
+
+# ============================================
+# Income Certificate Cascade (worker side)
+# ============================================
+# Outcomes reported back to the parent process with the job result (see _run_job);
+# thread-local because inline mode runs jobs on several request threads at once
+_job_state = threading.local()
+
+
+def _job_events() -> List[Tuple[str, Any]]:
+    if not hasattr(_job_state, "events"):
+        _job_state.events = []
+    return _job_state.events
+
+
+def variant_name(thresh: int, psm: int) -> str:
+    return f"t{thresh}-psm{psm}"
+
+
+def _words(data: Dict[str, list]) -> List[Tuple[str, float, Tuple[int, int, int]]]:
+    """(text, confidence, (block, paragraph, line)) for every recognised word"""
+    words = []
+    for i, text in enumerate(data.get("text", [])):
+        text = (text or "").strip()
+        if not text:
+            continue
+        try:
+            conf = float(data["conf"][i])
+        except (TypeError, ValueError):
+            conf = -1.0
+        words.append((text, conf, (data["block_num"][i], data["par_num"][i], data["line_num"][i])))
+    return words
+
+
+def data_to_text(data: Dict[str, list]) -> str:
+    """Rebuild plain text (one line per Tesseract line, blank line between blocks)"""
+    lines, current, key, block = [], [], None, None
+    for text, _, line_key in _words(data):
+        if line_key != key and current:
+            lines.append(" ".join(current))
+            if line_key[0] != block:
+                lines.append("")
+            current = []
+        if line_key != key:
+            key, block = line_key, line_key[0]
+        current.append(text)
+    if current:
+        lines.append(" ".join(current))
+    return "\n".join(lines).strip()
+
+
+def _amount(token: str) -> Optional[float]:
+    digits = re.sub(r"[^\d,]", "", token).replace(",", "")
+    if not 4 <= len(digits) <= 8:
+        return None
+    value = float(digits)
+    if 1900 <= value <= 2099:
+        return None
+    return value if 1000 <= value <= 10000000 else None
+
+
+def income_confidence(data: Dict[str, list]) -> Optional[float]:
+    """
+    Confidence of the best plausible income amount that follows an income label,
+    or None when no such amount was read
+    """
+    words = _words(data)
+    best = None
+    for i, (text, _, _) in enumerate(words):
+        lower = text.lower()
+        if not any(label in lower for label in INCOME_LABEL_WORDS):
+            continue
+        for candidate, conf, _ in words[i + 1:i + 1 + INCOME_LABEL_WINDOW]:
+            if _amount(candidate) is not None:
+                best = conf if best is None else max(best, conf)
+                break
+    return best
+
+
+def income_cascade(img: Image.Image, lang: str, variant_order: Optional[Sequence[str]] = None,
+                   deadline: Optional[float] = None) -> str:
+    """
+    Preprocessed passes for a page whose base pass had no confident income value.
+    Variants run in variant_order (historical success first) and the cascade stops at
+    the first one that reads a plausible income near an income label.
+    """
+    variants = {variant_name(t, p): (t, p) for t, p in PREPROCESS_VARIANTS}
+    order = [name for name in (variant_order or []) if name in variants]
+    order += [name for name in variants if name not in order]
+
+    gray = img.convert("L")
+    thresholded: Dict[int, Image.Image] = {}
+    texts, attempted = [], []
+    for name in order:
+        thresh, psm = variants[name]
+        if thresh not in thresholded:
+            thresholded[thresh] = gray.point(lambda x, t=thresh: 0 if x < t else 255, mode="1")
+        data = image_to_data(thresholded[thresh], lang, f"--oem 3 --psm {psm}", deadline)
+        attempted.append(name)
+        texts.append(data_to_text(data))
+        if income_confidence(data) is not None:
+            _job_events().append(("cascade", {"outcome": "variant_hit", "attempted": attempted, "hit": name}))
+            return "\n".join(texts)
+    _job_events().append(("cascade", {"outcome": "exhausted", "attempted": attempted, "hit": None}))
+    return "\n".join(texts)
+
+
+# ============================================
+# OCR Profiles (worker side)
+# ============================================
+def mean_confidence(data: Dict[str, list]) -> float:
+    """Mean Tesseract confidence of the recognised words (0 when nothing was read)"""
+    confidences = [conf for _, conf, _ in _words(data) if conf >= 0]
+    return sum(confidences) / len(confidences) if confidences else 0.0
+
+
+def _profile_pass(profile: Optional[str], name: str, started: float, confidence: Optional[float] = None):
+    if profile:
+        _job_events().append(("profile", {"profile": profile, "pass": name, "confidence": confidence,
+                                          "seconds": time.perf_counter() - started}))
+
+
+def profile_pass(img: Image.Image, lang: str, config: str, deadline: Optional[float], profile: Optional[str],
+                 fallback: Optional[Tuple[str, str]], min_confidence: float) -> str:
+    """
+    One page under a document-type OCR profile. With a fallback (lang, config), a page read
+    below min_confidence is OCR'd again with the broader profile and the more confident
+    reading is kept.
+    """
+    started = time.perf_counter()
+    if not fallback:
+        text = image_to_string(img, lang, config, deadline)
+        _profile_pass(profile, "primary", started)
+        return text
+
+    data = image_to_data(img, lang, config, deadline)
+    confidence = mean_confidence(data)
+    _profile_pass(profile, "primary", started, confidence)
+    if confidence >= min_confidence:
+        return data_to_text(data)
+
+    started = time.perf_counter()
+    fallback_lang, fallback_config = fallback
+    fallback_data = image_to_data(img, supported_lang(fallback_lang), fallback_config, deadline)
+    fallback_confidence = mean_confidence(fallback_data)
+    _profile_pass(profile, "fallback", started, fallback_confidence)
+    return data_to_text(fallback_data if fallback_confidence > confidence else data)
+
+
+def ocr_image(img: Image.Image, lang: str, config: str = "", preprocess: bool = False,
+              deadline: Optional[float] = None, variant_order: Optional[Sequence[str]] = None,
+              profile: Optional[str] = None, fallback: Optional[Tuple[str, str]] = None,
+              min_confidence: float = OCR_PROFILE_MIN_CONFIDENCE) -> str:
+    img = normalize_for_ocr(img)
+    lang = supported_lang(lang)
+    if not preprocess:
+        return profile_pass(img, lang, config, deadline, profile, fallback, min_confidence)
+
+    # Word confidences from the base pass decide whether any extra pass is needed
+    started = time.perf_counter()
+    data = image_to_data(img, lang, config, deadline)
+    text = data_to_text(data)
+    _profile_pass(profile, "primary", started, mean_confidence(data))
+    confidence = income_confidence(data)
+    if confidence is not None and confidence >= OCR_CASCADE_MIN_CONFIDENCE:
+        _job_events().append(("cascade", {"outcome": "base_confident", "attempted": [], "hit": None}))
+        return text
+    return text + "\n" + income_cascade(img, lang, variant_order, deadline)
+
+
+def ocr_document(file_bytes: bytes, extension: str, lang: str = "eng+hin", config: str = "",
+                 page_separator: str = "\n", preprocess: bool = False,
+                 deadline: Optional[float] = None, variant_order: Optional[Sequence[str]] = None,
+                 dpi: int = OCR_PDF_DPI, **profile_kwargs) -> str:
+    """OCR every page of an upload; preprocess runs the income cascade per page"""
+    return page_separator.join(
+        ocr_image(img, lang, config, preprocess, deadline, variant_order, **profile_kwargs)
+        for img in load_pages(file_bytes, extension, deadline, dpi)
+    )
+
+
+def pdf_page_count(file_bytes: bytes, deadline: Optional[float] = None) -> int:
+    info = pdfinfo_from_bytes(file_bytes, timeout=_time_left(deadline))
+    return int(info.get("Pages", 1))
+
+
+def ocr_pdf_page(file_bytes: bytes, page: int, lang: str = "eng+hin", config: str = "",
+                 preprocess: bool = False, deadline: Optional[float] = None,
+                 variant_order: Optional[Sequence[str]] = None, dpi: int = OCR_PDF_DPI,
+                 **profile_kwargs) -> str:
+    """Rasterize and OCR a single PDF page (1-based)"""
+    images = convert_from_bytes(file_bytes, dpi=dpi, first_page=page, last_page=page,
+                                timeout=_time_left(deadline))
+    return "".join(ocr_image(img, lang, config, preprocess, deadline, variant_order, **profile_kwargs)
+                   for img in images)
+
+
+def _run_job(fn: Callable, args: tuple, kwargs: Dict[str, Any]):
+    """
+    Pool entry point: returns (wall-clock start, duration, result, events) so the parent
+    can record queue metrics and cascade outcomes
+    """
+    _job_events().clear()
+    started_at = time.time()
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return started_at, time.perf_counter() - started, result, list(_job_events())
+
+
+# ============================================
+# Profile Timing and Cascade History (parent side)
+# ============================================
+def record_profile_pass(event: Dict[str, Any]):
+    """Per-profile Tesseract time and confidence, for tuning profiles from production data"""
+    labels = {"profile": event["profile"], "pass": event["pass"]}
+    OCR_PROFILE_SECONDS.observe(event["seconds"], **labels)
+    if event["confidence"] is not None:
+        OCR_PROFILE_CONFIDENCE.observe(event["confidence"], **labels)
+
+
+class VariantHistory:
+    """Per-variant attempts / hits; the cascade tries the historically best variants first"""
+
+    def __init__(self):
+        self._attempts: Dict[str, int] = {}
+        self._hits: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def record(self, events: List[Tuple[str, Any]]):
+        for kind, event in events:
+            if kind != "cascade":
+                continue
+            OCR_CASCADE_PAGES.inc(outcome=event["outcome"])
+            OCR_CASCADE_PASSES.inc(len(event["attempted"]))
+            with self._lock:
+                for name in event["attempted"]:
+                    self._attempts[name] = self._attempts.get(name, 0) + 1
+                if event["hit"]:
+                    self._hits[event["hit"]] = self._hits.get(event["hit"], 0) + 1
+
+    def order(self) -> List[str]:
+        """Variants by smoothed hit rate; untried variants keep their default position"""
+        default = [variant_name(t, p) for t, p in PREPROCESS_VARIANTS]
+        with self._lock:
+            rate = {name: (self._hits.get(name, 0) + 1) / (self._attempts.get(name, 0) + 2) for name in default}
+        return sorted(default, key=lambda name: (-rate[name], default.index(name)))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {name: {"attempts": self._attempts.get(name, 0), "hits": self._hits.get(name, 0)}
+                    for name in self.order()}
+
+
+variant_history = VariantHistory()
+
+
+def record_job_events(events: List[Tuple[str, Any]]):
+    """Outcomes a job reported from the worker (see _run_job)"""
+    for kind, event in events:
+        if kind == "profile":
+            record_profile_pass(event)
+    variant_history.record(events)
+
+
+# ============================================
+# OCR Executor
+# ============================================
+class OCRService:
+    """
+    Process pool for OCR jobs.
+    Job functions must be module-level (picklable) and accept a deadline keyword
+    (wall-clock time.time() value) that bounds their subprocess calls.
+    """
+
+    def __init__(self, workers: int = OCR_WORKERS, max_pending: int = OCR_MAX_PENDING,
+                 job_timeout: float = OCR_JOB_TIMEOUT_SECONDS,
+                 queue_timeout: float = OCR_QUEUE_TIMEOUT_SECONDS):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.job_timeout = job_timeout
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context(OCR_START_METHOD),
+                    initializer=_init_worker,
+                    initargs=(shutil.which("tesseract") or pytesseract.pytesseract.tesseract_cmd,),
+                )
+                print(f"✅ OCR process pool started ({self.workers} workers, {self.max_pending} pending max)")
+            return self._executor
+
+    def _reset_pool(self, broken: ProcessPoolExecutor):
+        """A worker died (e.g. OOM on a huge PDF); start a fresh pool for later jobs"""
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        print("⚠️ OCR process pool was broken, restarting on next job")
+
+    def _release(self, _future: Optional[Future] = None):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def submit(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Future:
+        """
+        Queue an OCR job. Waits up to queue_timeout for a slot, then raises OCRQueueFull.
+        The returned future resolves to the job's result.
+        """
+        timeout = timeout or self.job_timeout
+        submitted_at = time.time()
+        kwargs["deadline"] = submitted_at + timeout
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            OCR_JOBS.inc(outcome="rejected")
+            raise OCRQueueFull(f"OCR queue full ({self.max_pending} jobs pending)")
+        with self._lock:
+            self._in_flight += 1
+
+        pool = self._pool()
+        try:
+            try:
+                inner = pool.submit(_run_job, fn, args, kwargs)
+            except BrokenProcessPool:
+                self._reset_pool(pool)
+                pool = self._pool()
+                inner = pool.submit(_run_job, fn, args, kwargs)
+        except Exception:
+            self._release()
+            raise
+        inner.add_done_callback(self._release)
+
+        outer: Future = Future()
+
+        def _finish(done: Future):
+            if outer.done():
+                # Caller already gave up on this job
+                return
+            if done.cancelled():
+                OCR_JOBS.inc(outcome="cancelled")
+                outer.cancel()
+                return
+            error = done.exception()
+            if error is not None:
+                OCR_JOBS.inc(outcome="timeout" if isinstance(error, TimeoutError) else "error")
+                if isinstance(error, BrokenProcessPool):
+                    self._reset_pool(pool)
+                outer.set_exception(error)
+                return
+            started_at, duration, result, events = done.result()
+            record_job_events(events)
+            OCR_QUEUE_WAIT.observe(max(started_at - submitted_at, 0.0))
+            OCR_JOB_DURATION.observe(duration)
+            OCR_JOBS.inc(outcome="ok")
+            outer.set_result(result)
+
+        inner.add_done_callback(_finish)
+        # Cancelling the caller's future drops a job that has not started yet
+        outer.add_done_callback(lambda f: inner.cancel() if f.cancelled() else None)
+        return outer
+
+    def run(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Blocking OCR call for synchronous code paths"""
+        timeout = timeout or self.job_timeout
+        if self.workers <= 0:
+            return self._run_inline(fn, args, kwargs, timeout)
+
+        future = self.submit(fn, *args, timeout=timeout, **kwargs)
+        try:
+            return future.result(timeout + _RESULT_GRACE_SECONDS)
+        except FutureTimeoutError:
+            future.cancel()
+            OCR_JOBS.inc(outcome="timeout")
+            raise TimeoutError("OCR job exceeded its time budget")
+
+    async def arun(self, fn: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Awaitable OCR call; the event loop never waits on a semaphore or a worker"""
+        timeout = timeout or self.job_timeout
+        if self.workers <= 0:
+            return await asyncio.to_thread(self._run_inline, fn, args, kwargs, timeout)
+
+        future = await asyncio.to_thread(self.submit, fn, *args, timeout=timeout, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout + _RESULT_GRACE_SECONDS)
+        except asyncio.TimeoutError:
+            OCR_JOBS.inc(outcome="timeout")
+            raise TimeoutError("OCR job exceeded its time budget")
+        finally:
+            # Client went away or the wait timed out → drop the job if it is still queued
+            future.cancel()
+
+    def run_document(self, file_bytes: bytes, extension: str, page_separator: str = "\n",
+                     stop_when: Optional[Callable[[str], bool]] = None,
+                     timeout: Optional[float] = None, **ocr_kwargs) -> str:
+        """
+        OCR an upload with its PDF pages rasterized and OCR'd in parallel.
+
+        stop_when(text_so_far) is checked as pages complete in order; once it returns True
+        the remaining pages are not OCR'd. Only a worker-sized window of pages is in flight
+        at a time, so an early exit on page 1 never pays for the whole document.
+
+        Page texts are cached by content hash + OCR settings (ocr_result_cache), so bytes
+        that were already read (by any code path) never go through Tesseract again.
+        """
+        timeout = timeout or self.job_timeout
+        deadline = time.time() + timeout
+        digest = content_digest(file_bytes)
+        ocr_config = {"dpi": OCR_PDF_DPI, "normalize": OCR_NORMALIZE and NORMALIZATION_VERSION, **ocr_kwargs}
+
+        def cache_key(page: int) -> str:
+            return ocr_cache_key(digest, page, ocr_config)
+
+        if ocr_kwargs.get("preprocess"):
+            ocr_kwargs.setdefault("variant_order", variant_history.order())
+
+        is_pdf = extension.lower() == ".pdf"
+        pages = 1
+        if is_pdf:
+            cached = ocr_result_cache.get(cache_key(0))
+            if cached is not None:
+                pages = int(cached)
+            else:
+                try:
+                    pages = pdf_page_count(file_bytes, deadline)
+                except TimeoutError:
+                    raise
+                except Exception as e:
+                    print(f"⚠️ Could not read PDF page count ({e}), OCR'ing as one job")
+                    return self.run(ocr_document, file_bytes, extension, page_separator=page_separator,
+                                    timeout=timeout, **ocr_kwargs)
+                ocr_result_cache.set(cache_key(0), str(pages))
+
+        if pages <= 1:
+            text = ocr_result_cache.get(cache_key(1))
+            if text is None:
+                if is_pdf:
+                    text = self.run(ocr_pdf_page, file_bytes, 1, timeout=timeout, **ocr_kwargs)
+                else:
+                    text = self.run(ocr_document, file_bytes, extension, timeout=timeout, **ocr_kwargs)
+                ocr_result_cache.set(cache_key(1), text)
+            else:
+                print("♻️ OCR cache hit")
+            return text
+
+        texts = []
+        cached_pages = set()
+        if self.workers <= 0:
+            for page in range(1, pages + 1):
+                text = ocr_result_cache.get(cache_key(page))
+                if text is None:
+                    text = self._run_inline(ocr_pdf_page, (file_bytes, page), ocr_kwargs, deadline - time.time())
+                    ocr_result_cache.set(cache_key(page), text)
+                else:
+                    cached_pages.add(page)
+                texts.append(text)
+                if stop_when and page < pages and stop_when(page_separator.join(texts)):
+                    break
+            return self._finish_pages(texts, pages, len(cached_pages), page_separator)
+
+        window = self.workers if stop_when else self.workers * 2
+        futures: Dict[int, Future] = {}
+        next_page = 1
+        try:
+            while len(texts) < pages:
+                while next_page <= pages and len(futures) < window:
+                    cached = ocr_result_cache.get(cache_key(next_page))
+                    if cached is not None:
+                        futures[next_page] = Future()
+                        futures[next_page].set_result(cached)
+                        cached_pages.add(next_page)
+                    else:
+                        futures[next_page] = self.submit(ocr_pdf_page, file_bytes, next_page,
+                                                         timeout=max(deadline - time.time(), 0.1), **ocr_kwargs)
+                    next_page += 1
+                page = len(texts) + 1
+                try:
+                    text = futures.pop(page).result(max(deadline - time.time(), 0) + _RESULT_GRACE_SECONDS)
+                except FutureTimeoutError:
+                    OCR_JOBS.inc(outcome="timeout")
+                    raise TimeoutError("OCR job exceeded its time budget")
+                if page not in cached_pages:
+                    ocr_result_cache.set(cache_key(page), text)
+                texts.append(text)
+                if stop_when and page < pages and stop_when(page_separator.join(texts)):
+                    break
+        finally:
+            # Pages past an early exit (or after a failure) are dropped if not started yet
+            for future in futures.values():
+                future.cancel()
+        return self._finish_pages(texts, pages, len(cached_pages), page_separator)
+
+    @staticmethod
+    def _finish_pages(texts, pages: int, cached: int, page_separator: str) -> str:
+        OCR_PAGES.inc(len(texts) - cached, outcome="ocr")
+        if cached:
+            OCR_PAGES.inc(cached, outcome="cached")
+        if len(texts) < pages:
+            OCR_PAGES.inc(pages - len(texts), outcome="skipped")
+            print(f"⚡ OCR early exit after page {len(texts)}/{pages}")
+        return page_separator.join(texts)
+
+    async def arun_document(self, file_bytes: bytes, extension: str, **kwargs) -> str:
+        """run_document for async handlers (waits on a thread, never on the event loop)"""
+        return await asyncio.to_thread(self.run_document, file_bytes, extension, **kwargs)
+
+    def _run_inline(self, fn: Callable, args: tuple, kwargs: Dict[str, Any], timeout: float) -> Any:
+        try:
+            _, duration, result, events = _run_job(fn, args, {**kwargs, "deadline": time.time() + timeout})
+        except TimeoutError:
+            OCR_JOBS.inc(outcome="timeout")
+            raise
+        except Exception:
+            OCR_JOBS.inc(outcome="error")
+            raise
+        record_job_events(events)
+        OCR_JOB_DURATION.observe(duration)
+        OCR_JOBS.inc(outcome="ok")
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        in_flight = self._in_flight
+        return {
+            "backend": get_backend().name,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": in_flight,
+            "queue_depth": max(in_flight - self.workers, 0),
+            "running": min(in_flight, self.workers),
+        }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Global OCR executor (one pool per API worker process)
+ocr_service = OCRService()
@@ -13,12 +13,18 @@ from openai import AzureOpenAI
 import json
 import matplotlib
 matplotlib.use("Agg")
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+import io
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
 import uuid
 from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
+from llm_client import run_blocking, chat_completion
 from database import (
     get_beneficiary_by_aadhaar,
     get_beneficiary_details,
@@ -214,43 +220,6 @@ def _parse_aadhaar(text: str) -> dict:
 # ─────────────────────────────────────────────────────────────
 # LLM helpers
 # ─────────────────────────────────────────────────────────────
-def _validate_query(user_message: str) -> dict:
-    prompt = f"""
-You are a query validator for POST-REGISTRATION topics only.
-ALLOWED: application status, transaction/payment history, document verification.
-NOT ALLOWED: general scheme info, eligibility, how to apply, geography, general knowledge.
-User question: "{user_message}"
-Return ONLY valid JSON: {{"is_valid": true, "reason": "brief"}}
-"""
-    try:
-        r = AZURE_CLIENT.chat.completions.create(
-            model=AZURE_DEPLOYMENT,
-            messages=[
-                {"role": "system",  "content": "Return only valid JSON, no markdown."},
-                {"role": "user",    "content": prompt}
-            ],
-            temperature=0, max_tokens=100
-        )
-        content = r.choices[0].message.content.strip()
-        if content.startswith("```"):
-            content = content.split("\n",1)[1] if "\n" in content else content[3:]
-            content = content.rsplit("```",1)[0].strip()
-        result = json.loads(content)
-    except Exception:
-        return {"is_valid": True, "rejection_messages": {}}
-
-    if "is_valid" not in result:
-        return {"is_valid": True, "rejection_messages": {}}
-
-    rejection_messages = {
-        "hindi":   "मैं केवल आवेदन की स्थिति, लेनदेन इतिहास और दस्तावेज़ सत्यापन में मदद कर सकता हूं।",
-        "marathi": "मी फक्त अर्जाची स्थिती, व्यवहार इतिहास आणि कागदपत्र सत्यापनासाठी मदत करू शकतो.",
-        "english": "I can only help with application status, transaction history, and document verification."
-    }
-    return {"is_valid": result.get("is_valid", True),
-            "rejection_messages": rejection_messages}
-
-
 def _call_llm(prompt: str) -> str:
     system = (
         "You are a POST-REGISTRATION database assistant for Ladli Behna Yojana.\n"
@@ -262,7 +231,7 @@ def _call_llm(prompt: str) -> str:
         "- If user provides the value, compare with DB and state match/mismatch clearly\n"
         "- Never ask for last 4 digits or partial identifiers\n"
     )
-    r = AZURE_CLIENT.chat.completions.create(
+    r = chat_completion(AZURE_CLIENT, purpose="post_answer",
         model=AZURE_DEPLOYMENT,
         messages=[{"role":"system","content":system},
                   {"role":"user",  "content":prompt}],
@@ -271,29 +240,173 @@ def _call_llm(prompt: str) -> str:
     return r.choices[0].message.content.strip()
 
 
-def _txn_intent(msg: str) -> dict:
+# ─────────────────────────────────────────────────────────────
+# Query understanding (validity + transaction intent)
+# ─────────────────────────────────────────────────────────────
+REJECTION_MESSAGES = {
+    "hindi":   "मैं केवल आवेदन की स्थिति, लेनदेन इतिहास और दस्तावेज़ सत्यापन में मदद कर सकता हूं।",
+    "marathi": "मी फक्त अर्जाची स्थिती, व्यवहार इतिहास आणि कागदपत्र सत्यापनासाठी मदत करू शकतो.",
+    "english": "I can only help with application status, transaction history, and document verification."
+}
+
+# Month spellings → MONTH_MAP key (English, Marathi, Hindi)
+MONTH_ALIASES = {
+    **{m: m for m in MONTH_MAP},
+    "jan":"january","feb":"february","mar":"march","apr":"april","jun":"june","jul":"july",
+    "aug":"august","sep":"september","sept":"september","oct":"october","nov":"november","dec":"december",
+    "जानेवारी":"january","फेब्रुवारी":"february","मार्च":"march","एप्रिल":"april","मे":"may",
+    "जून":"june","जुलै":"july","ऑगस्ट":"august","सप्टेंबर":"september","ऑक्टोबर":"october",
+    "नोव्हेंबर":"november","डिसेंबर":"december",
+    "जनवरी":"january","फरवरी":"february","अप्रैल":"april","मई":"may","जुलाई":"july","अगस्त":"august",
+    "सितंबर":"september","सितम्बर":"september","अक्टूबर":"october","नवंबर":"november","नवम्बर":"november",
+    "दिसंबर":"december","दिसम्बर":"december",
+}
+
+_NUMBER_WORDS = {
+    "one":1,"two":2,"three":3,"four":4,"five":5,"six":6,"seven":7,"eight":8,"nine":9,"ten":10,"eleven":11,"twelve":12,
+    "एक":1,"दोन":2,"तीन":3,"चार":4,"पाच":5,"सहा":6,"सात":7,"आठ":8,"नऊ":9,"दहा":10,"अकरा":11,"बारा":12,
+    "दो":2,"पांच":5,"पाँच":5,"छह":6,"नौ":9,"दस":10,"ग्यारह":11,"बारह":12,
+}
+_DEVANAGARI_DIGITS = str.maketrans("०१२३४५६७८९", "0123456789")
+
+_TXN_WORDS = re.compile(
+    r"payment|transaction|installment|instalment|credited|received|amount|money|paid|history|"
+    r"हप्ता|हप्ते|पैसे|रक्कम|व्यवहार|जमा|पेमेंट|किस्त|भुगतान|लेनदेन|राशि|पैसा",
+    re.IGNORECASE
+)
+_LAST_N = re.compile(
+    r"(?:last|past|previous|मागील|मागच्या|गेल्या|पिछले|पिछली|पिछला)\s+(\w+)?\s*"
+    r"(?:months?|महिन्यां?चे|महिन्यांत|महिन्यात|महिने|महिना|महीनों|महीने|महीना)",
+    re.IGNORECASE
+)
+_RANGE_SEP = r"(?:to|till|until|through|-|–|ते|पर्यंत|से|तक)"
+# Marathi/Hindi case endings a month name may carry; Latin aliases match whole tokens only
+_LONG_MONTH_SUFFIXES = ("पर्यंत", "पासून", "मध्ये", "च्या")
+_MONTH_SUFFIXES = _LONG_MONTH_SUFFIXES + ("चे", "ची", "चा", "ला", "त", "में", "से", "तक", "का", "की", "के")
+_DEVANAGARI_TOKEN = re.compile(r"[ऀ-ॿ]+$")
+
+
+def _month_tokens(text: str) -> list:
+    """Months mentioned in text, in order (Devanagari tokens may carry a case ending)"""
+    found = []
+    for tok in re.findall(r"[a-z]+|[ऀ-ॿ]+", text.lower()):
+        key = MONTH_ALIASES.get(tok)
+        if not key and _DEVANAGARI_TOKEN.match(tok):
+            # "मार्चपर्यंत", "जानेवारीचे", "मईमध्ये" → alias + a known case ending, nothing else;
+            # the two-letter "मे"/"मई" take only the long endings ("मेला" is a fair, not May)
+            for suffix in _MONTH_SUFFIXES:
+                stem = tok[:-len(suffix)]
+                if tok.endswith(suffix) and stem in MONTH_ALIASES and (
+                        len(stem) > 2 or suffix in _LONG_MONTH_SUFFIXES):
+                    key = MONTH_ALIASES[stem]
+                    break
+        if key:
+            found.append((tok, key))
+    return found
+
+
+def _parse_txn_query_locally(msg: str) -> Optional[dict]:
+    """
+    Deterministic parser for common transaction phrasings:
+    "last 3 months", "January to March", "मागील ३ महिने", "जनवरी से मार्च", "मार्च आणि एप्रिल".
+    Returns the same dict as _analyze_query, or None when the message needs the LLM
+    (no transaction word, or no month range).
+    """
+    text = msg.translate(_DEVANAGARI_DIGITS).strip()
+    lower = text.lower()
+    # A date range alone ("born in March", "last 2 months" of anything) says nothing about
+    # payments: without a transaction word the LLM decides validity
+    if not _TXN_WORDS.search(lower):
+        return None
+    result = {"is_valid": True, "transaction_flag": 1, "month_list": None,
+              "start_month": None, "end_month": None, "last_n_months": None}
+
+    m = _LAST_N.search(lower)
+    if m:
+        n_tok = (m.group(1) or "").lower()
+        if not n_tok or n_tok in ("month", "महिना", "महीना"):
+            n = 1
+        elif n_tok.isdigit():
+            n = int(n_tok)
+        else:
+            n = _NUMBER_WORDS.get(n_tok)
+        if n and 1 <= n <= 24:
+            result["last_n_months"] = n
+            return result
+
+    # "may I know…" / "may we…" is a modal verb, not the month
+    modal = re.search(r"\bmay\s+(i|we|you|he|she|they)\b", lower)
+    months = [(tok, key) for tok, key in _month_tokens(lower) if not (tok == "may" and modal)]
+    if len(months) >= 2 and re.search(
+            rf"{re.escape(months[0][0])}\S*\s*{_RANGE_SEP}\s*{re.escape(months[1][0])}", lower):
+        result["start_month"], result["end_month"] = months[0][1], months[1][1]
+        return result
+    if months:
+        result["month_list"] = list(dict.fromkeys(key for _, key in months))
+        return result
+
+    return None
+
+
+def _analyze_query(msg: str) -> dict:
+    """
+    One structured-output call for validity + transaction intent + month range.
+    Local parser first; falls back to an always-valid, no-filter result on errors
+    (same fail-open behaviour as the old separate validator).
+    """
+    local = _parse_txn_query_locally(msg)
+    if local:
+        print(f"🗓️ Local query parse: {local}")
+        return local
+
     prompt = f"""
-Extract transaction intent. Return strict JSON only.
-Rules: transaction_flag=1 only if user asks about payments/transactions.
-User: "{msg}"
-JSON: {{"transaction_flag":0,"month_list":null,"start_month":null,"end_month":null,"last_n_months":null}}
+You analyse questions for a POST-REGISTRATION assistant.
+1. is_valid: true ONLY for application status, transaction/payment history, document verification.
+   NOT ALLOWED: general scheme info, eligibility, how to apply, geography, general knowledge.
+2. transaction_flag=1 only if the user asks about payments/transactions.
+3. Month range: month names in lowercase English; last_n_months as an integer.
+User question: "{msg}"
+Return strict JSON only:
+{{"is_valid":true,"transaction_flag":0,"month_list":null,"start_month":null,"end_month":null,"last_n_months":null}}
 """
-    r = AZURE_CLIENT.chat.completions.create(
-        model=AZURE_DEPLOYMENT,
-        messages=[{"role":"system","content":"Return valid JSON only."},
-                  {"role":"user",  "content":prompt}],
-        temperature=0, max_tokens=200
-    )
-    return json.loads(r.choices[0].message.content)
+    fallback = {"is_valid": True, "transaction_flag": 0, "month_list": None,
+                "start_month": None, "end_month": None, "last_n_months": None}
+    try:
+        r = chat_completion(AZURE_CLIENT, purpose="query_analysis",
+            model=AZURE_DEPLOYMENT,
+            messages=[{"role":"system","content":"Return valid JSON only, no markdown."},
+                      {"role":"user",  "content":prompt}],
+            temperature=0, max_tokens=200
+        )
+        content = r.choices[0].message.content.strip()
+        if content.startswith("```"):
+            content = content.split("\n",1)[1] if "\n" in content else content[3:]
+            content = content.rsplit("```",1)[0].strip()
+        result = {**fallback, **json.loads(content)}
+    except Exception as e:
+        print(f"⚠️ Query analysis failed: {e}")
+        return fallback
+
+    # Keep only month names the filter understands
+    for k in ("start_month", "end_month"):
+        if result[k] not in MONTH_MAP:
+            result[k] = None
+    if result["month_list"]:
+        result["month_list"] = [m for m in result["month_list"] if m in MONTH_MAP] or None
+    return result
 
 
 def _upload_chart(df: pd.DataFrame) -> str:
-    plt.figure(figsize=(10,5))
-    plt.bar(df["PaymentMonth"], df["Amount"])
-    plt.xticks(rotation=45); plt.xlabel("Month"); plt.ylabel("Amount")
-    plt.title("Transaction History"); plt.tight_layout()
+    # Figure API instead of pyplot: charts are rendered on fan-out threads
+    # and pyplot's global state is not thread-safe
+    fig = Figure(figsize=(10,5))
+    ax = fig.subplots()
+    ax.bar(df["PaymentMonth"], df["Amount"])
+    ax.tick_params(axis="x", labelrotation=45); ax.set_xlabel("Month"); ax.set_ylabel("Amount")
+    ax.set_title("Transaction History"); fig.tight_layout()
     fname = f"transactions_{uuid.uuid4()}.png"
-    plt.savefig(fname); plt.close()
+    buf = io.BytesIO()
+    fig.savefig(buf, format="png"); buf.seek(0)
     svc = BlobServiceClient(
         account_url=f"https://{AZURE_SA_NAME}.blob.core.windows.net",
         credential=AZURE_SA_ACCESSKEY
@@ -301,9 +414,7 @@ def _upload_chart(df: pd.DataFrame) -> str:
     cc = svc.get_container_client("charts")
     try: cc.create_container()
     except: pass
-    with open(fname,"rb") as d:
-        cc.get_blob_client(fname).upload_blob(d, overwrite=True)
-    os.remove(fname)
+    cc.get_blob_client(fname).upload_blob(buf, overwrite=True)
     sas = generate_blob_sas(
         account_name=AZURE_SA_NAME, container_name="charts", blob_name=fname,
         account_key=AZURE_SA_ACCESSKEY, permission=BlobSasPermissions(read=True),
@@ -312,16 +423,76 @@ def _upload_chart(df: pd.DataFrame) -> str:
     return f"https://{AZURE_SA_NAME}.blob.core.windows.net/charts/{fname}?{sas}"
 
 
+# ─────────────────────────────────────────────────────────────
+# Stage timings (critical path of _db_answer)
+# ─────────────────────────────────────────────────────────────
+_FANOUT_POOL  = ThreadPoolExecutor(
+    max_workers=int(os.getenv("POST_CHAT_FANOUT_WORKERS", "16")),
+    thread_name_prefix="post-chat"
+)
+_STAGE_STATS  = {}     # stage → {"count", "total_ms", "max_ms"}
+_STAGE_LOCK   = threading.Lock()
+
+def _timed(stage: str, timings: dict, fn, *args):
+    t0 = time.perf_counter()
+    try:
+        return fn(*args)
+    finally:
+        ms = (time.perf_counter() - t0) * 1000
+        timings[stage] = round(ms, 1)
+        with _STAGE_LOCK:
+            st = _STAGE_STATS.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            st["count"]    += 1
+            st["total_ms"] += ms
+            st["max_ms"]    = max(st["max_ms"], ms)
+
+def _fanout(stage: str, timings: dict, fn, *args):
+    """Timed stage on the fan-out pool, in a copy of the caller's context (request deadline)"""
+    ctx = contextvars.copy_context()
+    return _FANOUT_POOL.submit(ctx.run, _timed, stage, timings, fn, *args)
+
+def stage_timing_stats() -> dict:
+    """Per-stage count / avg / max latency of post-application answers"""
+    with _STAGE_LOCK:
+        return {stage: {"count": st["count"],
+                        "avg_ms": round(st["total_ms"] / st["count"], 1) if st["count"] else 0.0,
+                        "max_ms": round(st["max_ms"], 1)}
+                for stage, st in _STAGE_STATS.items()}
+
+
 # ─────────────────────────────────────────────────────────────
 # Core DB query + LLM answer
 # ─────────────────────────────────────────────────────────────
 def _db_answer(sid: str, user_msg: str, aadhaar: str,
                lang: str, is_aadhaar_only: bool) -> dict:
+    """
+    DB lookups and query analysis (validity + transaction intent) run concurrently;
+    the chart upload runs alongside the final answer generation. Stage timings are
+    logged per call and aggregated in stage_timing_stats().
+    """
     hist = SESSION_HISTORY.setdefault(sid, [])
     chart_url = None
+    timings = {}
+    t_start = time.perf_counter()
+
+    # Analysis only depends on the message → start it before touching the DB
+    intent_future = None
+    if not is_aadhaar_only:
+        intent_future = _fanout("query_analysis", timings, _analyze_query, user_msg)
+
+    def _rejected(intent: dict) -> Optional[dict]:
+        if intent["is_valid"]:
+            return None
+        return {"response":{"response":REJECTION_MESSAGES.get(lang, REJECTION_MESSAGES["english"]),
+                            "transaction_chart_url":None,"history":hist[-5:]},
+                "mode":"post_application"}
 
-    bid = get_beneficiary_by_aadhaar(aadhaar)
+    bid = _timed("beneficiary_lookup", timings, get_beneficiary_by_aadhaar, aadhaar)
     if not bid:
+        if intent_future:
+            rejection = _rejected(intent_future.result())
+            if rejection:
+                return rejection
         nf = {
             "marathi": "या आधार क्रमांकावर कोणताही अर्ज आढळला नाही. कृपया आधार क्रमांक पुन्हा तपासा.",
             "hindi":   "इस आधार नंबर से कोई अर्ज नहीं मिला। नंबर सही है या नहीं चेक करें।",
@@ -331,25 +502,33 @@ def _db_answer(sid: str, user_msg: str, aadhaar: str,
                             "transaction_chart_url":None,"history":hist},
                 "mode":"post_application"}
 
-    ben  = get_beneficiary_details(bid)
-    txns = get_beneficiary_transactions(bid)
-
     if is_aadhaar_only:
+        ben = _timed("beneficiary_details", timings, get_beneficiary_details, bid)
         status = (ben or {}).get("ApplicationStatus","UNKNOWN")
         sm = {"marathi": f'तुमच्या अर्जाची स्थिती "{str(status).upper()}" आहे.',
               "hindi":   f'आपके आवेदन की स्थिति "{str(status).upper()}" है।',
               "english": f'Your application status is "{str(status).upper()}".' }
+        print(f"⏱️ post-chat stages (ms): {timings}")
         return {"response":{"response":sm.get(lang,sm["english"]),
                             "transaction_chart_url":None,
                             "history":hist[-5:]},"mode":"post_application"}
 
+    details_future = _fanout("beneficiary_details", timings, get_beneficiary_details, bid)
+    txns = _timed("transactions", timings, get_beneficiary_transactions, bid)
+    ben  = details_future.result()
+
     df = pd.DataFrame(txns)
     if df.empty or "TransactionDate" not in df.columns:
         df = pd.DataFrame(columns=["TransactionDate","Amount","PaymentMonth"])
     else:
         df["TransactionDate"] = pd.to_datetime(df["TransactionDate"])
 
-    intent = _txn_intent(user_msg)
+    intent = intent_future.result()
+    rejection = _rejected(intent)
+    if rejection:
+        return rejection
+
+    chart_future = None
     if intent["transaction_flag"] == 1:
         if intent["last_n_months"]:
             ed = datetime.today()
@@ -365,13 +544,19 @@ def _db_answer(sid: str, user_msg: str, aadhaar: str,
             df["TxnMonth"] = df["TransactionDate"].dt.month
             df = df[df["TxnMonth"].isin(months)]
         if not df.empty:
-            chart_url = _upload_chart(df)
+            # The answer prompt does not use the chart → upload while the LLM answers
+            chart_future = _fanout("chart_upload", timings, _upload_chart, df.copy())
 
     db_ctx = f"Beneficiary:\n{ben}\n\nTransactions:\n{df.to_dict(orient='records')}"
     prompt  = f"Conversation history:\n{hist[-5:]}\n\nDatabase:\n{db_ctx}\n\nQuestion:\n{user_msg}"
-    reply   = _call_llm(prompt)
+    reply   = _timed("answer_llm", timings, _call_llm, prompt)
+    if chart_future:
+        chart_url = chart_future.result()
     hist.append({"user":user_msg,"bot":reply})
 
+    timings["total"] = round((time.perf_counter() - t_start) * 1000, 1)
+    print(f"⏱️ post-chat stages (ms): {timings}")
+
     return {"response":{"response":reply,"transaction_chart_url":chart_url,
                         "history":hist[-5:]},"mode":"post_application"}
 
@@ -423,10 +608,7 @@ def _handle_post_chat(
             mode="post_application_awaiting_aadhaar")
 
         is12 = bool(re.match(r'^\d{12}$', msg.strip()))
-        if not is12:
-            v = _validate_query(msg)
-            if not v["is_valid"]:
-                return _r(v["rejection_messages"].get(lang, v["rejection_messages"]["english"]))
+        # Query validity is checked inside _db_answer, concurrently with the DB lookups
         return _db_answer(sid, msg, aadhaar, lang, is12)
 
     # ══════════════════════════════════════════════════════════
@@ -749,10 +931,7 @@ def _handle_post_chat(
             return _r("Please provide your Aadhaar number.",
                       mode="post_application_awaiting_aadhaar")
         is12 = bool(re.match(r'^\d{12}$', msg.strip()))
-        if not is12:
-            v = _validate_query(msg)
-            if not v["is_valid"]:
-                return _r(v["rejection_messages"].get(lang, v["rejection_messages"]["english"]))
+        # Query validity is checked inside _db_answer, concurrently with the DB lookups
         return _db_answer(sid, msg, aadhaar, lang, is12)
 
     # Should never reach here
@@ -779,6 +958,19 @@ def post_chat(req: ChatRequest) -> dict:
     )
 
 
+async def post_chat_async(req: ChatRequest) -> dict:
+    """
+    Non-blocking post_chat for async handlers (main.py smart routers).
+    The DB lookups, chart upload and LLM calls run in a worker thread.
+    """
+    return await run_blocking(post_chat, req)
+
+
+@app.get("/post-application-chat/timings")
+async def post_application_timings():
+    return stage_timing_stats()
+
+
 # ─────────────────────────────────────────────────────────────
 # HTTP ENDPOINT — direct API calls (with optional file upload)
 # ─────────────────────────────────────────────────────────────
@@ -800,7 +992,8 @@ async def post_application_chat_form(
         file_bytes = await file.read()
         file_ext   = os.path.splitext(file.filename)[1].lower()
 
-    return await _handle_post_chat(
+    return await run_blocking(
+        _handle_post_chat,
         sid=sid, msg=msg, lang=lang,
         passed_aadhaar=aadhaar_number,
         file_bytes=file_bytes, file_ext=file_ext
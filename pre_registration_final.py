@@ -7,8 +7,8 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from typing import Optional, Dict, Any, List, Set
+from fastapi.responses import FileResponse, StreamingResponse
+from typing import Optional, Dict, Any, List, Set, AsyncIterator
 from openai import AzureOpenAI
 import requests
 from dotenv import load_dotenv
@@ -31,6 +31,9 @@ from starlette.responses import HTMLResponse
 from plivo import plivoxml
 from config import create_azure_speech_recognizer, azure_text_to_speech
 from database import get_user_by_phone
+from llm_client import chat_completion, achat_completion, astream_chat_completion, run_blocking
+from conversation_memory import conversation_memory
+from eligibility_engine import EligibilityEngine, ELIGIBILITY_ENGINE_ENABLED
 from models import (
     ChatRequest,
     ChatResponse,
@@ -199,7 +202,7 @@ Return ONLY valid JSON with no additional text:
 """
     
     try:
-        response = client.chat.completions.create(
+        response = chat_completion(client, purpose="validate_query",
             model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
             messages=[
                 {"role": "system", "content": "You are a query validator. Return only valid JSON with no markdown, no backticks, no additional text."},
@@ -266,8 +269,12 @@ class ResetRequest(BaseModel):
     session_id: str = "default"
 
 
-def get_ai_response(session_id: str, user_message: str, aadhaar_data: Optional[Dict[str, Any]] = None, user_lang: Optional[str] = None, file_uploaded: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    """Get response from Azure OpenAI for the eligibility agent"""
+def _prepare_eligibility_turn(session_id: str, user_message: str, aadhaar_data: Optional[Dict[str, Any]] = None, user_lang: Optional[str] = None, file_uploaded: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Everything in an eligibility turn before the agent completion.
+    Returns either a finished response ({"response", "is_complete"}) for the scripted
+    DPIP / Aadhaar steps, or {"messages": [...]} to send to the LLM.
+    """
 
     import re as _re
 
@@ -729,7 +736,7 @@ def get_ai_response(session_id: str, user_message: str, aadhaar_data: Optional[D
             # Detect language if not already set
             if not user_lang:
                 from utils import detect_language
-                user_lang = detect_language(user_message)
+                user_lang = detect_language(user_message, session_id=session_id)
             
             rejection_msg = validation["rejection_messages"].get(user_lang, validation["rejection_messages"]["english"])
             return {
@@ -744,11 +751,17 @@ def get_ai_response(session_id: str, user_message: str, aadhaar_data: Optional[D
     # Detect language from user's message if still not set
     if not sessions[session_id].get("language") and user_message.strip():
         from utils import detect_language
-        detected_lang = detect_language(user_message)
+        detected_lang = detect_language(user_message, session_id=session_id)
         sessions[session_id]["language"] = detected_lang
         print(f"🔍 Detected language for session {session_id}: {detected_lang}")
     
     user_language = sessions[session_id].get("language", "marathi")
+
+    # Deterministic interview over ELIGIBILITY_RULES - most turns end here without an LLM call
+    if ELIGIBILITY_ENGINE_ENABLED:
+        engine_turn = eligibility_engine.handle_turn(sessions[session_id], user_message, aadhaar_data, user_language)
+        if engine_turn:
+            return engine_turn
     
     # Build system prompt - start with original
     system_prompt = SYSTEM_PROMPT
@@ -811,71 +824,166 @@ CRITICAL INSTRUCTIONS FOR AADHAAR-VERIFIED USERS (translate all questions to {us
 """
         system_prompt = system_prompt + aadhaar_context
     
-    # Add user message to history
+    # Record the answer to the last agent question, then add user message to history
+    conversation_memory.record_answer(sessions[session_id], user_message)
     sessions[session_id]["messages"].append({
         "role": "user",
         "content": user_message
     })
     
+    # Build messages with system prompt: answered criteria + recent turns, within the token budget
+    messages_with_system = conversation_memory.build_messages(sessions[session_id], system_prompt)
+    return {"messages": messages_with_system}
+
+
+def _complete_eligibility_turn(session_id: str, assistant_message: str) -> Dict[str, Any]:
+    """Store the agent reply and detect whether it contains the final verdict"""
+
+    # Add assistant response to history
+    sessions[session_id]["messages"].append({
+        "role": "assistant",
+        "content": assistant_message
+    })
+    
+    # ✅ CHECK IF ELIGIBILITY FLOW IS COMPLETE
+    verdict_patterns = [
+        "eligible", "not eligible", "ineligible",
+        "पात्र", "अपात्र",
+    ]
+
+    reason_keywords = [
+        "कारण", "reason", "because",
+        "वर्षांच्या पात्रतेमध्ये नाही",
+        "उत्पन्न मर्यादा ओलांडली",
+        "पात्रता नाही"
+    ]
+
+    response_lower = assistant_message.lower()
+
+    has_verdict_pattern = any(pattern in response_lower for pattern in verdict_patterns)
+    has_reason = any(keyword in assistant_message for keyword in reason_keywords)
+
+    has_verdict_format = ("पात्र:" in assistant_message or "अपात्र:" in assistant_message or 
+                        "eligible:" in response_lower or "ineligible:" in response_lower or
+                        "not eligible:" in response_lower)
+
+    is_question = assistant_message.strip().endswith("?")
+
+    is_flow_complete = (
+        (has_verdict_pattern and has_reason) or 
+        has_verdict_format or
+        (has_verdict_pattern and len(assistant_message) < 100 and not is_question)
+    )
+
+    return {
+        "response": assistant_message,
+        "is_complete": is_flow_complete
+    }
+
+
+def get_ai_response(session_id: str, user_message: str, aadhaar_data: Optional[Dict[str, Any]] = None, user_lang: Optional[str] = None, file_uploaded: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Get response from Azure OpenAI for the eligibility agent"""
+    turn = _prepare_eligibility_turn(session_id, user_message, aadhaar_data, user_lang, file_uploaded)
+    if "messages" not in turn:
+        return turn
+
     try:
-        # Build messages with system prompt
-        messages_with_system = [{"role": "system", "content": system_prompt}] + sessions[session_id]["messages"]
-        
         # Call Azure OpenAI API
-        response = client.chat.completions.create(
+        response = chat_completion(client, purpose="eligibility_agent",
             model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
             max_tokens=1024,
-            messages=messages_with_system
+            messages=turn["messages"]
         )
         
-        assistant_message = response.choices[0].message.content
-
-        # Add assistant response to history
-        sessions[session_id]["messages"].append({
-            "role": "assistant",
-            "content": assistant_message
-        })
+        conversation_memory.record_usage(sessions[session_id], getattr(response, "usage", None))
+        return _complete_eligibility_turn(session_id, response.choices[0].message.content)
         
-        # ✅ CHECK IF ELIGIBILITY FLOW IS COMPLETE
-        verdict_patterns = [
-            "eligible", "not eligible", "ineligible",
-            "पात्र", "अपात्र",
-        ]
+    except Exception as e:
+        return {
+            "response": f"Error: {str(e)}. Please check your API key.",
+            "is_complete": False
+        }
 
-        reason_keywords = [
-            "कारण", "reason", "because",
-            "वर्षांच्या पात्रतेमध्ये नाही",
-            "उत्पन्न मर्यादा ओलांडली",
-            "पात्रता नाही"
-        ]
 
-        response_lower = assistant_message.lower()
+async def get_ai_response_async(session_id: str, user_message: str, aadhaar_data: Optional[Dict[str, Any]] = None, user_lang: Optional[str] = None, file_uploaded: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Non-blocking get_ai_response for async handlers.
+    The scripted steps (OCR, DB lookups, query validation) run in a worker thread;
+    the agent completion goes through the shared AsyncAzureOpenAI client.
+    """
+    turn = await run_blocking(_prepare_eligibility_turn, session_id, user_message, aadhaar_data, user_lang, file_uploaded)
+    if "messages" not in turn:
+        return turn
 
-        has_verdict_pattern = any(pattern in response_lower for pattern in verdict_patterns)
-        has_reason = any(keyword in assistant_message for keyword in reason_keywords)
+    try:
+        response = await achat_completion(
+            purpose="eligibility_agent",
+            model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            max_tokens=1024,
+            messages=turn["messages"]
+        )
+        
+        conversation_memory.record_usage(sessions[session_id], getattr(response, "usage", None))
+        return _complete_eligibility_turn(session_id, response.choices[0].message.content)
+        
+    except Exception as e:
+        return {
+            "response": f"Error: {str(e)}. Please check your API key.",
+            "is_complete": False
+        }
 
-        has_verdict_format = ("पात्र:" in assistant_message or "अपात्र:" in assistant_message or 
-                            "eligible:" in response_lower or "ineligible:" in response_lower or
-                            "not eligible:" in response_lower)
 
-        is_question = assistant_message.strip().endswith("?")
+async def get_ai_response_stream(session_id: str, user_message: str, aadhaar_data: Optional[Dict[str, Any]] = None, user_lang: Optional[str] = None, file_uploaded: Optional[Dict[str, Any]] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming get_ai_response for the SSE endpoints.
+    Yields {"event": "token", "content": ...} per delta, then one
+    {"event": "done", "response": ..., "is_complete": ...} with the verdict
+    computed on the full accumulated reply. Scripted turns (DPIP, Aadhaar, rejections)
+    have no LLM call and come back as a single "done" event.
+    """
+    turn = await run_blocking(_prepare_eligibility_turn, session_id, user_message, aadhaar_data, user_lang, file_uploaded)
+    if "messages" not in turn:
+        yield {"event": "done", **turn}
+        return
 
-        is_flow_complete = (
-            (has_verdict_pattern and has_reason) or 
-            has_verdict_format or
-            (has_verdict_pattern and len(assistant_message) < 100 and not is_question)
-        )
+    parts: List[str] = []
+    completed = False
+    try:
+        async for delta in astream_chat_completion(
+            purpose="eligibility_agent",
+            model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            max_tokens=1024,
+            messages=turn["messages"]
+        ):
+            parts.append(delta)
+            yield {"event": "token", "content": delta}
+
+        completed = True
+        yield {"event": "done", **_complete_eligibility_turn(session_id, "".join(parts))}
 
-        return {
-            "response": assistant_message,
-            "is_complete": is_flow_complete
-        }
-        
     except Exception as e:
-        return {
+        completed = True
+        yield {
+            "event": "done",
             "response": f"Error: {str(e)}. Please check your API key.",
             "is_complete": False
         }
+    finally:
+        # Client went away mid-stream: keep what was generated so the history stays in turn order
+        if not completed and parts:
+            _complete_eligibility_turn(session_id, "".join(parts))
+
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Serialize a stream event as a server-sent-event frame"""
+    payload = {k: v for k, v in event.items() if k != "event"}
+    return f"event: {event['event']}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # stop nginx from buffering the stream
+}
 
 
 def check_eligibility_rule(criteria: str, value: Any) -> tuple:
@@ -907,6 +1015,24 @@ def check_eligibility_rule(criteria: str, value: Any) -> tuple:
     return None, "Unknown criteria"
 
 
+def _engine_completion(messages: List[Dict[str, str]], max_tokens: int) -> Optional[str]:
+    """Deterministic LLM hook for the eligibility engine (free-form answers, question phrasing)"""
+    try:
+        response = chat_completion(client, purpose="eligibility_engine",
+            model=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
+            temperature=0,
+            max_tokens=max_tokens,
+            messages=messages
+        )
+        return response.choices[0].message.content
+    except Exception as e:
+        print(f"⚠️ Eligibility engine LLM call failed: {e}")
+        return None
+
+
+eligibility_engine = EligibilityEngine(check_rule=check_eligibility_rule, complete=_engine_completion)
+
+
 @app.get("/")
 async def root():
     """Serve the main application"""
@@ -932,7 +1058,7 @@ async def chat(
             "doc_type": doc_type
         }
 
-    response = get_ai_response(
+    response = await get_ai_response_async(
         session_id=session_id,
         user_message=message,
         file_uploaded=file_uploaded
@@ -941,6 +1067,56 @@ async def chat(
     return {"response": response, "session_id": session_id}
 
 
+@app.post("/api/chat/stream")
+async def chat_stream(
+    session_id: str = Form(...),
+    message: str = Form(""),
+    file: Optional[UploadFile] = File(None),
+    doc_type: str = Form("aadhaar")
+):
+    """Same as /api/chat, streamed as server-sent events (token events, then a final done event)"""
+    file_uploaded = None
+    if file and file.filename:
+        file_content = await file.read()
+        file_extension = Path(file.filename).suffix
+        file_uploaded = {
+            "content": file_content,
+            "name": file.filename,
+            "extension": file_extension,
+            "doc_type": doc_type
+        }
+
+    async def event_source():
+        async for event in get_ai_response_stream(
+            session_id=session_id,
+            user_message=message,
+            file_uploaded=file_uploaded
+        ):
+            if event["event"] == "done":
+                event["session_id"] = session_id
+            yield format_sse(event)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.get("/api/eligibility-engine/stats")
+async def eligibility_engine_stats():
+    """Local vs LLM-assisted turn counts of the eligibility engine"""
+    return eligibility_engine.stats()
+
+
+@app.get("/api/memory/{session_id}")
+async def get_session_memory(session_id: str):
+    """Structured memory and prompt token usage for a session"""
+    if session_id not in sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+    return {
+        "session_id": session_id,
+        "memory": conversation_memory.session_report(sessions[session_id]),
+        "totals": conversation_memory.stats()
+    }
+
+
 @app.post("/api/check-eligibility")
 async def check_eligibility(request: EligibilityCheckRequest):
     """Direct eligibility check API"""
@@ -1304,7 +1480,7 @@ async def handle_media_stream(websocket: WebSocket):
         async def process_chat():
             nonlocal processing_response
             try:
-                reply = get_ai_response(
+                reply = await get_ai_response_async(
                     session_id=session["session_id"],
                     user_message=final_text,
                 )
@@ -1324,7 +1500,7 @@ async def handle_media_stream(websocket: WebSocket):
                     "conversation_history": session["conversation_history"]
                 })
 
-                audio = azure_text_to_speech(reply)
+                audio = await run_blocking(azure_text_to_speech, reply)
                 audio_b64 = base64.b64encode(audio).decode("utf-8")
 
                 if websocket.client_state == WebSocketState.CONNECTED:
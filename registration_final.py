@@ -15,9 +15,8 @@ import shutil
 import subprocess
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Union
 from dotenv import load_dotenv
-import io
 
 # Load environment variables
 load_dotenv()
@@ -27,8 +26,6 @@ from azure.storage.blob import BlobServiceClient, ContentSettings, BlobSasPermis
 
 # Tesseract OCR
 import pytesseract
-from PIL import Image
-from pdf2image import convert_from_path
 
 # Azure OpenAI for intelligent parsing
 from openai import AzureOpenAI
@@ -44,6 +41,14 @@ try:
 except Exception as e:
     logger.error(f"❌ Failed to import database module: {e}")
 
+from translation_cache import translation_cache, placeholders_preserved
+from translation_catalog import get_translation_catalog, REGISTRATION_NAMESPACE
+from llm_client import run_blocking, chat_completion
+from document_cache import document_parse_cache, parse_cache_key
+from deadline import with_deadline, has_budget, record_fallback, REQUEST_DEADLINE_SECONDS
+from ocr_service import ocr_service, OCR_PROFILE_MIN_CONFIDENCE
+from card_layout_ocr import extract_card
+
 
 # ============================================
 # BASE ENGLISH TEMPLATES (for LLM Translation)
@@ -658,9 +663,60 @@ Please verify your documents and try again."""
 # DYNAMIC TRANSLATION FUNCTION
 # ============================================
 
+TRANSLATION_SYSTEM_PROMPT = """You are a professional translator for Maharashtra Government's Ladki Bahin Yojana scheme.
+
+    Translate the following English text to {language} in a formal, respectful, government-appropriate tone.
+
+    CRITICAL RULES:
+    1. Maintain ALL formatting exactly (line breaks, dashes, separators like ════)
+    2. Keep ALL placeholders EXACTLY as-is: {{name}}, {{mobile}}, {{app_id}}, etc.
+    3. Do NOT translate placeholder variable names inside curly braces
+    4. Keep numbers, currency symbols (Rs.), and special characters unchanged
+    5. Maintain the same indentation and spacing - this is very important
+    6. Use formal/respectful tone appropriate for government communication
+    7. Preserve all line breaks and empty lines for proper formatting
+    8. Keep section headers aligned and properly indented
+
+    Return ONLY the translated text, no explanations or notes."""
+
+# Pre-translated templates compiled at build time (see translation_catalog.py)
+translation_catalog = get_translation_catalog()
+
+
+def translate_template(template: str, language: str) -> Optional[str]:
+    """
+    Translate an unformatted English template with Azure OpenAI.
+    Used for live translation and by the catalog compiler.
+
+    Returns:
+        Translated template (placeholders untouched) or None on failure
+    """
+    if not openai_client:
+        return None
+
+    try:
+        response = chat_completion(openai_client, purpose="translate",
+            model=AZURE_DEPLOYMENT,
+            messages=[
+                {"role": "system", "content": TRANSLATION_SYSTEM_PROMPT.format(language=language.title())},
+                {"role": "user", "content": template}
+            ],
+            temperature=0,
+            max_tokens=1000
+        )
+        return response.choices[0].message.content.strip()
+    except Exception as e:
+        logger.error(f"Translation error to {language}: {e}")
+        import traceback
+        logger.error(f"Traceback: {traceback.format_exc()}")
+        return None
+
+
 def get_translated_message(message_key: str, language: str, **kwargs) -> str:
     """
     Use Azure OpenAI to translate messages dynamically.
+
+    Lookup order: compiled catalog → translation cache → live LLM translation.
     
     Args:
         message_key: Key from MESSAGE_TEMPLATES
@@ -679,57 +735,31 @@ def get_translated_message(message_key: str, language: str, **kwargs) -> str:
 
     # If English, return directly
     if language == "english" or language not in ["marathi", "hindi"]:
-        base_message = MESSAGE_TEMPLATES.get(message_key, MESSAGE_TEMPLATES["error"])
-        return base_message.format(**kwargs) if kwargs else base_message
-    
-    # Check if OpenAI client is available
-    if not openai_client:
-        logger.warning("OpenAI client not available, falling back to English")
-        base_message = MESSAGE_TEMPLATES.get(message_key, MESSAGE_TEMPLATES["error"])
         return base_message.format(**kwargs) if kwargs else base_message
-    
-    try:
-        template = MESSAGE_TEMPLATES.get(message_key)
-
-        # If template is language-specific dict
-        if isinstance(template, dict):
-            base_message = template.get(language, template.get("english"))
-        else:
-            base_message = template
-        
-        # If message key doesn't exist, return error
-        if base_message is None:
-            logger.error(f"Message key '{message_key}' not found in MESSAGE_TEMPLATES")
-            return "An error occurred. Please try again."
-        
-        # Build system prompt for translation
-        system_prompt = f"""You are a professional translator for Maharashtra Government's Ladki Bahin Yojana scheme.
-
-    Translate the following English text to {language.title()} in a formal, respectful, government-appropriate tone.
-
-    CRITICAL RULES:
-    1. Maintain ALL formatting exactly (line breaks, dashes, separators like ════)
-    2. Keep ALL placeholders EXACTLY as-is: {{name}}, {{mobile}}, {{app_id}}, etc.
-    3. Do NOT translate placeholder variable names inside curly braces
-    4. Keep numbers, currency symbols (Rs.), and special characters unchanged
-    5. Maintain the same indentation and spacing - this is very important
-    6. Use formal/respectful tone appropriate for government communication
-    7. Preserve all line breaks and empty lines for proper formatting
-    8. Keep section headers aligned and properly indented
-
-    Return ONLY the translated text, no explanations or notes."""
 
-        response = openai_client.chat.completions.create(
-            model=AZURE_DEPLOYMENT,
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": base_message}
-            ],
-            temperature=0.3,
-            max_tokens=1000
-        )
-        
-        translated = response.choices[0].message.content.strip()
+    try:
+        translated = _lookup_translation(message_key, language, base_message)
+
+        if translated is None:
+            # Check if OpenAI client is available
+            if not openai_client:
+                logger.warning("OpenAI client not available, falling back to English")
+                raise LookupError(f"No translation available for '{message_key}'")
+
+            # Not enough request budget left for a live translation → English template
+            if not has_budget():
+                record_fallback("translate")
+                raise LookupError(f"No time left to translate '{message_key}'")
+
+            translated = translate_template(base_message, language)
+            if translated is None:
+                raise LookupError(f"Live translation failed for '{message_key}'")
+
+            # Only cache translations that kept every {placeholder}, otherwise formatting would break on reuse
+            if placeholders_preserved(base_message, translated):
+                translation_cache.set(message_key, language, base_message, translated)
+            else:
+                logger.warning(f"⚠️ Translation of '{message_key}' to {language} altered placeholders, not caching")
         
         # Format with provided kwargs
         formatted_message = translated.format(**kwargs) if kwargs else translated
@@ -738,11 +768,23 @@ def get_translated_message(message_key: str, language: str, **kwargs) -> str:
         
     except Exception as e:
         logger.error(f"Translation error for key '{message_key}' to {language}: {e}")
-        logger.error(f"Full error details: {str(e)}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
     
-    # Fallback to English with formatting
+    return _english_message(message_key, kwargs)
+
+
+def _lookup_translation(message_key: str, language: str, base_message: str) -> Optional[str]:
+    """Translated template without an LLM call: compiled catalog, then translation cache"""
+    # Static translation compiled at build time (no LLM call)
+    translated = translation_catalog.lookup(REGISTRATION_NAMESPACE, message_key, language, base_message)
+
+    # Reuse a previously translated template (formatted by the caller with its kwargs)
+    if translated is None:
+        translated = translation_cache.get(message_key, language, base_message)
+    return translated
+
+
+def _english_message(message_key: str, kwargs: Dict[str, Any]) -> str:
+    """Fallback to English with formatting"""
     try:
         base_message = MESSAGE_TEMPLATES.get(message_key, MESSAGE_TEMPLATES.get("error"))
         if base_message is None:
@@ -764,6 +806,107 @@ def get_translated_message(message_key: str, language: str, **kwargs) -> str:
         logger.error(f"Formatting error in fallback: {format_error}")
         return "An error occurred. Please try again."
 
+
+BATCH_TRANSLATION_INSTRUCTIONS = """
+
+    You will receive a JSON object mapping message keys to English texts.
+    Translate every value following the rules above and return ONLY a JSON object
+    with exactly the same keys mapped to the translated texts."""
+
+
+def translate_templates_batch(templates: Dict[str, str], language: str) -> Dict[str, str]:
+    """
+    Translate several unformatted templates in one Azure OpenAI call.
+
+    Returns:
+        message_key → translated template, only for translations that kept every placeholder
+    """
+    if not templates or not openai_client:
+        return {}
+
+    if len(templates) == 1:
+        (message_key, template), = templates.items()
+        translated = translate_template(template, language)
+        return {message_key: translated} if translated and placeholders_preserved(template, translated) else {}
+
+    try:
+        response = chat_completion(openai_client, purpose="translate_batch",
+            model=AZURE_DEPLOYMENT,
+            messages=[
+                {"role": "system", "content": TRANSLATION_SYSTEM_PROMPT.format(language=language.title())
+                                              + BATCH_TRANSLATION_INSTRUCTIONS},
+                {"role": "user", "content": json.dumps(templates, ensure_ascii=False)}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0,
+            max_tokens=min(1000 * len(templates), 4000)
+        )
+        translations = json.loads(response.choices[0].message.content)
+    except Exception as e:
+        logger.error(f"Batch translation error to {language}: {e}")
+        return {}
+
+    result = {}
+    for message_key, template in templates.items():
+        translated = translations.get(message_key)
+        if isinstance(translated, str) and placeholders_preserved(template, translated):
+            result[message_key] = translated.strip()
+        else:
+            logger.warning(f"⚠️ Batch translation of '{message_key}' to {language} missing or altered placeholders")
+    return result
+
+
+def get_translated_messages(parts: List[Union[str, Tuple[str, Dict[str, Any]]]], language: str) -> List[str]:
+    """
+    Resolve every template a response needs with at most one LLM call.
+
+    Args:
+        parts: message keys, or (message_key, kwargs) tuples for templates with variables
+        language: Target language (marathi/hindi/english)
+
+    Catalog and cache hits are used as-is; whatever is still untranslated goes out in one
+    batched request. Templates the batch could not translate fall back to English.
+    """
+    parts = [(part, {}) if isinstance(part, str) else part for part in parts]
+    if language not in ["marathi", "hindi"]:
+        return [get_translated_message(key, language, **kwargs) for key, kwargs in parts]
+
+    templates: Dict[str, Optional[str]] = {}
+    for key, _ in parts:
+        base_message = MESSAGE_TEMPLATES.get(key)
+        if isinstance(base_message, str) and key not in templates:
+            templates[key] = _lookup_translation(key, language, base_message)
+
+    missing = {key: MESSAGE_TEMPLATES[key] for key, translated in templates.items() if translated is None}
+    if missing and openai_client:
+        if has_budget():
+            for key, translated in translate_templates_batch(missing, language).items():
+                translation_cache.set(key, language, missing[key], translated)
+                templates[key] = translated
+        else:
+            record_fallback("translate")
+
+    messages = []
+    for key, kwargs in parts:
+        if key not in templates:
+            # Per-language dict templates and unknown keys
+            messages.append(get_translated_message(key, language, **kwargs))
+            continue
+        try:
+            translated = templates[key]
+            if translated is None:
+                raise LookupError(f"No translation available for '{key}'")
+            messages.append(translated.format(**kwargs) if kwargs else translated)
+        except Exception as e:
+            logger.error(f"Translation error for key '{key}' to {language}: {e}")
+            messages.append(_english_message(key, kwargs))
+    return messages
+
+
+def compose_message(language: str, *parts: Union[str, Tuple[str, Dict[str, Any]]], separator: str = "\n\n") -> str:
+    """Join several translated templates into one response (see get_translated_messages)"""
+    return separator.join(get_translated_messages(list(parts), language))
+
 # ============================================
 # AZURE BLOB STORAGE CONFIGURATION
 # ============================================
@@ -950,6 +1093,9 @@ DOCUMENT_TYPES = {
 
 DOMICILE_PROOF_OPTIONS = ["domicile_certificate", "ration_card", "voter_id", "birth_certificate", "school_leaving"]
 
+# Bump when the parse_with_ai prompts change so cached parses from the old prompts are not reused
+DOCUMENT_PARSE_PROMPT_VERSION = "registration-v1"
+
 
 # ============================================
 # CUSTOM DOCUMENT INTELLIGENCE
@@ -959,8 +1105,36 @@ class DocumentIntelligence:
     """Custom OCR + AI parsing system with document validation"""
     
     def __init__(self):
-        self.tesseract_config = r'--oem 3 --psm 6'
-        self.tesseract_lang = 'eng+hin'
+        # OCR profile per DOCUMENT_TYPES entry: Tesseract languages, page segmentation mode,
+        # character whitelist and PDF rasterization DPI. Pages whose mean word confidence is
+        # below min_confidence are re-read with the fallback profile. Languages whose
+        # traineddata is not installed are dropped (ocr_backends.supported_lang).
+        # e-Aadhaar / e-PAN PDFs are born-digital, so 200 dpi is plenty; scanned certificates keep 300.
+        self.ocr_profiles = {
+            "broad": {"lang": "eng+hin+mar", "psm": 6, "whitelist": None, "dpi": 300},
+            "aadhaar": {"lang": "eng+hin", "psm": 6, "whitelist": None, "dpi": 200, "fallback": "broad"},
+            # Essentially English and digits
+            "pan_card": {"lang": "eng", "psm": 6, "whitelist": None, "dpi": 200, "fallback": "broad"},
+            "bank_passbook": {"lang": "eng", "psm": 6, "whitelist": None, "dpi": 300, "fallback": "broad"},
+            "voter_id": {"lang": "eng+mar", "psm": 6, "whitelist": None, "dpi": 300, "fallback": "broad"},
+            # Issued in Marathi by Maharashtra offices; hin keeps Devanagari coverage where mar
+            # traineddata is missing (the income cascade does not use a fallback profile)
+            "income_certificate": {"lang": "mar+hin+eng", "psm": 6, "whitelist": None, "dpi": 300},
+            "ration_card": {"lang": "mar+eng", "psm": 6, "whitelist": None, "dpi": 300, "fallback": "broad"},
+            "domicile_certificate": {"lang": "mar+eng", "psm": 6, "whitelist": None, "dpi": 300, "fallback": "broad"},
+            "birth_certificate": {"lang": "mar+eng", "psm": 6, "whitelist": None, "dpi": 300, "fallback": "broad"},
+            "school_leaving": {"lang": "mar+eng", "psm": 6, "whitelist": None, "dpi": 300, "fallback": "broad"},
+            # Only checked for presence, the text is never parsed
+            "photograph": {"lang": "eng", "psm": 6, "whitelist": None, "dpi": 150},
+        }
+
+        # Single-document uploads: PDF OCR stops at the first page that has a type keyword
+        # and all of these fields (both Aadhaar sides, PAN number, IFSC + account number)
+        self.early_exit_fields = {
+            "aadhaar": [re.compile(r"\d{4}\s?\d{4}\s?\d{4}"), re.compile(r"address|पत्ता|पता", re.I)],
+            "pan_card": [re.compile(r"[A-Z]{5}\s?[0-9]{4}\s?[A-Z]")],
+            "bank_passbook": [re.compile(r"\b[A-Z]{4}0[A-Z0-9]{6}\b"), re.compile(r"\b\d{9,18}\b")],
+        }
         
         self.validation_keywords = {
             "aadhaar": [
@@ -1003,49 +1177,84 @@ class DocumentIntelligence:
         }
     
     def extract_text_from_bytes(self, file_content: bytes, file_extension: str, document_type: str = None) -> str:
-        """Extract raw text from file bytes using Tesseract OCR"""
+        """Extract raw text from file bytes using Tesseract OCR (runs in the OCR process pool)"""
         try:
-            if file_extension.lower() == '.pdf':
-                import tempfile
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp:
-                    tmp.write(file_content)
-                    tmp_path = tmp.name
-                
-                images = convert_from_path(tmp_path, dpi=300)
-                text = ""
-                for img in images:
-                    text += pytesseract.image_to_string(img, lang=self.tesseract_lang, config=self.tesseract_config)
-                    if document_type == "income_certificate":
-                        text += "\n" + self._ocr_with_preprocessing(img)
-                
-                os.unlink(tmp_path)
-                return text
-            else:
-                img = Image.open(io.BytesIO(file_content))
-                base_text = pytesseract.image_to_string(img, lang=self.tesseract_lang, config=self.tesseract_config)
-                if document_type == "income_certificate":
-                    return base_text + "\n" + self._ocr_with_preprocessing(img)
-                return base_text
+            return ocr_service.run_document(
+                file_content, file_extension,
+                page_separator="",
+                stop_when=self._ocr_complete_check(document_type),
+                preprocess=document_type == "income_certificate",
+                **self.ocr_profile_kwargs(document_type)
+            )
         except Exception as e:
             logger.error(f"OCR Error: {e}")
             return f"OCR Error: {str(e)}"
-
-    def _ocr_with_preprocessing(self, img: Image.Image) -> str:
-        """Extra OCR pass with preprocessing to improve numeric capture."""
-        try:
-            gray = img.convert("L")
-            # Try multiple thresholds and OCR modes to capture faint digits
-            texts = []
-            for thresh in (140, 160, 180, 200):
-                enhanced = gray.point(lambda x, t=thresh: 0 if x < t else 255, mode="1")
-                for psm in (6, 7, 11, 13):
-                    cfg = f"--oem 3 --psm {psm}"
-                    texts.append(pytesseract.image_to_string(enhanced, lang=self.tesseract_lang, config=cfg))
-            return "\n".join(texts)
-        except Exception as e:
-            logger.error(f"OCR preprocessing error: {e}")
-            return ""
     
+    def _profile_config(self, profile: Dict[str, Any]) -> str:
+        config = f"--oem 3 --psm {profile['psm']}"
+        if profile.get("whitelist"):
+            config += f" -c tessedit_char_whitelist={profile['whitelist']}"
+        return config
+
+    def ocr_profile_kwargs(self, document_type: Optional[str]) -> Dict[str, Any]:
+        """ocr_service.run_document settings for a document type's OCR profile"""
+        name = document_type if document_type in self.ocr_profiles else "broad"
+        profile = self.ocr_profiles[name]
+        kwargs = {
+            "lang": profile["lang"],
+            "config": self._profile_config(profile),
+            "dpi": profile["dpi"],
+            "profile": name,
+        }
+        fallback = self.ocr_profiles.get(profile.get("fallback"))
+        if fallback:
+            kwargs["fallback"] = (fallback["lang"], self._profile_config(fallback))
+            kwargs["min_confidence"] = profile.get("min_confidence", OCR_PROFILE_MIN_CONFIDENCE)
+        return kwargs
+
+    def extract_card_fields(self, file_content: bytes, file_extension: str,
+                            document_type: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """
+        (region text, fields) from layout-aware card OCR, in parse_with_ai's keys.
+        None unless every field is validated: both Aadhaar sides (this flow takes a single
+        upload with front and back) or the PAN number, name and date of birth.
+        """
+        card = extract_card(file_content, file_extension, document_type)
+        if not card:
+            return None
+        fields = card["fields"]
+        if document_type == "aadhaar" and card["sides"] == ["front", "back"]:
+            logger.info("🪪 Aadhaar read from card regions, skipping full OCR and AI parse")
+            return card["text"], {
+                "aadhaar_number": fields["aadhaar_number"],
+                "name": fields["name"],
+                "dob": fields["dob"],
+                "gender": fields["gender"][0],
+                "address": fields["address"],
+            }
+        if document_type == "pan_card" and card["sides"]:
+            logger.info("🪪 PAN read from card regions, skipping full OCR and AI parse")
+            return card["text"], {
+                "pan_number": fields["pan_number"],
+                "name": fields["name"],
+                "father_name": fields.get("father_name", ""),
+                "date_of_birth": fields["date_of_birth"],
+            }
+        return None
+
+    def _ocr_complete_check(self, document_type: str):
+        """Early-exit predicate for multi-page PDFs (None: OCR every page)"""
+        fields = self.early_exit_fields.get(document_type)
+        if not fields:
+            return None
+        keywords = self.validation_keywords.get(document_type, [])
+
+        def complete(text: str) -> bool:
+            text_lower = text.lower()
+            return (any(keyword in text_lower for keyword in keywords)
+                    and all(pattern.search(text) for pattern in fields))
+        return complete
+
     def validate_document_type(self, raw_text: str, document_type: str, user_language: str = "english") -> tuple:
         """Validate if the uploaded document matches the expected document type"""
 
@@ -1103,18 +1312,22 @@ class DocumentIntelligence:
             if keyword.lower() in text_lower:
                 return True, None
 
-        error_messages = {
-            "aadhaar": get_translated_message("invalid_aadhaar", user_language),
-            "bank_passbook": get_translated_message("invalid_bank_passbook", user_language),
-            "income_certificate": get_translated_message("invalid_income_certificate", user_language),
-            "ration_card": get_translated_message("invalid_ration_card", user_language),
-            "voter_id": get_translated_message("invalid_voter_id", user_language),
-            "domicile_certificate": get_translated_message("invalid_domicile_certificate", user_language),
-            "birth_certificate": get_translated_message("invalid_birth_certificate", user_language),
-            "school_leaving": get_translated_message("invalid_school_leaving", user_language)
+        # Only the error for this document type is translated
+        error_message_keys = {
+            "aadhaar": "invalid_aadhaar",
+            "bank_passbook": "invalid_bank_passbook",
+            "income_certificate": "invalid_income_certificate",
+            "ration_card": "invalid_ration_card",
+            "voter_id": "invalid_voter_id",
+            "domicile_certificate": "invalid_domicile_certificate",
+            "birth_certificate": "invalid_birth_certificate",
+            "school_leaving": "invalid_school_leaving"
         }
 
-        return False, error_messages.get(document_type, "Invalid Document!")
+        message_key = error_message_keys.get(document_type)
+        if not message_key:
+            return False, "Invalid Document!"
+        return False, get_translated_message(message_key, user_language)
 
     
     def validate_name(self, extracted_name: str, expected_name: str, user_language: str = "english") -> tuple:
@@ -1192,6 +1405,17 @@ class DocumentIntelligence:
         if not openai_client:
             logger.warning("⚠️ Azure OpenAI not configured. Using basic extraction.")
             return self.basic_extract(text, document_type)
+
+        # Same document uploaded again → reuse the structured parse
+        cache_key = parse_cache_key(document_type, text, DOCUMENT_PARSE_PROMPT_VERSION)
+        cached = document_parse_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"♻️ Reusing cached AI parse for {document_type}")
+            return cached
+
+        if not has_budget():
+            record_fallback("parse_with_ai")
+            return self.basic_extract(text, document_type)
         
         prompts = {
             "aadhaar": f"""Extract from Aadhaar card:
@@ -1318,7 +1542,7 @@ Return JSON only.""",
         prompt = prompts.get(document_type, f"Extract key information from:\n{text}\n\nReturn JSON.")
         
         try:
-            response = openai_client.chat.completions.create(
+            response = chat_completion(openai_client, purpose="parse_with_ai",
                 model=AZURE_DEPLOYMENT,
                 messages=[
                     {"role": "system", "content": "Extract structured data from OCR text. Return ONLY valid JSON with no markdown formatting."},
@@ -1330,7 +1554,9 @@ Return JSON only.""",
             
             result_text = response.choices[0].message.content.strip()
             result_text = result_text.replace('```json', '').replace('```', '').strip()
-            return json.loads(result_text)
+            parsed = json.loads(result_text)
+            document_parse_cache.set(cache_key, parsed)
+            return parsed
             
         except Exception as e:
             logger.error(f"AI parsing error: {e}")
@@ -1419,7 +1645,14 @@ Return JSON only.""",
     def analyze_document(self, file_content: bytes, file_extension: str, document_type: str, 
                 blob_url: str, expected_name: str = None, user_language: str = "english") -> Dict[str, Any]:
         """Complete document analysis with validation"""
-        raw_text = self.extract_text_from_bytes(file_content, file_extension, document_type)
+        # Aadhaar / PAN photos: read the card's field regions first; a complete, validated
+        # result needs neither full-page OCR nor the LLM parse
+        structured_data = None
+        card = self.extract_card_fields(file_content, file_extension, document_type)
+        if card:
+            raw_text, structured_data = card
+        else:
+            raw_text = self.extract_text_from_bytes(file_content, file_extension, document_type)
         
         is_valid_type, type_error = self.validate_document_type(raw_text, document_type, user_language)
         if not is_valid_type:
@@ -1432,7 +1665,8 @@ Return JSON only.""",
                 "blob_url": blob_url
             }
         
-        structured_data = self.parse_with_ai(raw_text, document_type)
+        if structured_data is None:
+            structured_data = self.parse_with_ai(raw_text, document_type)
         
         # Skip name validation for photograph and PAN card
         # PAN often contains middle/father's name not present on Aadhaar
@@ -1662,6 +1896,7 @@ def format_currency(num: float) -> str:
 # CHATBOT LOGIC
 # ============================================
 
+@with_deadline(REQUEST_DEADLINE_SECONDS)
 def get_bot_response(session_id: str, user_message: str = "", file_uploaded: dict = None):
     """Main chatbot conversation logic with Aadhaar pre-fill and dynamic translation"""
     
@@ -2173,8 +2408,8 @@ def get_bot_response(session_id: str, user_message: str = "", file_uploaded: dic
 
                 # ✅ FLOW CHANGE: Go to collect_mobile instead of income_selection
                 session["step"] = "collect_mobile"
-                pan_linked_msg = get_translated_message("pan_aadhaar_linked", user_language)
-                mobile_msg = get_translated_message("mobile_number_prompt", user_language)
+                pan_linked_msg, mobile_msg = get_translated_messages(
+                    ["pan_aadhaar_linked", "mobile_number_prompt"], user_language)
 
                 return {
                     "response": f"{pan_linked_msg}\n\n{mobile_msg}",
@@ -2299,8 +2534,8 @@ def get_bot_response(session_id: str, user_message: str = "", file_uploaded: dic
 
             # ✅ FLOW CHANGE: Linked → Go to collect_mobile instead of income_selection
             session["step"] = "collect_mobile"
-            pan_linked_msg = get_translated_message("pan_aadhaar_linked", user_language)
-            mobile_msg = get_translated_message("mobile_number_prompt", user_language)
+            pan_linked_msg, mobile_msg = get_translated_messages(
+                ["pan_aadhaar_linked", "mobile_number_prompt"], user_language)
 
             return {
                 "response": f"{pan_linked_msg}\n\n{mobile_msg}",
@@ -2419,8 +2654,7 @@ def get_bot_response(session_id: str, user_message: str = "", file_uploaded: dic
             }
         else:
             response = {
-                "response": get_translated_message("invalid_option", user_language) + "\n\n" + 
-                          get_translated_message("domicile_prompt", user_language),
+                "response": compose_message(user_language, "invalid_option", "domicile_prompt"),
                 "type": "error",
                 "waiting_for": "domicile_selection"
             }
@@ -2718,11 +2952,7 @@ def get_bot_response(session_id: str, user_message: str = "", file_uploaded: dic
                 session["income_info"]["source"] = "income_certificate"
 
                 return {
-                    "response": (
-                        get_translated_message("income_exceeds", user_language)
-                        + "\n\n"
-                        + get_translated_message("income_retry_prompt", user_language)
-                    ),
+                    "response": compose_message(user_language, "income_exceeds", "income_retry_prompt"),
                     "type": "error",
                     "waiting_for": "income_certificate_upload"
                 }
@@ -3263,6 +3493,15 @@ def get_bot_response(session_id: str, user_message: str = "", file_uploaded: dic
     return response
 
 
+async def get_bot_response_async(session_id: str, user_message: str = "", file_uploaded: dict = None):
+    """
+    Non-blocking get_bot_response for async handlers.
+    The step machine mixes OCR, blob uploads, DB calls and translations, so the whole
+    turn runs in a worker thread instead of on the event loop.
+    """
+    return await run_blocking(get_bot_response, session_id, user_message, file_uploaded)
+
+
 # ============================================
 # ROUTES
 # ============================================
@@ -3288,7 +3527,7 @@ async def chat_endpoint(
                 "doc_type": doc_type
             }
         
-        response = get_bot_response(session_id, message, file_uploaded)
+        response = await get_bot_response_async(session_id, message, file_uploaded)
         return response
         
     except Exception as e:
@@ -3299,7 +3538,7 @@ async def chat_endpoint(
 @app.post("/api/start-session")
 async def start_session():
     session_id = str(uuid.uuid4())
-    response = get_bot_response(session_id)
+    response = await get_bot_response_async(session_id)
     return {"session_id": session_id, "message": response["response"]}
 
 
@@ -3309,7 +3548,9 @@ async def health_check():
     return {
         "status": "healthy",
         "blob_storage": "connected" if container_client else "disconnected",
-        "azure_openai": "connected" if openai_client else "disconnected"
+        "azure_openai": "connected" if openai_client else "disconnected",
+        "translation_cache": translation_cache.stats(),
+        "translation_catalog": translation_catalog.stats()
     }
 
 
@@ -0,0 +1,171 @@
+"""
+Translation Cache Module for Ladki Bahin Yojana
+Caches LLM-translated message templates so a static template is translated only once per language
+Bounded in-memory LRU with an optional JSON backing file
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# Cache Configuration
+# ============================================
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "2000"))
+TRANSLATION_CACHE_FILE = os.getenv("TRANSLATION_CACHE_FILE", "")
+# New translations are written to the backing file at most once per this many seconds
+TRANSLATION_CACHE_SAVE_DELAY = float(os.getenv("TRANSLATION_CACHE_SAVE_DELAY", "5"))
+
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+
+# ============================================
+# Helpers
+# ============================================
+def template_hash(template: str) -> str:
+    """Short stable hash of an English template (changes whenever the template text changes)"""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+def extract_placeholders(text: str) -> set:
+    """Return the set of {placeholder} names used in a template"""
+    return set(PLACEHOLDER_PATTERN.findall(text or ""))
+
+
+def placeholders_preserved(template: str, translated: str) -> bool:
+    """True if the translation kept every {placeholder} of the template and added none"""
+    return extract_placeholders(template) == extract_placeholders(translated)
+
+
+# ============================================
+# Translation Cache
+# ============================================
+class TranslationCache:
+    """
+    LRU cache of translated (unformatted) templates.
+
+    Keys are (message_key, language, template_hash), so editing a template in code
+    automatically invalidates its old translations. Values are stored unformatted;
+    callers substitute kwargs after lookup.
+    """
+
+    def __init__(self, max_size: int = TRANSLATION_CACHE_SIZE, file_path: str = TRANSLATION_CACHE_FILE,
+                 save_delay: float = TRANSLATION_CACHE_SAVE_DELAY):
+        self.max_size = max(1, max_size)
+        self.file_path = file_path or None
+        self.save_delay = save_delay
+        self._entries: "OrderedDict[Tuple[str, str, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes file writes; _save_timer batches the set() calls of one save_delay window
+        self._save_lock = threading.Lock()
+        self._save_timer: Optional[threading.Timer] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.file_path:
+            self._load()
+
+    @staticmethod
+    def make_key(message_key: str, language: str, template: str) -> Tuple[str, str, str]:
+        return (message_key, language, template_hash(template))
+
+    def get(self, message_key: str, language: str, template: str) -> Optional[str]:
+        """Return the cached translation or None (counts a hit or a miss)"""
+        key = self.make_key(message_key, language, template)
+        with self._lock:
+            translated = self._entries.get(key)
+            if translated is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return translated
+
+    def set(self, message_key: str, language: str, template: str, translated: str):
+        """Store a translation and schedule a write of the backing file (if configured)"""
+        key = self.make_key(message_key, language, template)
+        with self._lock:
+            self._entries[key] = translated
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            if self.file_path and self._save_timer is None:
+                self._save_timer = threading.Timer(self.save_delay, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """Write pending translations to the backing file now (also called on shutdown)"""
+        with self._lock:
+            timer, self._save_timer = self._save_timer, None
+        if timer is None:
+            return
+        timer.cancel()
+        self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters — every hit is one LLM translation call saved"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "llm_calls_saved": self.hits,
+                "file": self.file_path,
+            }
+
+    # ----------------------------------------
+    # Disk persistence
+    # ----------------------------------------
+    def _load(self):
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for item in data.get("entries", [])[-self.max_size:]:
+                key = (item["message_key"], item["language"], item["template_hash"])
+                self._entries[key] = item["text"]
+            logger.info(f"✅ Loaded {len(self._entries)} cached translations from {self.file_path}")
+        except Exception as e:
+            logger.error(f"❌ Failed to load translation cache file {self.file_path}: {e}")
+
+    def _save(self):
+        with self._save_lock:
+            with self._lock:
+                entries = [
+                    {"message_key": k[0], "language": k[1], "template_hash": k[2], "text": v}
+                    for k, v in self._entries.items()
+                ]
+            # Unique temp file in the same directory, then an atomic rename
+            directory = os.path.dirname(os.path.abspath(self.file_path))
+            tmp_path = None
+            try:
+                fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump({"entries": entries}, f, ensure_ascii=False)
+                os.replace(tmp_path, self.file_path)
+            except Exception as e:
+                logger.error(f"❌ Failed to write translation cache file {self.file_path}: {e}")
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+
+translation_cache = TranslationCache()
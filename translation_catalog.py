@@ -0,0 +1,247 @@
+"""
+Translation Catalog Module for Ladki Bahin Yojana
+Build-time compiler and runtime loader for pre-translated Marathi/Hindi message templates
+
+Build the catalog (needs Azure OpenAI credentials, run once per deployment):
+    python translation_catalog.py --output translation_catalog.json
+
+At runtime the catalog is loaded once at startup; only keys that are missing or whose
+English template changed since the build (stale) fall back to live LLM translation.
+"""
+
+import os
+import sys
+import json
+import argparse
+import importlib
+import logging
+import threading
+from datetime import datetime
+from typing import Optional, Dict, Any, Callable, List
+
+from translation_cache import template_hash, placeholders_preserved, extract_placeholders
+
+logger = logging.getLogger(__name__)
+
+# ============================================
+# Catalog Configuration
+# ============================================
+CATALOG_FORMAT_VERSION = 1
+TRANSLATION_CATALOG_FILE = os.getenv("TRANSLATION_CATALOG_FILE", "translation_catalog.json")
+CATALOG_LANGUAGES = ["marathi", "hindi"]
+
+# Namespaces map to the template dicts the catalog is compiled from
+REGISTRATION_NAMESPACE = "registration"
+UTILS_NAMESPACE = "utils"
+ELIGIBILITY_NAMESPACE = "eligibility"
+
+
+# ============================================
+# Runtime Catalog
+# ============================================
+class TranslationCatalog:
+    """Read-only view over a compiled catalog file with lookup counters"""
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, file_path: Optional[str] = None):
+        data = data or {}
+        self.file_path = file_path
+        self.version = data.get("catalog_version")
+        self.built_at = data.get("built_at")
+        self.entries: Dict[str, Dict[str, Dict[str, Dict[str, str]]]] = data.get("entries", {})
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.missing = 0
+        self.stale = 0
+
+    def lookup(self, namespace: str, message_key: str, language: str, template: str) -> Optional[str]:
+        """
+        Return the pre-translated (unformatted) template, or None if the key is
+        missing or was compiled from a different English template.
+        """
+        entry = self.entries.get(namespace, {}).get(message_key, {}).get(language)
+        with self._lock:
+            if not entry:
+                self.missing += 1
+                return None
+            if entry.get("template_hash") != template_hash(template):
+                self.stale += 1
+                return None
+            self.hits += 1
+        return entry["text"]
+
+    def __len__(self):
+        return sum(len(langs) for keys in self.entries.values() for langs in keys.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "file": self.file_path,
+                "catalog_version": self.version,
+                "built_at": self.built_at,
+                "entries": len(self),
+                "hits": self.hits,
+                "missing": self.missing,
+                "stale": self.stale,
+            }
+
+
+def load_translation_catalog(file_path: str = TRANSLATION_CATALOG_FILE) -> TranslationCatalog:
+    """Load a compiled catalog; returns an empty catalog if the file is absent or unreadable"""
+    if not file_path or not os.path.exists(file_path):
+        logger.warning(f"⚠️ Translation catalog not found at '{file_path}', using live translation only")
+        return TranslationCatalog(file_path=file_path)
+    try:
+        with open(file_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("format_version") != CATALOG_FORMAT_VERSION:
+            logger.warning(f"⚠️ Translation catalog format {data.get('format_version')} not supported, ignoring")
+            return TranslationCatalog(file_path=file_path)
+        catalog = TranslationCatalog(data, file_path=file_path)
+        logger.info(f"✅ Loaded translation catalog v{catalog.version} ({len(catalog)} entries) from {file_path}")
+        return catalog
+    except Exception as e:
+        logger.error(f"❌ Failed to load translation catalog {file_path}: {e}")
+        return TranslationCatalog(file_path=file_path)
+
+
+_shared_catalog: Optional[TranslationCatalog] = None
+_shared_catalog_lock = threading.Lock()
+
+
+def get_translation_catalog() -> TranslationCatalog:
+    """Process-wide catalog instance, loaded once and shared by every module that translates"""
+    global _shared_catalog
+    with _shared_catalog_lock:
+        if _shared_catalog is None:
+            _shared_catalog = load_translation_catalog()
+        return _shared_catalog
+
+
+# ============================================
+# Build-time Compiler
+# ============================================
+def compile_catalog(
+    namespaces: Dict[str, Dict[str, Any]],
+    translate: Callable[[str, str], Optional[str]],
+    languages: List[str] = CATALOG_LANGUAGES,
+    previous: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Translate every string template once per language.
+
+    Entries from a previous catalog whose template hash still matches are reused, so
+    rebuilding after a template edit only re-translates what changed. Templates that are
+    already per-language dicts are skipped (they are never sent to the LLM). A translation
+    that drops or invents a {placeholder} is rejected and reported in "errors".
+    """
+    previous_entries = (previous or {}).get("entries", {})
+    entries: Dict[str, Dict[str, Dict[str, Dict[str, str]]]] = {}
+    errors: List[Dict[str, str]] = []
+    translated_count = 0
+    reused_count = 0
+
+    for namespace, templates in namespaces.items():
+        ns_entries = entries.setdefault(namespace, {})
+        for message_key, template in templates.items():
+            if not isinstance(template, str):
+                continue
+            current_hash = template_hash(template)
+            for language in languages:
+                old = previous_entries.get(namespace, {}).get(message_key, {}).get(language)
+                if old and old.get("template_hash") == current_hash:
+                    ns_entries.setdefault(message_key, {})[language] = old
+                    reused_count += 1
+                    continue
+
+                translated = translate(template, language)
+                if not translated:
+                    errors.append({"namespace": namespace, "key": message_key, "language": language,
+                                   "error": "translation failed"})
+                    continue
+                if not placeholders_preserved(template, translated):
+                    errors.append({
+                        "namespace": namespace, "key": message_key, "language": language,
+                        "error": f"placeholders changed: expected {sorted(extract_placeholders(template))}, "
+                                 f"got {sorted(extract_placeholders(translated))}"
+                    })
+                    continue
+
+                ns_entries.setdefault(message_key, {})[language] = {
+                    "template_hash": current_hash,
+                    "text": translated,
+                }
+                translated_count += 1
+                print(f"✅ [{namespace}] {message_key} → {language}")
+
+    previous_version = (previous or {}).get("catalog_version", 0)
+    return {
+        "format_version": CATALOG_FORMAT_VERSION,
+        "catalog_version": previous_version + 1,
+        "built_at": datetime.utcnow().isoformat() + "Z",
+        "languages": languages,
+        "entries": entries,
+        "build_report": {
+            "translated": translated_count,
+            "reused": reused_count,
+            "errors": errors,
+        },
+    }
+
+
+def _load_previous(path: str) -> Optional[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if data.get("format_version") == CATALOG_FORMAT_VERSION else None
+    except Exception as e:
+        print(f"⚠️ Ignoring unreadable previous catalog {path}: {e}")
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Compile the Marathi/Hindi translation catalog")
+    parser.add_argument("--output", default=TRANSLATION_CATALOG_FILE, help="Catalog file to write")
+    parser.add_argument("--languages", nargs="+", default=CATALOG_LANGUAGES)
+    parser.add_argument("--registration-module", default="registration_final",
+                        help="Module providing MESSAGE_TEMPLATES and translate_template()")
+    parser.add_argument("--utils-module", default="utils_final",
+                        help="Module providing MULTILINGUAL_TEMPLATES")
+    parser.add_argument("--full", action="store_true", help="Re-translate everything, ignoring the previous catalog")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    registration = importlib.import_module(args.registration_module)
+    utils = importlib.import_module(args.utils_module)
+    eligibility_engine = importlib.import_module("eligibility_engine")
+
+    if not registration.openai_client:
+        print("❌ Azure OpenAI is not configured (AZURE_OPENAI_ENDPOINT / AZURE_OPENAI_API_KEY)")
+        return 1
+
+    previous = None if args.full else _load_previous(args.output)
+    catalog = compile_catalog(
+        {
+            REGISTRATION_NAMESPACE: registration.MESSAGE_TEMPLATES,
+            UTILS_NAMESPACE: utils.MULTILINGUAL_TEMPLATES,
+            ELIGIBILITY_NAMESPACE: eligibility_engine.english_templates(),
+        },
+        translate=registration.translate_template,
+        languages=args.languages,
+        previous=previous,
+    )
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(catalog, f, ensure_ascii=False, indent=2)
+
+    report = catalog["build_report"]
+    print(f"📦 Catalog v{catalog['catalog_version']} written to {args.output}: "
+          f"{report['translated']} translated, {report['reused']} reused, {len(report['errors'])} errors")
+    for err in report["errors"]:
+        print(f"❌ [{err['namespace']}] {err['key']} → {err['language']}: {err['error']}")
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,5 @@
 # utils.py
-import io
 import re
-import pytesseract
-from PIL import Image
-from pdf2image import convert_from_bytes
 from datetime import datetime
 from typing import Optional, Dict, Any
 from fastapi import APIRouter, File, UploadFile, Form, HTTPException
@@ -15,6 +11,16 @@ from openai import AzureOpenAI
 
 
 from database import db_manager
+from translation_catalog import get_translation_catalog, UTILS_NAMESPACE
+from translation_cache import translation_cache, placeholders_preserved
+from llm_client import chat_completion, run_blocking
+from document_cache import document_parse_cache, parse_cache_key
+from deadline import has_budget, record_fallback
+from ocr_service import ocr_service
+from card_layout_ocr import aextract_card
+from language_detector import (
+    language_detector, language_memo, record_detection, LANGUAGE_CONFIDENCE_THRESHOLD
+)
 
 # ============== Azure OpenAI Setup ==============
 try:
@@ -30,54 +36,59 @@ except Exception as e:
     AZURE_DEPLOYMENT = None
     print(f"⚠️ Azure OpenAI not available: {e}")
 
+# Pre-translated templates compiled at build time (see translation_catalog.py)
+translation_catalog = get_translation_catalog()
+
 # ============== Router Setup ==============
 router = APIRouter(prefix="/api", tags=["Aadhaar"])
 
 # In-memory session storage (use Redis in production)
 sessions = {}
 
-def detect_language(text: str) -> str:
-    """Detect language from user text using Azure OpenAI"""
+def detect_language(text: str, session_id: Optional[str] = None) -> str:
+    """
+    Detect language from user text.
+    Uses the local script/n-gram detector and only asks Azure OpenAI when its
+    confidence is below LANGUAGE_CONFIDENCE_THRESHOLD. Memoized per session.
+    """
     
     # Skip detection for numeric strings (Aadhaar, Mobile, etc.)
     if text.strip().isdigit():
         return "marathi" # Default to Marathi for numeric inputs in this app context
     
-    if not openai_client:
-        # Simple fallback without OpenAI
-        text_lower = text.lower().strip()
-        
-        # Marathi/Hindi transliteration mapping (common short inputs)
-        marathi_latin = ['ho', 'hao', 'hoay', 'hau', 'nahi', 'nahay', 'aahe']
-        hindi_latin = ['ha', 'haan', 'nhi', 'nahi', 'hai']
-        
-        # Marathi-specific words (unique to Marathi, NOT in Hindi)
-        marathi_unique = ['आहे', 'तुम्ही', 'आपण', 'होय', 'तपासायची', 'करायचा', 'पाहिजे', 'झाले', 'काय', 'कसे']
-        marathi_count = sum(1 for word in marathi_unique if word in text)
-        marathi_count += sum(1 for word in marathi_latin if word in text_lower.split())
-        
-        # Hindi-specific words (unique to Hindi, NOT in Marathi)
-        hindi_unique = ['है', 'हैं', 'आप', 'मैं', 'हाँ', 'चाहिए', 'करना', 'क्या', 'कैसे', 'था']
-        hindi_count = sum(1 for word in hindi_unique if word in text)
-        hindi_count += sum(1 for word in hindi_latin if word in text_lower.split())
-        
-        # English words
-        english_words = ['yes', 'no', 'is', 'are', 'the', 'i', 'you', 'what', 'how']
-        english_count = sum(1 for word in text_lower.split() if word in english_words)
-        
-        # Determine language based on counts
-        if marathi_count > hindi_count and marathi_count > english_count:
-            return "marathi"
-        elif hindi_count > english_count:
-            return "hindi"
-        elif english_count > 0:
-            return "english"
-        
-        # Default to marathi if no clear match
-        return "marathi"
+    if session_id:
+        memoized = language_memo.get(session_id, text)
+        if memoized:
+            record_detection("memo_hits")
+            return memoized
     
+    detected, confidence = language_detector.detect(text)
+    
+    if detected and (confidence >= LANGUAGE_CONFIDENCE_THRESHOLD or not openai_client):
+        record_detection("local")
+    elif not openai_client:
+        # No letters and no LLM: default to marathi
+        record_detection("local")
+        detected = "marathi"
+    elif not has_budget():
+        # Request budget nearly spent: keep the local guess instead of escalating
+        record_detection("local")
+        record_fallback("detect_language")
+        detected = detected or "marathi"
+    else:
+        record_detection("escalated")
+        print(f"🔍 Local language detection unsure ({detected}, {confidence:.2f}), asking LLM")
+        detected = _detect_language_llm(text)
+    
+    if session_id:
+        language_memo.set(session_id, text, detected)
+    return detected
+
+
+def _detect_language_llm(text: str) -> str:
+    """Detect language from user text using Azure OpenAI"""
     try:
-        response = openai_client.chat.completions.create(
+        response = chat_completion(openai_client, purpose="detect_language",
             model=AZURE_DEPLOYMENT,
             messages=[
                 {
@@ -125,11 +136,45 @@ Return ONLY one word in lowercase: 'marathi' OR 'hindi' OR 'english'."""
         print(f"⚠️ Language detection failed: {e}")
         return "english"
 
-def get_multilingual_message(message_key: str, language: str, **kwargs) -> str:
+# English message templates (also compiled into the translation catalog)
+MULTILINGUAL_TEMPLATES = {
+    "aadhaar_request": "please upload your Aadhaar card or enter your 12 Digit Aadhaar number.",
+    "aadhaar_not_found": "Your Aadhaar number was not found in the database. Please upload your Aadhaar card: First upload the front side, then upload the back side.",
+    "front_processed": "Aadhaar front side successfully processed. Now please upload the back side.",
+    "back_processed": "Back side processed. Please upload the front side.",
+    "both_complete": "Both sides of Aadhaar card successfully processed. Data has been saved.",
+    "image_error": "Could not read text from image. Please upload a clear image.",
+    "side_detection_error": "Could not identify Aadhaar card. Please upload a clear image.",
+    "aadhaar_verified": "Aadhaar verified. Your information has been retrieved.",
+    "aadhaar_not_in_db": "Aadhaar number not found in database. Please upload your Aadhaar card.",
+    "front_side_uploaded": "Aadhaar front side processed. Please upload the back side.",
+    "back_side_uploaded": "Back side processed. Please upload the front side.",
+    "aadhaar_already_verified": "Aadhaar already verified.",
+    "aadhaar_input_request": "Please enter your 12-digit Aadhaar number or upload your Aadhaar card.",
+    "invalid_file_type": "Invalid file type. Only {extensions} are allowed.",
+    "ocr_extraction_failed": "Could not extract text from image. Please upload a clear image.",
+    "side_detection_failed": "Could not identify which side of Aadhaar card. Please upload a clear image.",
+    "invalid_aadhaar": "Invalid Aadhaar number format. Please enter a valid 12-digit Aadhaar number.",
+    "clarify_yes_no": "Please answer with 'yes' or 'no'.",
+    "aadhaar_confirmation": "Is the information from your Aadhaar correct? Please confirm. According to Aadhaar, your name is {name}, your age is {age} years, and your address is in {district} district of Maharashtra, and your pincode is {pincode}.",
+}
+
+def get_multilingual_message(message_key: str, language: str, preserve_placeholders: bool = True, **kwargs) -> str:
     """
     Get localized message using Azure OpenAI.
     Supports template variables for dynamic content.
+    Templates compiled into the translation catalog are served without an LLM call.
+    With preserve_placeholders (default), the unformatted template is translated and cached
+    per language and kwargs are substituted locally; set it to False to translate the
+    already-formatted text instead.
     """
+    if language in ("marathi", "hindi") and message_key in MULTILINGUAL_TEMPLATES:
+        translated = translation_catalog.lookup(
+            UTILS_NAMESPACE, message_key, language, MULTILINGUAL_TEMPLATES[message_key]
+        )
+        if translated is not None:
+            return translated.format(**kwargs) if kwargs else translated
+
     if not openai_client:
         # Fallback messages in English
         fallback = {
@@ -154,52 +199,52 @@ def get_multilingual_message(message_key: str, language: str, **kwargs) -> str:
         msg = fallback.get(message_key, "Operation completed.")
         return msg.format(**kwargs) if kwargs else msg
     
-   # English message templates
-    templates = {
-        "aadhaar_request": "please upload your Aadhaar card or enter your 12 Digit Aadhaar number.",
-        "aadhaar_not_found": "Your Aadhaar number was not found in the database. Please upload your Aadhaar card: First upload the front side, then upload the back side.",
-        "front_processed": "Aadhaar front side successfully processed. Now please upload the back side.",
-        "back_processed": "Back side processed. Please upload the front side.",
-        "both_complete": "Both sides of Aadhaar card successfully processed. Data has been saved.",
-        "image_error": "Could not read text from image. Please upload a clear image.",
-        "side_detection_error": "Could not identify Aadhaar card. Please upload a clear image.",
-        "aadhaar_verified": "Aadhaar verified. Your information has been retrieved.",
-        "aadhaar_not_in_db": "Aadhaar number not found in database. Please upload your Aadhaar card.",
-        "front_side_uploaded": "Aadhaar front side processed. Please upload the back side.",
-        "back_side_uploaded": "Back side processed. Please upload the front side.",
-        "aadhaar_already_verified": "Aadhaar already verified.",
-        "aadhaar_input_request": "Please enter your 12-digit Aadhaar number or upload your Aadhaar card.",
-        "invalid_file_type": "Invalid file type. Only {extensions} are allowed.",
-        "ocr_extraction_failed": "Could not extract text from image. Please upload a clear image.",
-        "side_detection_failed": "Could not identify which side of Aadhaar card. Please upload a clear image.",
-        "invalid_aadhaar": "Invalid Aadhaar number format. Please enter a valid 12-digit Aadhaar number.",
-        "clarify_yes_no": "Please answer with 'yes' or 'no'.",
-        "aadhaar_confirmation": "Is the information from your Aadhaar correct? Please confirm. According to Aadhaar, your name is {name}, your age is {age} years, and your address is in {district} district of Maharashtra, and your pincode is {pincode}.",
-    }
-    
-    english_message = templates.get(message_key, "Operation completed.")
-    
-    # Format with kwargs if provided
-    if kwargs:
-        english_message = english_message.format(**kwargs)
+    template = MULTILINGUAL_TEMPLATES.get(message_key, "Operation completed.")
     
     # If language is English, return as-is
     if language == "english":
-        return english_message
+        return template.format(**kwargs) if kwargs else template
     
+    # ✅ Translate the unformatted template once per language and substitute values locally,
+    # so personalized messages (name, age, district...) reuse the same cached translation
+    if preserve_placeholders:
+        translated = translation_cache.get(f"utils.{message_key}", language, template)
+        if translated is None:
+            translated = _translate_text(template, language, keep_placeholders=True)
+            if translated and placeholders_preserved(template, translated):
+                translation_cache.set(f"utils.{message_key}", language, template, translated)
+            else:
+                print(f"⚠️ Placeholder-preserving translation failed for '{message_key}', translating formatted text")
+                translated = None
+        if translated is not None:
+            return translated.format(**kwargs) if kwargs else translated
+    
+    # Format with kwargs and translate the final text
+    english_message = template.format(**kwargs) if kwargs else template
+    return _translate_text(english_message, language) or english_message
+
+
+def _translate_text(text: str, language: str, keep_placeholders: bool = False) -> Optional[str]:
+    """Translate text to Marathi/Hindi; returns None on failure"""
+    if not has_budget():
+        record_fallback("translate")
+        return None
     try:
         target_lang = "Marathi" if language == "marathi" else "Hindi"
+        system_prompt = f"Translate to {target_lang}. Maintain all formatting and numbers. Return ONLY the translation."
+        if keep_placeholders:
+            system_prompt += " Keep every placeholder in curly braces (e.g. {name}) exactly as-is, untranslated."
         
-        response = openai_client.chat.completions.create(
+        response = chat_completion(openai_client, purpose="translate",
             model=AZURE_DEPLOYMENT,
             messages=[
                 {
                     "role": "system",
-                    "content": f"Translate to {target_lang}. Maintain all formatting and numbers. Return ONLY the translation."
+                    "content": system_prompt
                 },
                 {
                     "role": "user",
-                    "content": english_message
+                    "content": text
                 }
             ],
             temperature=0,
@@ -210,26 +255,78 @@ def get_multilingual_message(message_key: str, language: str, **kwargs) -> str:
         
     except Exception as e:
         print(f"⚠️ Translation failed: {e}")
-        return english_message
+        return None
 
 # ============== OCR & Extraction Functions ==============
 
-def extract_text_from_bytes(file_bytes: bytes, extension: str) -> str:
+AADHAAR_NUMBER_PATTERN = re.compile(r"\d{4}\s?\d{4}\s?\d{4}")
+AADHAAR_ADDRESS_PATTERN = re.compile(r"address|पत्ता|पता", re.IGNORECASE)
+
+
+def aadhaar_pages_complete(text: str) -> bool:
+    """Both Aadhaar sides are in the OCR text (number on the front, address on the back)"""
+    return bool(AADHAAR_NUMBER_PATTERN.search(text) and AADHAAR_ADDRESS_PATTERN.search(text))
+
+
+def extract_text_from_bytes(file_bytes: bytes, extension: str, early_exit: bool = True) -> str:
+    """
+    Aadhaar OCR in the shared process pool (blocks the calling thread, never the pool).
+    PDF pages are OCR'd in parallel; with early_exit the remaining pages are skipped once
+    both sides have been read.
+    """
     try:
-        if extension.lower() == ".pdf":
-            images = convert_from_bytes(file_bytes, dpi=300)
-            return "\n".join(
-                pytesseract.image_to_string(img, lang="eng+hin")
-                for img in images
-            )
-        else:
-            img = Image.open(io.BytesIO(file_bytes))
-            return pytesseract.image_to_string(img, lang="eng+hin")
+        return ocr_service.run_document(
+            file_bytes, extension,
+            stop_when=aadhaar_pages_complete if early_exit else None,
+            lang="eng+hin"
+        )
+    except Exception as e:
+        print(f"Error extracting text: {e}")
+        return ""
+
+
+async def aextract_text_from_bytes(file_bytes: bytes, extension: str, early_exit: bool = True) -> str:
+    """extract_text_from_bytes for async handlers: the event loop keeps serving while OCR runs"""
+    try:
+        return await ocr_service.arun_document(
+            file_bytes, extension,
+            stop_when=aadhaar_pages_complete if early_exit else None,
+            lang="eng+hin"
+        )
     except Exception as e:
         print(f"Error extracting text: {e}")
         return ""
 
 
+async def aextract_aadhaar_card(file_bytes: bytes, extension: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Validated sides from layout-aware card OCR, in the front/back extractor formats
+    ({"front": {...}, "back": {...}}, either may be missing). Empty → use full OCR.
+    """
+    card = await aextract_card(file_bytes, extension, "aadhaar")
+    if not card:
+        return {}
+    fields = card["fields"]
+    sides = {}
+    if "front" in card["sides"]:
+        sides["front"] = {
+            "AadhaarNo": fields["aadhaar_number"],
+            "FullName": fields["name"],
+            "DateOfBirth": datetime.strptime(fields["dob"], "%d/%m/%Y").date(),
+            "Gender": fields["gender"]
+        }
+    if "back" in card["sides"]:
+        address = fields["address"]
+        sides["back"] = {
+            "Address": address,
+            "Pincode": fields["pincode"],
+            "District": district_from_address(address),
+            "State": "Madhya Pradesh" if fields["pincode"].startswith("48") else "Maharashtra",
+            "Country": "India"
+        }
+    return sides
+
+
 def detect_aadhaar_side(text: str) -> str: 
     text_lower = text.lower()
     
@@ -249,10 +346,25 @@ def detect_aadhaar_side(text: str) -> str:
     return "unknown"
 
 
+# Bump when the prompts below change so cached parses from the old prompt are not reused
+AADHAAR_PARSE_PROMPT_VERSION = "aadhaar-v1"
+
+
 def parse_with_ai(text: str, document_side: str) -> Dict[str, Any]:
     if not openai_client:
         print("⚠️ Azure OpenAI not configured. Using basic extraction.")
         return None
+
+    # Same card uploaded again → reuse the structured parse
+    cache_key = parse_cache_key(f"aadhaar_{document_side}", text, AADHAAR_PARSE_PROMPT_VERSION)
+    cached = document_parse_cache.get(cache_key)
+    if cached is not None:
+        print(f"♻️ Reusing cached AI parse for {document_side} side")
+        return cached
+
+    if not has_budget():
+        record_fallback("parse_with_ai")
+        return None
     
     if document_side == "front":
         prompt = f"""Extract information from this Aadhaar card FRONT side OCR text.
@@ -291,7 +403,7 @@ Return ONLY valid JSON, no markdown, no explanation."""
     Return ONLY valid JSON, no markdown, no explanation."""
 
     try:
-        response = openai_client.chat.completions.create(
+        response = chat_completion(openai_client, purpose="parse_with_ai",
             model=AZURE_DEPLOYMENT,
             messages=[
                 {"role": "system", "content": "You are an expert at extracting structured data from Aadhaar cards. Return only valid JSON."},
@@ -308,6 +420,7 @@ Return ONLY valid JSON, no markdown, no explanation."""
         
         parsed = json.loads(result)
         print(f"✅ AI successfully parsed {document_side} side")
+        document_parse_cache.set(cache_key, parsed)
         return parsed
         
     except Exception as e:
@@ -448,19 +561,25 @@ def extract_aadhaar_back_details(ocr_text: str) -> Dict[str, Any]:
         data["Address"] = addr
         
         # Simple regex-based district detection for fallback
-        if re.search(r'Mumbai|मुंबई|Andheri|Borivali|Bandra|Dadar|Kurla|Malad|Goregaon', addr, re.IGNORECASE):
-            data["District"] = "Mumbai"
-        elif re.search(r'Pune|पुणे|Hinjewadi|Kharadi|Hadapsar|Wakad', addr, re.IGNORECASE):
-            data["District"] = "Pune"
-        elif re.search(r'Nagpur|नागपूर', addr, re.IGNORECASE):
-            data["District"] = "Nagpur"
-        elif re.search(r'Thane|ठाणे', addr, re.IGNORECASE):
-            data["District"] = "Thane"
-        elif re.search(r'Nashik|नाशिक', addr, re.IGNORECASE):
-            data["District"] = "Nashik"
+        data["District"] = district_from_address(addr)
 
     return data
 
+
+def district_from_address(addr: str) -> Optional[str]:
+    """District for the regex-based extractors (known Maharashtra districts only)"""
+    if re.search(r'Mumbai|मुंबई|Andheri|Borivali|Bandra|Dadar|Kurla|Malad|Goregaon', addr, re.IGNORECASE):
+        return "Mumbai"
+    elif re.search(r'Pune|पुणे|Hinjewadi|Kharadi|Hadapsar|Wakad', addr, re.IGNORECASE):
+        return "Pune"
+    elif re.search(r'Nagpur|नागपूर', addr, re.IGNORECASE):
+        return "Nagpur"
+    elif re.search(r'Thane|ठाणे', addr, re.IGNORECASE):
+        return "Thane"
+    elif re.search(r'Nashik|नाशिक', addr, re.IGNORECASE):
+        return "Nashik"
+    return None
+
 def validate_aadhaar_number(aadhaar_number: str) -> bool:
 
     return bool(re.fullmatch(r'\d{12}', aadhaar_number))
@@ -563,6 +682,19 @@ def format_aadhaar_confirmation(aadhaar_data: dict, language: str = "marathi") -
             f"Pincode: {pincode}\n\n"
             f"Is this information correct? Please confirm."
         )
+# ============== Async Variants for the Routers ==============
+
+async def adetect_language(text: str, session_id: Optional[str] = None) -> str:
+    """detect_language for async handlers: an LLM escalation runs in a worker thread"""
+    return await run_blocking(detect_language, text, session_id=session_id)
+
+
+async def aget_multilingual_message(message_key: str, language: str, preserve_placeholders: bool = True,
+                                    **kwargs) -> str:
+    """get_multilingual_message for async handlers: a live translation runs in a worker thread"""
+    return await run_blocking(get_multilingual_message, message_key, language, preserve_placeholders, **kwargs)
+
+
 # ============== Helper Function for main.py ==============
 
 async def process_aadhaar_details(
@@ -585,7 +717,7 @@ async def process_aadhaar_details(
             user_language = session["language"]
             print(f"📝 Using stored language: {user_language}")
         elif message and not message.lower().startswith("uploaded:"):
-            user_language = detect_language(message)
+            user_language = await adetect_language(message, session_id=session_id)
             session["language"] = user_language
             print(f"🔍 Detected and stored language: {user_language}")
         else:
@@ -603,13 +735,13 @@ async def process_aadhaar_details(
             if not validate_aadhaar_number(aadhaar_no):
                 return {
                     "success": False,
-                    "message": get_multilingual_message("invalid_aadhaar", user_language),
+                    "message": await aget_multilingual_message("invalid_aadhaar", user_language),
                     "data": None,
                     "both_sides_complete": False
                 }
             
             # Check if Aadhaar exists in database
-            data = db_manager.get_aadhaar_details(aadhaar_no)
+            data = await run_blocking(db_manager.get_aadhaar_details, aadhaar_no)
             
             if data:
                 # Calculate age from date of birth
@@ -643,14 +775,14 @@ async def process_aadhaar_details(
                 
                 return {
                     "success": True,
-                    "message": get_multilingual_message("aadhaar_verified", user_language),
+                    "message": await aget_multilingual_message("aadhaar_verified", user_language),
                     "data": aadhaar_state["merged"],
                     "both_sides_complete": True
                 }
             else:
                 return {
                     "success": False,
-                    "message": get_multilingual_message("aadhaar_not_in_db", user_language),
+                    "message": await aget_multilingual_message("aadhaar_not_in_db", user_language),
                     "data": None,
                     "both_sides_complete": False
                 }
@@ -664,7 +796,7 @@ async def process_aadhaar_details(
             if file_extension not in allowed_extensions:
                 return {
                     "success": False,
-                    "message": get_multilingual_message(
+                    "message": await aget_multilingual_message(
                         "invalid_file_type", 
                         user_language, 
                         extensions=', '.join(allowed_extensions)
@@ -676,34 +808,45 @@ async def process_aadhaar_details(
             # Read file
             file_bytes = await file.read()
             
-            # Extract text using OCR
-            ocr_text = extract_text_from_bytes(file_bytes, file_extension)
-            
-            if not ocr_text.strip():
-                return {
-                    "success": False,
-                    "message": get_multilingual_message("ocr_extraction_failed", user_language),
-                    "data": None,
-                    "both_sides_complete": False
-                }
-            
-            # Detect side (front or back)
-            side = detect_aadhaar_side(ocr_text)
-            
-            if side == "unknown":
-                return {
-                    "success": False,
-                    "message": get_multilingual_message("side_detection_failed", user_language),
-                    "data": None,
-                    "both_sides_complete": False
-                }
+            # Layout-aware card OCR first: validated fields need no full OCR or AI parse
+            card_sides = await aextract_aadhaar_card(file_bytes, file_extension)
+            extracted_data = None
+            if card_sides:
+                if "front" in card_sides and "back" in card_sides:
+                    aadhaar_state["front"] = card_sides["front"]
+                side = "back" if "back" in card_sides else "front"
+                extracted_data = card_sides[side]
+                print(f"🪪 Aadhaar {', '.join(card_sides)} read from card regions")
+            else:
+                # Extract text using OCR
+                ocr_text = await aextract_text_from_bytes(file_bytes, file_extension)
+                
+                if not ocr_text.strip():
+                    return {
+                        "success": False,
+                        "message": await aget_multilingual_message("ocr_extraction_failed", user_language),
+                        "data": None,
+                        "both_sides_complete": False
+                    }
+                
+                # Detect side (front or back)
+                side = detect_aadhaar_side(ocr_text)
+                
+                if side == "unknown":
+                    return {
+                        "success": False,
+                        "message": await aget_multilingual_message("side_detection_failed", user_language),
+                        "data": None,
+                        "both_sides_complete": False
+                    }
             
             # Set source as upload
             aadhaar_state["source"] = "upload"
             
             # Extract details based on detected side
             if side == "front":
-                extracted_data = extract_aadhaar_front_details(ocr_text)
+                if extracted_data is None:
+                    extracted_data = await run_blocking(extract_aadhaar_front_details, ocr_text)
                 aadhaar_state["front"] = extracted_data
                 
                 # Convert date to string for JSON serialization
@@ -712,14 +855,15 @@ async def process_aadhaar_details(
                 
                 return {
                     "success": True,
-                    "message": get_multilingual_message("front_side_uploaded", user_language),
+                    "message": await aget_multilingual_message("front_side_uploaded", user_language),
                     "data": extracted_data,
                     "side_detected": "front",
                     "both_sides_complete": False
                 }
                 
             elif side == "back":
-                extracted_data = extract_aadhaar_back_details(ocr_text)
+                if extracted_data is None:
+                    extracted_data = await run_blocking(extract_aadhaar_back_details, ocr_text)
                 aadhaar_state["back"] = extracted_data
                 
                 # Check if both sides are now available
@@ -733,13 +877,13 @@ async def process_aadhaar_details(
                     
                     # Save to database if not already saved
                     if not aadhaar_state["saved"]:
-                        beneficiary_id = db_manager.save_beneficiary_from_aadhaar(merged_data)
+                        beneficiary_id = await run_blocking(db_manager.save_beneficiary_from_aadhaar, merged_data)
                         aadhaar_state["saved"] = True
                         session["beneficiary_id"] = beneficiary_id
                     
                     return {
                         "success": True,
-                        "message": get_multilingual_message("both_complete", user_language),
+                        "message": await aget_multilingual_message("both_complete", user_language),
                         "data": merged_data,
                         "side_detected": "back",
                         "both_sides_complete": True
@@ -747,7 +891,7 @@ async def process_aadhaar_details(
                 else:
                     return {
                         "success": True,
-                        "message": get_multilingual_message("back_side_uploaded", user_language),
+                        "message": await aget_multilingual_message("back_side_uploaded", user_language),
                         "data": extracted_data,
                         "side_detected": "back",
                         "both_sides_complete": False
@@ -766,14 +910,14 @@ async def process_aadhaar_details(
             if aadhaar_state["merged"]:
                 return {
                     "success": True,
-                    "message": get_multilingual_message("aadhaar_already_verified", user_language),
+                    "message": await aget_multilingual_message("aadhaar_already_verified", user_language),
                     "data": aadhaar_state["merged"],
                     "both_sides_complete": True
                 }
             else:
                 return {
                     "success": False,
-                    "message": get_multilingual_message("aadhaar_input_request", user_language),
+                    "message": await aget_multilingual_message("aadhaar_input_request", user_language),
                     "data": None,
                     "both_sides_complete": False
                 }